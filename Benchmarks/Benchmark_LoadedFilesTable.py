@@ -0,0 +1,103 @@
+##########################################################
+# Purpose: This script measures the cost of checking whether a
+#   file has already been loaded, and of adding a file to the
+#   table of loaded files, with the original DataFrame-based
+#   LoadedFilesTable versus the indexed LoadedFilesTable.
+#
+##########################################################
+
+# %%
+import sys
+import os.path as o
+sys.path.append(o.abspath(o.join(o.dirname(sys.modules[__name__].__file__), "..")))
+
+# %%
+
+import time
+import random
+import pandas
+
+from RePlayAnalysisCore2.LoadedFilesTable import LoadedFilesTable
+
+# %%
+
+#This is the original implementation of LoadedFilesTable, kept here as the baseline.
+#(DataFrame.append has been removed from recent versions of pandas, so pandas.concat is
+#used instead. Both copy the whole DataFrame every time a row is added.)
+class LegacyLoadedFilesTable:
+
+    def __init__(self):
+        self.loaded_files = pandas.DataFrame([], columns = [
+            "UID",
+            "file_name",
+            "md5_checksum"
+        ])
+
+    def IsFileAlreadyLoaded (self, filename, md5checksum):
+        pre_existing_loaded_file = self.loaded_files[
+            (self.loaded_files["file_name"] == filename) & (self.loaded_files["md5_checksum"] == md5checksum)]
+        return (len(pre_existing_loaded_file) > 0)
+
+    def AppendLoadedFileToTable (self, participant_id, filename, md5checksum):
+        self.loaded_files = pandas.concat([self.loaded_files, pandas.DataFrame([{
+            "UID" : participant_id,
+            "file_name" : filename,
+            "md5_checksum" : md5checksum
+        }])], ignore_index = True)
+
+# %%
+
+#Create 100,000 synthetic loaded files
+number_of_files = 100000
+number_of_lookups = 1000
+random.seed(0)
+synthetic_files = [(f"UID{i % 200:03d}", f"session_{i:06d}.txt", f"{random.getrandbits(128):032x}") for i in range(number_of_files)]
+lookups = random.sample(synthetic_files, number_of_lookups // 2) + \
+    [(x[0], x[1], "0" * 32) for x in random.sample(synthetic_files, number_of_lookups // 2)]
+
+# %%
+
+#Adding files to the original table gets slower as the table grows, so it is only measured for smaller tables
+for table_size in [1000, 2000, 4000]:
+    legacy_table = LegacyLoadedFilesTable()
+    start_time = time.perf_counter()
+    for (participant_id, filename, md5checksum) in synthetic_files[:table_size]:
+        legacy_table.AppendLoadedFileToTable(participant_id, filename, md5checksum)
+    elapsed_time = time.perf_counter() - start_time
+    print(f"Original table: add {table_size} files: {elapsed_time:.3f} s ({elapsed_time / table_size * 1e6:.1f} us per file)")
+
+indexed_table = LoadedFilesTable()
+start_time = time.perf_counter()
+for (participant_id, filename, md5checksum) in synthetic_files:
+    indexed_table.AppendLoadedFileToTable(participant_id, filename, md5checksum)
+elapsed_time = time.perf_counter() - start_time
+print(f"Indexed table: add {number_of_files} files: {elapsed_time:.3f} s ({elapsed_time / number_of_files * 1e6:.1f} us per file)")
+
+# %%
+
+#Check whether files have been loaded, with 100,000 files in each table
+legacy_table = LegacyLoadedFilesTable()
+legacy_table.loaded_files = pandas.DataFrame(synthetic_files, columns = ["UID", "file_name", "md5_checksum"])
+
+start_time = time.perf_counter()
+legacy_results = [legacy_table.IsFileAlreadyLoaded(x[1], x[2]) for x in lookups]
+elapsed_time = time.perf_counter() - start_time
+print(f"Original table: {number_of_lookups} lookups: {elapsed_time:.3f} s ({elapsed_time / number_of_lookups * 1e6:.1f} us per lookup)")
+
+start_time = time.perf_counter()
+indexed_results = [indexed_table.IsFileAlreadyLoaded(x[1], x[2]) for x in lookups]
+elapsed_time = time.perf_counter() - start_time
+print(f"Indexed table: {number_of_lookups} lookups: {elapsed_time:.3f} s ({elapsed_time / number_of_lookups * 1e6:.1f} us per lookup)")
+
+print(f"Results match: {legacy_results == indexed_results}")
+
+# %%
+
+#Create the DataFrame view of the indexed table
+start_time = time.perf_counter()
+loaded_files = indexed_table.loaded_files
+elapsed_time = time.perf_counter() - start_time
+print(f"Indexed table: create DataFrame view of {len(loaded_files)} files: {elapsed_time:.3f} s")
+print(f"DataFrame views match: {loaded_files.equals(legacy_table.loaded_files)}")
+
+# %%
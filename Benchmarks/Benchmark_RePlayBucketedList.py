@@ -0,0 +1,106 @@
+##########################################################
+# Purpose: This script measures how much the database file grows
+#   (and how long each commit takes) when activities are appended
+#   to the activity list and committed a few at a time, with the
+#   activity list stored as a PersistentList versus as a
+#   RePlayBucketedList. It also checks that migrating a
+#   PersistentList keeps the activities in the same order.
+#
+##########################################################
+
+# %%
+import sys
+import os.path as o
+sys.path.append(o.abspath(o.join(o.dirname(sys.modules[__name__].__file__), "..")))
+
+# %%
+
+import os
+import time
+import tempfile
+import ZODB
+import ZODB.FileStorage
+import transaction
+import persistent
+import persistent.list
+
+from datetime import datetime
+from datetime import timedelta
+
+from RePlayAnalysisCore2.RePlayActivity import RePlayActivity
+from RePlayAnalysisCore2.RePlayBucketedList import RePlayBucketedList
+
+# %%
+
+#The number of activities that are already in the activity list, the number of activities
+#that are appended to it, and the number of activities that are appended between each commit
+existing_activity_count = 20000
+appended_activity_count = 2000
+activities_per_commit = 10
+
+def create_activity(i):
+    new_activity = RePlayActivity()
+    new_activity.uid = f"P{i % 50:03d}"
+    new_activity.activity_name = "FruitNinja"
+    new_activity.start_time = datetime(2021, 1, 1) + timedelta(minutes = i)
+    new_activity.duration = 60.0
+    return new_activity
+
+def run_benchmark(create_activity_list):
+    with tempfile.TemporaryDirectory() as temp_folder:
+        storage = ZODB.FileStorage.FileStorage(os.path.join(temp_folder, "benchmark.fs"))
+        db = ZODB.DB(storage)
+        db_connection = db.open()
+        root = db_connection.root
+
+        #Create an activity list that already holds some activities
+        root.activity_list = create_activity_list()
+        for i in range(0, existing_activity_count):
+            root.activity_list.append(create_activity(i))
+        transaction.commit()
+
+        #Append more activities, committing after every few of them
+        file_size_before = os.path.getsize(storage._file_name)
+        commit_time = 0
+        for i in range(existing_activity_count, existing_activity_count + appended_activity_count):
+            root.activity_list.append(create_activity(i))
+            if ((i + 1) % activities_per_commit == 0):
+                t = time.perf_counter()
+                transaction.commit()
+                commit_time += time.perf_counter() - t
+        file_size_after = os.path.getsize(storage._file_name)
+
+        number_of_commits = appended_activity_count // activities_per_commit
+        db_connection.close()
+        db.close()
+
+    return ((file_size_after - file_size_before) / number_of_commits, commit_time / number_of_commits)
+
+# %%
+
+(persistent_list_bytes, persistent_list_seconds) = run_benchmark(persistent.list.PersistentList)
+(bucketed_list_bytes, bucketed_list_seconds) = run_benchmark(RePlayBucketedList)
+
+print(f"Activity list with {existing_activity_count} activities, committing every {activities_per_commit} appended activities:")
+print(f"PersistentList:     {persistent_list_bytes / 1024:10.1f} KB written per commit, {persistent_list_seconds * 1000:8.2f} ms per commit")
+print(f"RePlayBucketedList: {bucketed_list_bytes / 1024:10.1f} KB written per commit, {bucketed_list_seconds * 1000:8.2f} ms per commit")
+
+# %%
+
+#Check that migrating an activity list keeps the same activities in the same order
+class BenchmarkRoot:
+    pass
+
+migration_root = BenchmarkRoot()
+migration_root.activity_list = persistent.list.PersistentList([create_activity(i) for i in range(0, 1000)])
+migration_root.participants = []
+original_activities = list(migration_root.activity_list)
+RePlayBucketedList.migrate_activity_lists(migration_root)
+
+assert isinstance(migration_root.activity_list, RePlayBucketedList)
+assert list(migration_root.activity_list) == original_activities
+assert [migration_root.activity_list[i] for i in range(0, 1000)] == original_activities
+assert migration_root.activity_list[-1] is original_activities[-1]
+print("Migration check passed")
+
+# %%
@@ -0,0 +1,90 @@
+##########################################################
+# Purpose: This script measures the per-frame cost of reading
+#   a game data frame with the original field-by-field approach
+#   (a new struct format string is looked up and compiled on every
+#   call) versus the precompiled record structs that are now
+#   available in RePlayDataFileStatic.
+#
+##########################################################
+
+# %%
+import sys
+import os.path as o
+sys.path.append(o.abspath(o.join(o.dirname(sys.modules[__name__].__file__), "..")))
+
+# %%
+
+import io
+import struct
+import time
+
+from RePlayAnalysisCore2.RePlayDataFileStatic import RePlayDataFileStatic
+
+# %%
+
+#This is the original implementation of read_byte_array, kept here as the baseline
+def legacy_read_byte_array(opened_file, desired_type):
+    type_dictionary = {'char': 'c', 'int': 'i', 'int32': 'i', 'int8': 'b', 'unsigned int': 'I',
+        'uint8': 'B', 'float': 'f', 'float64': 'd', 'double': 'd'}
+    length_dictionary = {'char': 2, 'int': 4, 'int32': 4, 'int8': 1, 'unsigned int': 4,
+        'uint8': 1, 'float': 4, 'float64': 8, 'double': 8}
+    return struct.unpack(type_dictionary[desired_type], opened_file.read(length_dictionary[desired_type]))[0]
+
+#This is the original implementation of read_16byte_guid, kept here as the baseline
+def legacy_read_16byte_guid(opened_file):
+    result = []
+    for _ in range(16):
+        result.append(legacy_read_byte_array(opened_file, 'uint8'))
+    return result
+
+# %%
+
+#Build a buffer of Breakout-style frames: a timestamp, the paddle/game state, and 3 balls
+number_of_frames = 50000
+balls_per_frame = 3
+frame = struct.pack('<dd', 738000.5, 0.5) + struct.pack('<ffii', 1.5, 2.5, 10, 3) + struct.pack('<i', balls_per_frame)
+for b in range(balls_per_frame):
+    frame += bytes(range(16)) + struct.pack('<4f', 1.0, 2.0, 3.0, 4.0)
+data = frame * number_of_frames
+
+# %%
+
+def read_frames_legacy(f):
+    for _ in range(number_of_frames):
+        legacy_read_byte_array(f, 'double')
+        legacy_read_byte_array(f, 'double')
+        state = []
+        state.append(legacy_read_byte_array(f, 'float'))
+        state.append(legacy_read_byte_array(f, 'float'))
+        state.append(legacy_read_byte_array(f, 'int32'))
+        state.append(legacy_read_byte_array(f, 'int32'))
+        num_balls = legacy_read_byte_array(f, 'int32')
+        for _ in range(num_balls):
+            ball = []
+            ball.append(legacy_read_16byte_guid(f))
+            ball.append(legacy_read_byte_array(f, 'float'))
+            ball.append(legacy_read_byte_array(f, 'float'))
+            ball.append(legacy_read_byte_array(f, 'float'))
+            ball.append(legacy_read_byte_array(f, 'float'))
+
+def read_frames_record(f):
+    for _ in range(number_of_frames):
+        RePlayDataFileStatic.read_record(f, ['double', 'double'])
+        state = []
+        state.extend(RePlayDataFileStatic.read_record(f, ['float', 'float', 'int32', 'int32']))
+        num_balls = RePlayDataFileStatic.read_byte_array(f, 'int32')
+        for _ in range(num_balls):
+            ball = []
+            ball.append(RePlayDataFileStatic.read_16byte_guid(f))
+            ball.extend(RePlayDataFileStatic.read_record(f, ['float', 'float', 'float', 'float']))
+
+# %%
+
+for (name, reader) in [("Field-by-field (original)", read_frames_legacy), ("Precompiled records", read_frames_record)]:
+    f = io.BytesIO(data)
+    start_time = time.perf_counter()
+    reader(f)
+    elapsed = time.perf_counter() - start_time
+    print(f"{name}: {elapsed:.3f} s total, {1e6 * elapsed / number_of_frames:.2f} us per frame")
+
+# %%
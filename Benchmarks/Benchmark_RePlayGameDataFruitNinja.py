@@ -0,0 +1,160 @@
+##########################################################
+# Purpose: This script measures how long it takes to calculate
+#   the FruitNinja touch and object trajectories (and the swipe
+#   accuracy, which uses both of them) by appending one point at
+#   a time to persistent mappings and lists, versus grouping the
+#   touch and fruit records by ID with NumPy, as is now done by
+#   RePlayGameDataFruitNinja. It also checks that both give
+#   exactly the same results.
+#
+##########################################################
+
+# %%
+import sys
+import os.path as o
+sys.path.append(o.abspath(o.join(o.dirname(sys.modules[__name__].__file__), "..")))
+
+# %%
+
+import random
+import time
+import numpy as np
+import persistent.mapping
+import persistent.list
+
+from RePlayAnalysisCore2.RePlayGameDataFruitNinja import RePlayGameDataFruitNinja
+from RePlayAnalysisCore2.RePlayRaggedArray import RePlayRaggedArray
+
+# %%
+
+#Build a FruitNinja session of about 10 minutes at 60 frames per second, with a swipe about every
+#2 seconds and a few fruit (or bombs) on the screen at a time
+number_of_frames = 36000
+random.seed(1)
+
+game_data = RePlayGameDataFruitNinja()
+game_data.signal_time = [i / 60.0 for i in range(number_of_frames)]
+game_data.touch_info = RePlayRaggedArray(RePlayGameDataFruitNinja.touch_record_dtype)
+game_data.fruit_data = RePlayRaggedArray(RePlayGameDataFruitNinja.fruit_record_dtype)
+game_data.total_fruit_hit = None
+
+touch_id = 0
+touch_frames_left = 0
+objects_alive = []
+next_object_id = 0
+for frame_idx in range(0, number_of_frames):
+    #Touches
+    if (touch_frames_left == 0) and (random.random() < 1 / 120):
+        touch_id += 1
+        touch_frames_left = random.randint(5, 30)
+    if (touch_frames_left > 0):
+        touch_frames_left -= 1
+        game_data.touch_info.AppendFrame([(random.uniform(0, 1920), random.uniform(0, 1080), touch_id, 1)])
+    else:
+        game_data.touch_info.AppendFrame([])
+
+    #Fruit and bombs
+    if (len(objects_alive) < 5) and (random.random() < 1 / 30):
+        objects_alive.append([next_object_id, random.randint(0, 1920), random.randint(60, 240), int(random.random() < 0.1)])
+        next_object_id += 1
+    frame_objects = []
+    for current_object in objects_alive:
+        current_object[2] -= 1
+        frame_objects.append((current_object[0], 10, 9.8, current_object[1], current_object[2] * 5, int(current_object[2] > 0),
+            current_object[3], frame_idx / 60.0))
+    objects_alive = [x for x in objects_alive if (x[2] > 0)]
+    game_data.fruit_data.AppendFrame(frame_objects)
+
+# %%
+
+#The previous implementations, which append each point to persistent mappings and lists
+
+def legacy_calculate_touch_trajectories(self):
+    touch_trajectories = persistent.mapping.PersistentMapping()
+    for t in range(0, len(self.touch_info)):
+        time_elapsed = self.signal_time[t]
+        for touch in RePlayRaggedArray.get_frame_records(self.touch_info, t):
+            touch_id = touch[2]
+            if (not (touch_id in touch_trajectories)):
+                new_touch_object = persistent.mapping.PersistentMapping()
+                new_touch_object["x"] = persistent.list.PersistentList()
+                new_touch_object["y"] = persistent.list.PersistentList()
+                new_touch_object["t"] = persistent.list.PersistentList()
+                touch_trajectories[touch_id] = new_touch_object
+            touch_trajectories[touch_id]["x"].append(touch[0])
+            touch_trajectories[touch_id]["y"].append(touch[1])
+            touch_trajectories[touch_id]["t"].append(time_elapsed)
+    return touch_trajectories
+
+def legacy_calculate_object_trajectories(self, only_fruit = False):
+    object_trajectories = persistent.mapping.PersistentMapping()
+    for t in range(0, len(self.fruit_data)):
+        time_elapsed = self.signal_time[t]
+        for object_data in RePlayRaggedArray.get_frame_records(self.fruit_data, t):
+            object_id = object_data[0]
+            if (object_data[6] and only_fruit):
+                continue
+            if (not (object_id in object_trajectories)):
+                new_object = persistent.mapping.PersistentMapping()
+                for field_name in ["t", "x", "y", "is_alive", "is_bomb"]:
+                    new_object[field_name] = persistent.list.PersistentList()
+                object_trajectories[object_id] = new_object
+            object_trajectories[object_id]["t"].append(time_elapsed)
+            object_trajectories[object_id]["x"].append(object_data[3])
+            object_trajectories[object_id]["y"].append(object_data[4])
+            object_trajectories[object_id]["is_alive"].append(object_data[5])
+            object_trajectories[object_id]["is_bomb"].append(object_data[6])
+    return object_trajectories
+
+def legacy_calculate_swipe_accuracy(self):
+    touch_trajectories = legacy_calculate_touch_trajectories(self)
+    fruit_trajectories = legacy_calculate_object_trajectories(self, only_fruit = True)
+    total_fruit_hit = 0
+    for f_key in fruit_trajectories:
+        if not (fruit_trajectories[f_key]["is_alive"][-1]):
+            total_fruit_hit += 1
+    return min(100, 100 * (total_fruit_hit / len(touch_trajectories)))
+
+# %%
+
+t = time.perf_counter()
+legacy_touch_trajectories = legacy_calculate_touch_trajectories(game_data)
+legacy_object_trajectories = legacy_calculate_object_trajectories(game_data)
+legacy_trajectories_seconds = time.perf_counter() - t
+
+t = time.perf_counter()
+legacy_swipe_accuracy = legacy_calculate_swipe_accuracy(game_data)
+legacy_swipe_accuracy_seconds = time.perf_counter() - t
+
+t = time.perf_counter()
+touch_trajectories = game_data.CalculateTouchTrajectories()
+object_trajectories = game_data.CalculateObjectTrajectories()
+trajectories_seconds = time.perf_counter() - t
+
+t = time.perf_counter()
+swipe_accuracy = game_data.CalculateSwipeAccuracy()
+swipe_accuracy_seconds = time.perf_counter() - t
+
+#The trajectories are kept in memory, so a second call does not calculate them again
+t = time.perf_counter()
+game_data.CalculateSwipeAccuracy()
+repeated_swipe_accuracy_seconds = time.perf_counter() - t
+
+print(f"FruitNinja session with {number_of_frames} frames, {len(touch_trajectories)} touches, and {len(object_trajectories)} objects:")
+print(f"Touch and object trajectories: {legacy_trajectories_seconds * 1000:10.1f} ms before, {trajectories_seconds * 1000:8.1f} ms after")
+print(f"CalculateSwipeAccuracy:        {legacy_swipe_accuracy_seconds * 1000:10.1f} ms before, {swipe_accuracy_seconds * 1000:8.1f} ms after " +
+    f"({repeated_swipe_accuracy_seconds * 1000:.3f} ms when called again)")
+
+# %%
+
+#Check that both implementations give the same trajectories (in the same order) and the same swipe accuracy
+assert list(touch_trajectories.keys()) == list(legacy_touch_trajectories.keys())
+for (k, v) in legacy_touch_trajectories.items():
+    assert all(touch_trajectories[k][field_name].tolist() == list(v[field_name]) for field_name in ["x", "y", "t"])
+assert list(object_trajectories.keys()) == list(legacy_object_trajectories.keys())
+for (k, v) in legacy_object_trajectories.items():
+    assert all(object_trajectories[k][field_name].tolist() == list(v[field_name]) for field_name in ["t", "x", "y", "is_alive", "is_bomb"])
+assert swipe_accuracy == legacy_swipe_accuracy
+print("Results check passed")
+
+# %%
@@ -0,0 +1,110 @@
+##########################################################
+# Purpose: This script measures how long it takes to find the
+#   sample index at which each touch (FruitNinja) or rep
+#   (RepetitionsMode) began, by scanning the signal's timestamps
+#   from the start for each of them, versus the binary searches
+#   that are now done by RePlayGameData.FindSignalTimeIndices.
+#   It also checks that both give exactly the same results.
+#
+##########################################################
+
+# %%
+import sys
+import os.path as o
+sys.path.append(o.abspath(o.join(o.dirname(sys.modules[__name__].__file__), "..")))
+
+# %%
+
+import random
+import time
+import numpy as np
+
+from datetime import datetime
+from datetime import timedelta
+
+from RePlayAnalysisCore2.RePlayGameData import RePlayGameData
+from RePlayAnalysisCore2.RePlayGameDataFruitNinja import RePlayGameDataFruitNinja
+from RePlayAnalysisCore2.RePlayGameDataRepetitionsMode import RePlayGameDataRepetitionsMode
+
+# %%
+
+#Build a session of about 10 minutes at 60 samples per second, with a touch (or a rep) about every 2 seconds
+number_of_samples = 36000
+number_of_touches = 300
+random.seed(1)
+
+signal_time = [i / 60.0 for i in range(number_of_samples)]
+signal_start_time = datetime(2021, 1, 1)
+signal_timenum = [signal_start_time + timedelta(seconds = t) for t in signal_time]
+
+touch_trajectories = {}
+for touch_id in range(0, number_of_touches):
+    touch_start_time = random.uniform(0, signal_time[-1] - 1)
+    touch_sample_count = random.randint(2, 30)
+    touch_trajectories[touch_id] = { "t" : [touch_start_time + (i / 60.0) for i in range(touch_sample_count)] }
+
+fruitninja_game_data = RePlayGameDataFruitNinja()
+fruitninja_game_data.signal_time = signal_time
+
+repetitions_game_data = RePlayGameDataRepetitionsMode()
+repetitions_game_data.signal_time = signal_time
+repetitions_game_data.signal_timenum = signal_timenum
+repetitions_game_data.signal_actual = list(np.sin(np.arange(number_of_samples) / 30.0))
+repetitions_game_data.rep_start_time = sorted([signal_start_time + timedelta(seconds = random.uniform(0, signal_time[-1]))
+    for _ in range(0, number_of_touches)])
+
+# %%
+
+#The previous implementations, which scan the timestamps from the start for each touch or rep
+
+def legacy_fruitninja_rep_start_idx(game_data, touch_trajectories):
+    result_rep_start_idx = []
+    for touch_key in touch_trajectories:
+        touch_start_time = touch_trajectories[touch_key]["t"][0]
+        touch_start_idx = next(x[0] for x in enumerate(game_data.signal_time) if x[1] >= touch_start_time)
+        result_rep_start_idx.append(touch_start_idx)
+    return result_rep_start_idx
+
+def legacy_repetitions_rep_start_idx(game_data, exercise_name):
+    result_rep_start_idx = []
+    result_time_moving = timedelta(seconds = 0)
+    for current_rep_start_time in game_data.rep_start_time:
+        try:
+            idx = next(x[0] for x in enumerate(game_data.signal_timenum) if x[1] >= current_rep_start_time)
+            result_rep_start_idx.append(idx)
+            (_, _, result_time_moving, _) = RePlayGameData.GetRepetitionData(game_data, exercise_name)
+        except:
+            continue
+    return (result_rep_start_idx, result_time_moving)
+
+# %%
+
+t = time.perf_counter()
+legacy_fruitninja_idx = legacy_fruitninja_rep_start_idx(fruitninja_game_data, touch_trajectories)
+legacy_fruitninja_seconds = time.perf_counter() - t
+
+t = time.perf_counter()
+(_, fruitninja_idx, _, _) = fruitninja_game_data.GetFruitNinjaRepetitionData(touch_trajectories)
+fruitninja_seconds = time.perf_counter() - t
+
+t = time.perf_counter()
+(legacy_repetitions_idx, legacy_repetitions_time_moving) = legacy_repetitions_rep_start_idx(repetitions_game_data, "Grip")
+legacy_repetitions_seconds = time.perf_counter() - t
+
+t = time.perf_counter()
+(_, repetitions_idx, repetitions_time_moving, _) = repetitions_game_data.GetRepetitionData("Grip")
+repetitions_seconds = time.perf_counter() - t
+
+print(f"Session with {number_of_samples} samples and {number_of_touches} touches (or reps):")
+print(f"FruitNinja rep start indices:      {legacy_fruitninja_seconds * 1000:10.1f} ms before, {fruitninja_seconds * 1000:8.1f} ms after (GetFruitNinjaRepetitionData)")
+print(f"RepetitionsMode rep start indices: {legacy_repetitions_seconds * 1000:10.1f} ms before, {repetitions_seconds * 1000:8.1f} ms after (GetRepetitionData)")
+
+# %%
+
+#Check that the binary searches find the same samples as the linear scans
+assert fruitninja_idx == legacy_fruitninja_idx
+assert repetitions_idx == legacy_repetitions_idx
+assert repetitions_time_moving == legacy_repetitions_time_moving
+print("Results check passed")
+
+# %%
@@ -0,0 +1,210 @@
+##########################################################
+# Purpose: This script measures how long it takes to calculate
+#   the TyperShark metrics (the expected keypress at each
+#   timepoint, the keypress accuracy, and the time spent moving)
+#   by stepping through every timepoint of a session, versus the
+#   event-based calculations that are now used by
+#   RePlayGameDataTyperShark. It also checks that both give
+#   exactly the same results.
+#
+##########################################################
+
+# %%
+import sys
+import os.path as o
+sys.path.append(o.abspath(o.join(o.dirname(sys.modules[__name__].__file__), "..")))
+
+# %%
+
+import random
+import time
+import numpy as np
+
+from datetime import timedelta
+
+from RePlayAnalysisCore2.RePlayGameDataTyperShark import RePlayGameDataTyperShark
+from RePlayAnalysisCore2.RePlayRaggedArray import RePlayRaggedArray
+
+# %%
+
+#Build a TyperShark session of about 10 minutes at 60 frames per second, with a few sharks
+#alive at a time and a keypress about twice per second
+number_of_frames = 36000
+random.seed(1)
+
+game_data = RePlayGameDataTyperShark(9)
+game_data.signal_time = [i / 60.0 for i in range(number_of_frames)]
+game_data.stage_type = []
+game_data.num_sharks_alive = []
+game_data.selected_shark_guid = []
+game_data.key_released_strings = []
+game_data.shark_info = RePlayRaggedArray(RePlayGameDataTyperShark.shark_record_dtype)
+
+words = ["cat", "dog", "fish", "shark", "ocean"]
+sharks = {}
+next_shark_id = 0
+for i in range(number_of_frames):
+    if (len(sharks) == 0) or (random.random() < 0.005):
+        sharks[next_shark_id] = None
+        next_shark_id += 1
+    if (len(sharks) > 3):
+        sharks.pop(next(iter(sharks)))
+
+    frame_records = []
+    for (shark_id, shark_state) in sharks.items():
+        guid = [(shark_id * 7 + j) % 256 for j in range(16)]
+        new_shark_data = None
+        if (shark_state is None):
+            new_shark_data = ["shark", 3, random.sample(words, 3)]
+            shark_state = [0, 0]
+            sharks[shark_id] = shark_state
+        if (random.random() < 0.03):
+            shark_state[1] += 1
+            if (shark_state[1] >= 3):
+                shark_state[0] += 1
+                shark_state[1] = 0
+        frame_records.append((guid, new_shark_data, shark_state[0], shark_state[1], 1.0, 2.0, 3.0, 4.0))
+
+    game_data.shark_info.AppendFrame(frame_records)
+    game_data.num_sharks_alive.append(len(frame_records))
+    game_data.selected_shark_guid.append(frame_records[0][0] if (random.random() < 0.8) else None)
+    game_data.stage_type.append("Normal" if (i < number_of_frames * 0.9) else "OceanFloor_ShipwreckBonus")
+    game_data.key_released_strings.append([random.choice("acdfghikorst")] if (random.random() < 0.03) else [])
+game_data.num_keys_released = [len(x) for x in game_data.key_released_strings]
+
+# %%
+
+#This is the original implementation of CalculateExpectedKeypresses, kept here as the baseline
+def legacy_calculate_expected_keypresses(self):
+    all_expected_keypresses = []
+    sharks = {}
+    for idx in range(0, len(self.signal_time)):
+        current_stage_type = self.stage_type[idx]
+        current_active_sharks = RePlayRaggedArray.get_frame_records(self.shark_info, idx)
+        num_sharks_alive = self.num_sharks_alive[idx]
+        alive_shark_guids = []
+        for s in range(num_sharks_alive):
+            this_shark_info = current_active_sharks[s]
+            this_shark_guid = str(this_shark_info[0])
+            alive_shark_guids.append(this_shark_guid)
+            this_shark_newsharkdata = this_shark_info[1]
+            if this_shark_newsharkdata is not None:
+                sharks[this_shark_guid] = {
+                    "shark_data" : this_shark_newsharkdata,
+                    "cur_word_idx" : 0,
+                    "cur_letter_idx" : 0,
+                    "updated_word_idx" : 0,
+                    "updated_letter_idx" : 0,
+                    "shark_killed" : False
+                }
+            sharks[this_shark_guid]["updated_word_idx"] = int(this_shark_info[2])
+            sharks[this_shark_guid]["updated_letter_idx"] = int(this_shark_info[3])
+
+        selected_shark_guid_raw = self.selected_shark_guid[idx]
+        selected_shark_guid = None
+        if selected_shark_guid_raw is not None:
+            selected_shark_guid = str(selected_shark_guid_raw)
+        if (current_stage_type == "SingleShark_WordAtBottom"):
+            if (len(current_active_sharks) > 0):
+                first_active_shark = current_active_sharks[0]
+                if (len(first_active_shark) > 0):
+                    selected_shark_guid = str(first_active_shark[0])
+        elif (current_stage_type == "OceanFloor_ShipwreckBonus"):
+            selected_shark_guid = None
+
+        if (selected_shark_guid is not None):
+            try:
+                cur_shark_word_idx = sharks[selected_shark_guid]["cur_word_idx"]
+                cur_shark_letter_idx = sharks[selected_shark_guid]["cur_letter_idx"]
+                this_word = sharks[selected_shark_guid]["shark_data"][2][cur_shark_word_idx]
+                expected_keypress = this_word[cur_shark_letter_idx]
+            except:
+                expected_keypress = None
+            all_expected_keypresses.append(expected_keypress)
+        else:
+            all_expected_keypresses.append(None)
+
+        for cur_shark_guid in alive_shark_guids:
+            sharks[cur_shark_guid]["cur_word_idx"] = sharks[cur_shark_guid]["updated_word_idx"]
+            sharks[cur_shark_guid]["cur_letter_idx"] = sharks[cur_shark_guid]["updated_letter_idx"]
+            if (sharks[cur_shark_guid]["cur_word_idx"] >= int(sharks[cur_shark_guid]["shark_data"][1])):
+                sharks[cur_shark_guid]["shark_killed"] = True
+
+    return (all_expected_keypresses, sharks)
+
+#This is the original keypress accuracy loop of CalculateTyperSharkMetrics, kept here as the baseline
+def legacy_calculate_keypress_accuracy(self):
+    (all_expected_keypresses, sharks) = legacy_calculate_expected_keypresses(self)
+    total_keypresses = 0
+    total_correct_keypresses = 0
+    for idx in range(0, len(self.signal_time)):
+        if (self.stage_type[idx] != "OceanFloor_ShipwreckBonus"):
+            cur_keypress = self.key_released_strings[idx]
+            cur_keypress = cur_keypress[0] if (len(cur_keypress) > 0) else None
+            if (cur_keypress is not None):
+                total_keypresses += 1
+                if (cur_keypress == all_expected_keypresses[idx]):
+                    total_correct_keypresses += 1
+    return (total_keypresses, total_correct_keypresses, sharks)
+
+#This is the original "time spent moving" calculation of GetRepetitionData, kept here as the baseline
+def legacy_calculate_time_spent_moving(self):
+    result_rep_idx = np.flatnonzero(np.array(self.num_keys_released) > 0)
+    temp_movement_array = np.zeros(len(self.signal_time))
+    for i in range(0, len(result_rep_idx)):
+        signal_time_idx = result_rep_idx[i]
+        keypress_signal_time = self.signal_time[signal_time_idx]
+        try:
+            keypress_start_idx = next(x[0] for x in enumerate(self.signal_time) if x[1] >= keypress_signal_time - 0.5)
+        except:
+            keypress_start_idx = signal_time_idx
+        try:
+            keypress_end_idx = next(x[0] for x in enumerate(self.signal_time) if x[1] >= keypress_signal_time + 0.5)
+        except:
+            keypress_end_idx = signal_time_idx
+        for j in range(keypress_start_idx, keypress_end_idx):
+            temp_movement_array[j] = 1
+    return (np.nansum(temp_movement_array) / len(self.signal_time)) * self.signal_time[-1]
+
+# %%
+
+t = time.perf_counter()
+legacy_expected_keypresses = legacy_calculate_expected_keypresses(game_data)
+legacy_expected_keypresses_seconds = time.perf_counter() - t
+
+t = time.perf_counter()
+(legacy_total_keypresses, legacy_total_correct_keypresses, legacy_sharks) = legacy_calculate_keypress_accuracy(game_data)
+legacy_accuracy_seconds = time.perf_counter() - t
+
+t = time.perf_counter()
+legacy_time_spent_moving = legacy_calculate_time_spent_moving(game_data)
+legacy_time_spent_moving_seconds = time.perf_counter() - t
+
+t = time.perf_counter()
+expected_keypresses = game_data.CalculateExpectedKeypresses()
+expected_keypresses_seconds = time.perf_counter() - t
+
+t = time.perf_counter()
+typershark_metrics = game_data.CalculateTyperSharkMetrics()
+metrics_seconds = time.perf_counter() - t
+
+t = time.perf_counter()
+repetition_data = game_data.GetRepetitionData("Typing")
+repetition_data_seconds = time.perf_counter() - t
+
+print(f"TyperShark session with {number_of_frames} frames and {sum(game_data.num_keys_released)} keypresses:")
+print(f"CalculateExpectedKeypresses: {legacy_expected_keypresses_seconds * 1000:10.1f} ms before, {expected_keypresses_seconds * 1000:8.1f} ms after")
+print(f"Keypress accuracy:           {legacy_accuracy_seconds * 1000:10.1f} ms before, {metrics_seconds * 1000:8.1f} ms after (CalculateTyperSharkMetrics)")
+print(f"Time spent moving:           {legacy_time_spent_moving_seconds * 1000:10.1f} ms before, {repetition_data_seconds * 1000:8.1f} ms after (GetRepetitionData)")
+
+# %%
+
+#Check that both implementations give exactly the same results
+assert expected_keypresses == legacy_expected_keypresses
+assert typershark_metrics[4] == legacy_total_keypresses
+assert typershark_metrics[5] == 100 * (legacy_total_correct_keypresses / legacy_total_keypresses)
+assert typershark_metrics[0] == sum(1 for s in legacy_sharks.values() if s["shark_killed"])
+assert repetition_data[2] == timedelta(seconds = legacy_time_spent_moving)
+print("Results check passed")
+
+# %%
@@ -37,18 +37,28 @@ from tkinter import Tk
 
 import traceback
 from datetime import datetime
+from datetime import timedelta
 
 
 from RePlayAnalysisCore2.ParticipantDemographics import ParticipantDemographics
 from RePlayAnalysisCore2.VisitsTable import VisitsTable
 from RePlayAnalysisCore2.LoadedFilesTable import LoadedFilesTable
+from RePlayAnalysisCore2.ActivitySummaryTable import ActivitySummaryTable
 from RePlayAnalysisCore2.ReadGoogleSpreadsheet import GoogleSheets
 from RePlayAnalysisCore2.RePlayAnalysisConfiguration import RePlayAnalysisConfiguration
 from RePlayAnalysisCore2.RePlayGUI import RePlayGUI
 from RePlayAnalysisCore2.RePlayDataFile import RePlayDataFile
+from RePlayAnalysisCore2.RePlayDataFileLoader import RePlayDataFileLoader
+from RePlayAnalysisCore2.RePlayMetricsCache import RePlayMetricsCache
 from RePlayAnalysisCore2.RePlayActivity import RePlayActivity
+from RePlayAnalysisCore2.RePlayActivityIndex import RePlayActivityIndex
+from RePlayAnalysisCore2.RePlayBucketedList import RePlayBucketedList
+from RePlayAnalysisCore2.RePlayCommitPolicy import RePlayCommitPolicy
 from RePlayAnalysisCore2.RePlayParticipant import RePlayParticipant
+from RePlayAnalysisCore2.RePlayParticipantIndex import RePlayParticipantIndex
 from RePlayAnalysisCore2.RePlayVisit import RePlayVisit
+from RePlayAnalysisCore2.RePlayVisitMatcher import RePlayVisitMatcher
+from RePlayAnalysisCore2.RePlayTreeTraversal import RePlayTreeTraversal
 from RePlayAnalysisCore2 import RePlayUtilities
 
 #Flags to determine which phases of this script to execute
@@ -57,46 +67,100 @@ ExecutePhase2 = True        #Phase 2: Load raw data files (this part takes the l
 ExecutePhase3 = True        #Phase 3: Add participants to the object tree structure if they are not already in it
 ExecutePhase4 = True        #Phase 4: Add visits to the object tree structure if they are not already in it
 ExecutePhase5 = True        #Phase 5: Find any activities that do not have a parent visit and match them with a parent visit
-
-#Ask the user for the location of the RePlay data files
-RePlayGUI.InitializeGUI()
-RePlayAnalysisConfiguration.ReadConfigurationFile(True)
-replay_data_location = RePlayAnalysisConfiguration.box_folder_location
-db_path = RePlayAnalysisConfiguration.database_location
-
-#Create or fetch the database file, and open a connection to the database
-storage = ZODB.FileStorage.FileStorage("replay_games_paper_db.fs")
-db = ZODB.DB(storage)
-db_connection = db.open()
-root = db_connection.root
-
-#Initialize the google sheets service
-GoogleSheets.InitializeGoogleSheets()
-
-#Create the participant data and visit data objects
-if not(hasattr(root, 'participant_demographics_table')):
-    root.participant_demographics_table = ParticipantDemographics()
-if not(hasattr(root, 'visits_table')):
-    root.visits_table = VisitsTable()
-if not(hasattr(root, 'loaded_files')):
-    root.loaded_files = LoadedFilesTable()
-if not(hasattr(root, 'activity_list')):
-    root.activity_list = persistent.list.PersistentList()
-if not(hasattr(root, 'participants')):
-    root.participants = persistent.list.PersistentList()
-
-if not(hasattr(root, "name")):
-    root.name = "RePlay Usability Study: \"RePlay Games Paper\""
-if not(hasattr(root, "last_update")):
+ExecutePhase6 = True        #Phase 6: Bring the activity summary table (which is used by the figure scripts) up to date
+
+#Flag to determine whether each data file is opened a single time and memory-mapped during phase 2
+UseMemoryMappedFiles = True
+
+#Flag to determine whether game signals are stored as numpy arrays (instead of lists) in the database
+UseColumnarSignals = False
+
+#Flag to determine whether game signals and controller signals are saved as their own records in the database,
+#so that they are only loaded when they are used (instead of every time an activity is loaded)
+UseExternalSignals = True
+
+#The number of worker processes that read data files during phase 2 (None = one per CPU core)
+Phase2NumberOfWorkers = None
+
+#How often loaded files are committed to the database during phase 2: after a number of files, after a number
+#of seconds, or after a number of bytes of data files have been loaded (None = not used). A savepoint is made
+#after every few files between commits, so that the changes which have not been committed yet do not have to
+#stay in memory (None = no savepoints).
+Phase2FilesPerCommit = 50
+Phase2SecondsPerCommit = 300
+Phase2BytesPerCommit = None
+Phase2FilesPerSavepoint = 10
+
+#How often the metrics that are calculated during phase 6 are committed to the database
+Phase6ActivitiesPerCommit = 500
+Phase6SecondsPerCommit = 60
+
+#Flag to determine whether files that were already loaded (and whose size and modification time have
+#not changed since then) are skipped during phase 2 without being opened
+UseFileManifest = True
+
+#The worker processes that read data files during phase 2 import this script on some platforms,
+#so the database is only opened (and the phases are only executed) in the main process
+IsMainProcess = (__name__ == "__main__")
+
+if IsMainProcess:
+    #Ask the user for the location of the RePlay data files
+    RePlayGUI.InitializeGUI()
+    RePlayAnalysisConfiguration.ReadConfigurationFile(True)
+    replay_data_location = RePlayAnalysisConfiguration.box_folder_location
+    db_path = RePlayAnalysisConfiguration.database_location
+
+    #Create or fetch the database file, and open a connection to the database
+    storage = ZODB.FileStorage.FileStorage("replay_games_paper_db.fs")
+    db = ZODB.DB(storage)
+    db_connection = db.open()
+    root = db_connection.root
+
+    #Initialize the google sheets service
+    GoogleSheets.InitializeGoogleSheets()
+
+    #Create the participant data and visit data objects
+    if not(hasattr(root, 'participant_demographics_table')):
+        root.participant_demographics_table = ParticipantDemographics()
+    if not(hasattr(root, 'visits_table')):
+        root.visits_table = VisitsTable()
+    if not(hasattr(root, 'loaded_files')):
+        root.loaded_files = LoadedFilesTable()
+    if not(hasattr(root, 'activity_list')):
+        root.activity_list = RePlayBucketedList()
+    if not(hasattr(root, 'activity_index')):
+        root.activity_index = RePlayActivityIndex()
+    if not(hasattr(root, 'participants')):
+        root.participants = persistent.list.PersistentList()
+    if not(hasattr(root, 'participant_index')):
+        root.participant_index = RePlayParticipantIndex()
+    if not(hasattr(root, 'visit_matcher')):
+        root.visit_matcher = RePlayVisitMatcher()
+    if not(hasattr(root, 'metrics_cache')):
+        root.metrics_cache = RePlayMetricsCache(maximum_age = timedelta(days = 365))
+    if not(hasattr(root, 'activity_summary_table')):
+        root.activity_summary_table = ActivitySummaryTable()
+
+    #Databases that were created before the activity lists were stored as RePlayBucketedLists are converted
+    #the first time this script is run on them
+    number_of_converted_lists = RePlayBucketedList.migrate_activity_lists(root)
+    if (number_of_converted_lists > 0):
+        print(f"Committing {number_of_converted_lists} converted activity lists...", end = "")
+        transaction.commit()
+        print("Complete")
+
+    if not(hasattr(root, "name")):
+        root.name = "RePlay Usability Study: \"RePlay Games Paper\""
+    if not(hasattr(root, "last_update")):
+        root.last_update = datetime.utcnow()
+
+    #Set the "last update" timestamp on the database to be the current date/time
     root.last_update = datetime.utcnow()
 
-#Set the "last update" timestamp on the database to be the current date/time
-root.last_update = datetime.utcnow()
-
 #region Phase 1
 # %%
 
-if ExecutePhase1:
+if IsMainProcess and ExecutePhase1:
 
     #Update the participant data
     sheet_id = "19Lbdkeljuk6lDtG5-Z0VoH6SMbIv35ZgjLYzFK2xvwM"
@@ -117,7 +181,7 @@ if ExecutePhase1:
 #region Phase 2
 # %%
 
-if ExecutePhase2:
+if IsMainProcess and ExecutePhase2:
 
     #Walk the directory tree and find all relevant files
     print ("Walking the directory tree to find relevant files...")
@@ -128,64 +192,27 @@ if ExecutePhase2:
                 f.extend([[dirpath, fn]])
 
     print("Loading files into the database...")
-    #If files were found, let's check to see if they exist in the database already
-    loaded_previously = 0
-    loaded_successfully = 0
-    loaded_unrecognized = 0
-    loaded_failed = 0
-    loaded_db_failed = 0
-    if len(f) > 0:
-        #Iterate through each file that was found...
-        for this_file in f:
-            #Make sure the file we are checking is the correct file type...
-            if this_file[1].lower().endswith(".txt"):
-
-                #Do an initial read of the file's metadata
-                this_full_file_path = this_file[0] + "/" + this_file[1]
-                success = False
-                try:
-                    this_file_data = RePlayDataFile(this_full_file_path)
-                    success = True
-                except:
-                    print ("THIS FILE DOESN'T LOOK LIKE A REPLAY FILE: " + this_file[1])
-                    loaded_unrecognized = loaded_unrecognized + 1
-                
-                if success:
-                    #Grab the participant id from the file
-                    participant_id = this_file_data.subject_id
-
-                    #Check to see if this file has already been loaded into the database
-                    already_loaded = root.loaded_files.IsFileAlreadyLoaded(this_file[1], this_file_data.md5_checksum)
-
-                    if not already_loaded:
-                        #If the file has not already been loaded, try to load the file's
-                        #data into memory
-                        try:
-                            #Read the whole file
-                            this_file_data.ReadData()
-
-                            #Add this file to the list of loaded files
-                            root.loaded_files.AppendLoadedFileToTable(participant_id, this_file[1], this_file_data.md5_checksum)
-
-                            #Update the list of activities
-                            RePlayActivity.AddSessionToActivityList(root.activity_list, this_file_data)
-                            
-                            print("Successfully loaded file: " + this_file[1], end = "")
-                            loaded_successfully = loaded_successfully + 1
-
-                            #Commit the transaction to the database
-                            transaction.commit()
-                            print (" (Partial commit complete)")
-                        except Exception as e:
-                            traceback.print_exc()
-                            print(e.__class__)
-                            print("FAILED TO LOAD FILE: " + this_file[1])
-                            loaded_failed = loaded_failed + 1
-
-                    else:
-                        print(this_file[1] + " was previously loaded into the database.")    
-                        loaded_previously = loaded_previously + 1                                                            
-                        loaded_successfully = loaded_successfully + 1
+    #Read the files using a pool of worker processes, and load them into the database
+    #from this process (committing after every few files)
+    phase2_commit_policy = RePlayCommitPolicy(
+        objects_per_commit = Phase2FilesPerCommit,
+        seconds_per_commit = Phase2SecondsPerCommit,
+        bytes_per_commit = Phase2BytesPerCommit,
+        objects_per_savepoint = Phase2FilesPerSavepoint,
+        commit_message = "(Partial commit complete)")
+    phase2_loader = RePlayDataFileLoader(root, 
+        number_of_workers = Phase2NumberOfWorkers, 
+        commit_policy = phase2_commit_policy, 
+        use_mmap = UseMemoryMappedFiles, 
+        use_columnar_signals = UseColumnarSignals,
+        use_file_manifest = UseFileManifest,
+        use_external_signals = UseExternalSignals)
+    phase2_loader.LoadFiles(f)
+
+    loaded_previously = phase2_loader.loaded_previously
+    loaded_successfully = phase2_loader.loaded_successfully
+    loaded_unrecognized = phase2_loader.loaded_unrecognized
+    loaded_failed = phase2_loader.loaded_failed
 
     #Commit the transaction to the database
     print ("Committing ALL phase 2 changes...", end = "")
@@ -197,15 +224,17 @@ if ExecutePhase2:
 #region Phase 3
 # %%
 
-if ExecutePhase3:
+if IsMainProcess and ExecutePhase3:
 
     #Now add participants to the participant tree structure if they are not already in it
-    for _, p in root.participant_demographics_table.participants.iterrows():
-        current_participant = next((x for x in root.participants if x.uid == p["UID"]), None)
+    root.participant_index.Update(root.participants)
+    for participant_uid in root.participant_demographics_table.participants["UID"].tolist():
+        current_participant = root.participant_index.FindParticipant(participant_uid)
         if (current_participant is None):
             current_participant = RePlayParticipant()
-            current_participant.uid = p["UID"]
+            current_participant.uid = participant_uid
             root.participants.append(current_participant)
+            root.participant_index.Update(root.participants)
 
     #Commit the transaction to the database
     print ("Committing phase 3 changes...", end = "")
@@ -217,10 +246,11 @@ if ExecutePhase3:
 #region Phase 4
 # %%
 
-if ExecutePhase4:
+if IsMainProcess and ExecutePhase4:
 
     #Now loop through the visits table and add visits to the tree structure as appropriate
-    for _, v in root.visits_table.visits.iterrows():
+    root.participant_index.Update(root.participants)
+    for v in root.visits_table.visits.to_dict("records"):
 
         #Calculate the bounds of this visit
         try:
@@ -229,37 +259,21 @@ if ExecutePhase4:
             #If we fail to calculate the bounds, then go on to the next visit
             continue
 
-        #Grab the participant ID from this visit
-        current_participant_uid = v["UID"]
-
         #Find this participant in the tree structure
-        current_participant = None
-        for p in root.participants:
-            if p.uid == current_participant_uid:
-                current_participant = p
-                break
-
-        #If the participant was found...
-        if (current_participant is not None):
-            #Check to see if this visit already exists for this participant
-            existing_visit = None
-            for cur_existing_visit in current_participant.visits:
-                if ((cur_existing_visit.start_time == start_time) and (cur_existing_visit.end_time == end_time)):
-                    existing_visit = cur_existing_visit
-                    break
-            
-            #If not, then add it
-            if (existing_visit is None):
-                new_visit = RePlayVisit()
-                new_visit.start_time = start_time
-                new_visit.end_time = end_time
-                new_visit.assignment_name = v["Prescription"]
-                if (v["Setting"] == "Clinic"):
-                    new_visit.is_at_home_visit = False
-                else:
-                    new_visit.is_at_home_visit = True
-
-                current_participant.visits.append(new_visit)
+        current_participant = root.participant_index.FindParticipant(v["UID"])
+
+        #If the participant was found, and this visit does not already exist for this participant, then add it
+        if (current_participant is not None) and (current_participant.FindVisit(start_time, end_time) is None):
+            new_visit = RePlayVisit()
+            new_visit.start_time = start_time
+            new_visit.end_time = end_time
+            new_visit.assignment_name = v["Prescription"]
+            if (v["Setting"] == "Clinic"):
+                new_visit.is_at_home_visit = False
+            else:
+                new_visit.is_at_home_visit = True
+
+            current_participant.AddVisit(new_visit)
 
     #Commit the transaction to the database
     print ("Committing phase 4 changes...", end = "")
@@ -271,38 +285,12 @@ if ExecutePhase4:
 #region Phase 5
 # %%
 
-if ExecutePhase5:
-
-    #Now let's go through and find activities that need parent visits
-    all_existing_uids = [x.uid for x in root.participants]
-    for i in range(0, len(root.activity_list)):
-        current_activity = root.activity_list[i]
-        if (current_activity.parent_visit is None):
-            activity_time = current_activity.start_time
-
-            #Iterate over participants and visits
-            for p in root.participants:
-                for v in p.visits:
-                    #If this activity falls within this visit for this participant, then maybe it belongs
-                    #to this participant...
-                    is_time_in_range = RePlayUtilities.time_in_range(v.start_time, v.end_time, activity_time)
-                    if (is_time_in_range):
-                        do_i_parent = True
-
-                        if (current_activity.uid == p.uid):
-                            #If the participant IDs match, then it definitely belongs
-                            do_i_parent = True
-                        elif (current_activity.uid in all_existing_uids):
-                            #If the participant ID matches a DIFFERENT participant, then it does NOT belong
-                            do_i_parent = False
-                        else:
-                            #Otherwise, assume it belongs
-                            do_i_parent = True
-                        
-                        #Set the parent visit of this activity if the flag is true
-                        if (do_i_parent):
-                            current_activity.parent_visit = v
-                            v.activities.append(current_activity)
+if IsMainProcess and ExecutePhase5:
+
+    #Now let's go through and find activities that need parent visits. Only the activities that have been
+    #added since the last time this phase was executed (and activities that did not have a matching visit
+    #at that time) are checked.
+    root.visit_matcher.AssignParentVisits(root.activity_list, root.participants)
 
     #Commit the transaction to the database
     print ("Committing phase 5 changes...", end = "")
@@ -311,10 +299,34 @@ if ExecutePhase5:
 
 #endregion
 
+#region Phase 6
+# %%
+
+if IsMainProcess and ExecutePhase6:
+
+    #Update the activity summary table with the participants, visits, and activities in the database. The metrics
+    #of an activity are only calculated if the activity is new, or if its data files have changed.
+    phase6_commit_policy = RePlayCommitPolicy(
+        objects_per_commit = Phase6ActivitiesPerCommit,
+        seconds_per_commit = Phase6SecondsPerCommit,
+        commit_message = "(Partial commit complete)")
+    phase6_traversal = RePlayTreeTraversal(db_connection)
+    number_of_changed_rows = root.activity_summary_table.Refresh(root.participants, root.metrics_cache, 
+        phase6_commit_policy, phase6_traversal)
+    print (f"Updated {number_of_changed_rows} rows of the activity summary table")
+
+    #Commit the transaction to the database
+    print ("Committing phase 6 changes...", end = "")
+    transaction.commit()
+    print ("Complete")
+
+#endregion
+
 # %%
 
-print ("DONE!")
+if IsMainProcess:
+    print ("DONE!")
 
-#Close the connection to the database
-db_connection.close()
+    #Close the connection to the database
+    db_connection.close()
 # %%
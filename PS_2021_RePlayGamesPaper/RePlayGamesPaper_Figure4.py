@@ -48,6 +48,8 @@ from RePlayAnalysisCore2.RePlayActivity import RePlayActivity
 from RePlayAnalysisCore2.RePlayParticipant import RePlayParticipant
 from RePlayAnalysisCore2.RePlayVisit import RePlayVisit
 from RePlayAnalysisCore2.RePlaySignalAnalyzer import RePlaySignalAnalyzer
+from RePlayAnalysisCore2.ActivitySummaryTable import ActivitySummaryTable
+from RePlayAnalysisCore2.RePlayTreeTraversal import RePlayTreeTraversal
 from RePlayAnalysisCore2 import RePlayUtilities
 
 #Initialize colorama
@@ -65,14 +67,24 @@ db = ZODB.DB(storage)
 db_connection = db.open()
 root = db_connection.root
 
+#Walk over the participants, visits, and activities with a limited object cache, so that memory use
+#does not keep growing as more activities are analyzed
+traversal = RePlayTreeTraversal(db_connection, cache_size_bytes = 512 * 1024 * 1024)
+
 #Define a couple of things that will be used later in the script when it comes time to save figures
 current_date_str = datetime.now().strftime("%Y_%m_%d")
 figure_path = RePlayAnalysisConfiguration.figure_saving_location + f"/{current_date_str}/"
 Path(figure_path).mkdir(parents=True, exist_ok=True)
 
-#define the tag used to hold metadata for this figure
-this_script_tag = "PS_2021_RePlayGamesPaper_Figure4_Metadata"
-refresh_all_metadata = False
+#Flag to determine whether the activity summary table is brought up to date before it is used. This is not needed
+#if phase 6 of CreateDB was run after data was last loaded into the database (the table is always refreshed if
+#the database does not have one yet). Only activities that are new, or whose data files have changed, have
+#their metrics calculated.
+refresh_activity_summary = False
+
+#Grab the activity summary table as a pandas DataFrame
+activity_summary_table = ActivitySummaryTable.get_or_create(root, traversal, refresh_activity_summary)
+activity_summary = activity_summary_table.activity_summary
 
 #Create a structure to store the summary data
 participant_data = pandas.DataFrame([], columns = [
@@ -98,18 +110,17 @@ participant_data = pandas.DataFrame([], columns = [
 script_start_time = datetime.now()
 debuging_mode = True
 
-for current_participant in root.participants:
-    if (current_participant.uid is None):
-        continue
-    if (not ("marked_for_exclusion" in current_participant.tags)):
+for (_, participant_rows) in activity_summary.groupby("ParticipantPosition", sort = True):
+    current_participant_uid = participant_rows["UID"].iloc[0]
+    if (pandas.isna(current_participant_uid)):
         continue
-    if (current_participant.tags["marked_for_exclusion"]):
+    if (participant_rows["ParticipantExcluded"].iloc[0]):
         continue
 
     #Printer a header for this participant to the console
-    print(f"Analyzing data for participant {Fore.GREEN}{str(current_participant.uid)}{Style.RESET_ALL}", end = "")
+    print(f"Analyzing data for participant {Fore.GREEN}{str(current_participant_uid)}{Style.RESET_ALL}", end = "")
 
-    dfrow = root.participant_demographics_table.participants.loc[root.participant_demographics_table.participants["UID"] == current_participant.uid]
+    dfrow = root.participant_demographics_table.participants.loc[root.participant_demographics_table.participants["UID"] == current_participant_uid]
     injury_type = dfrow["InjuryType"].values[0]
     print(f" ({injury_type})")
     try:
@@ -131,13 +142,16 @@ for current_participant in root.participants:
     this_participant_percentactiveathomedaily = []
     this_participant_percentactiveathome = 0
 
-    for current_visit in current_participant.visits:
-        if (current_visit.tags["marked_for_exclusion"]):
+    for (_, visit_rows) in participant_rows[participant_rows["VisitPosition"] >= 0].groupby("VisitPosition", sort = True):
+        if (visit_rows["VisitExcluded"].iloc[0]):
             continue
 
+        current_visit_is_at_home_visit = bool(visit_rows["VisitIsAtHome"].iloc[0])
+        current_visit_assignment_name = visit_rows["VisitAssignmentName"].iloc[0]
+
         should_we_consider_this_visit = True
-        if (not (current_visit.is_at_home_visit)):
-            if ((current_visit.assignment_name == "Day 1") or (current_visit.assignment_name == "RePlay") or (current_visit.assignment_name == "Rx A: Mild")):
+        if (not (current_visit_is_at_home_visit)):
+            if ((current_visit_assignment_name == "Day 1") or (current_visit_assignment_name == "RePlay") or (current_visit_assignment_name == "Rx A: Mild")):
                 should_we_consider_this_visit = True
             else:
                 should_we_consider_this_visit = False
@@ -149,61 +163,22 @@ for current_participant in root.participants:
         this_visit_total_time_active = []
         this_visit_total_time = []
 
-        this_visit_dates = current_visit.GetDatesInRangeOfVisit(current_visit.is_at_home_visit)
+        #Grab the activities of this visit that have not been excluded
+        activity_rows = visit_rows[(visit_rows["ActivityPosition"] >= 0) & (visit_rows["ActivityExcluded"] == False)]
+
+        this_visit_dates = RePlayVisit.get_dates_in_range(visit_rows["VisitStartTime"].iloc[0], visit_rows["VisitEndTime"].iloc[0], 
+            current_visit_is_at_home_visit)
         for current_date in this_visit_dates:
-            this_date_activities = current_visit.GetActivitiesOnDate(current_date)
-
-            this_date_total_reps = 0
-            this_date_total_time_active = 0
-            this_date_total_time = 0
-
-            for current_activity in this_date_activities:
-                #If this activity is marked for exclusion, then skip it
-                if (current_activity.tags["marked_for_exclusion"]):
-                    continue
-
-                #Instantiate some variables to hold data for this session
-                this_session_duration = 0
-                this_session_total_reps = 0
-                this_session_time_moving = timedelta(seconds = 0)
-
-                #If metadata for this session has not previously been calculated, OR
-                #if the user of this script wants to re-calculate the data, then...
-                if ((this_script_tag not in current_activity.tags) or (refresh_all_metadata)):
-                    
-                    #Grab the session duration
-                    if (current_activity.game_data is not None):
-                        if (current_activity.game_data.game_data is not None):
-                            if ((current_activity.game_data.game_data.signal_time is not None) and 
-                                (len(current_activity.game_data.game_data.signal_time) > 0)):
-                                this_session_duration = current_activity.game_data.game_data.signal_time[-1]
-                                if (math.isnan(this_session_duration)):
-                                    this_session_duration = 0
-                                elif (math.isinf(this_session_duration)):
-                                    this_session_duration = 0
-
-                    #Grab the repetition data for this session
-                    (this_session_total_reps, _, this_session_time_moving, _) = current_activity.GetRepetitionData()
-
-                    #Add metadata about this current activity to the database
-                    if (this_script_tag not in current_activity.tags):
-                        current_activity.tags[this_script_tag] = persistent.mapping.PersistentMapping()
-                    current_activity.tags[this_script_tag]["this_session_duration"] = this_session_duration
-                    current_activity.tags[this_script_tag]["this_session_total_reps"] = this_session_total_reps
-                    current_activity.tags[this_script_tag]["this_session_time_moving"] = this_session_time_moving
-                    transaction.commit()
-                else:
-                    #If we reach this piece of code, it means that metadata has previously been calculated
-                    #for this session, AND the user doesn't want to re-calculate it. Therefore, we will use
-                    #the previously calculated metadata. This will increase the speed of running the script.
-                    this_session_duration = current_activity.tags[this_script_tag]["this_session_duration"]
-                    this_session_total_reps = current_activity.tags[this_script_tag]["this_session_total_reps"]
-                    this_session_time_moving = current_activity.tags[this_script_tag]["this_session_time_moving"]
-
-                #Add the data for this session to the data for the current date
-                this_date_total_reps += this_session_total_reps
-                this_date_total_time_active += this_session_time_moving.total_seconds()
-                this_date_total_time += this_session_duration
+            #Find the activities that occurred on this date (see RePlayVisit.GetActivitiesOnDate)
+            desired_start_time = datetime.combine(current_date, datetime.min.time())
+            desired_end_time = desired_start_time.replace(hour = 23, minute = 59, second = 59)
+            this_date_activity_rows = activity_rows[(activity_rows["ActivityStartTime"] >= desired_start_time) & 
+                (activity_rows["ActivityStartTime"] <= desired_end_time)]
+
+            #Add up the data for the sessions on the current date
+            this_date_total_reps = sum(this_date_activity_rows["RepCount"].tolist())
+            this_date_total_time_active = sum(this_date_activity_rows["TimeMoving"].tolist())
+            this_date_total_time = sum(this_date_activity_rows["Duration"].tolist())
                 
             this_visit_total_reps.append(this_date_total_reps)
             this_visit_total_time_active.append(this_date_total_time_active)
@@ -231,7 +206,7 @@ for current_participant in root.participants:
         else:
             this_visit_total_time_active_summed = 0
 
-        if (current_visit.is_at_home_visit):
+        if (current_visit_is_at_home_visit):
             this_participant_repsathomedaily = this_visit_total_reps
             this_participant_repsathome = this_visit_total_reps_per_day
             this_participant_durationathomedaily = this_visit_total_time
@@ -252,7 +227,7 @@ for current_participant in root.participants:
         this_participant_percentactiveday1 = 0
 
     participant_data = participant_data.append({
-        "UID" : current_participant.uid, 
+        "UID" : current_participant_uid, 
         "Group" : participant_group_id,
         "InjuryType" : injury_type,
         "RepsDay1" : this_participant_repsday1, 
@@ -269,6 +244,7 @@ for current_participant in root.participants:
 script_end_time = datetime.now()
 script_running_time = script_end_time - script_start_time
 print(f"Running duration of script: {script_running_time}")
+traversal.PrintMemoryReport()
 print("")
 
 #endregion
@@ -54,6 +54,8 @@ from RePlayAnalysisCore2.RePlayGameDataRepetitionsMode import RePlayGameDataRepe
 from RePlayAnalysisCore2.RePlayGameDataSpaceRunner import RePlayGameDataSpaceRunner
 from RePlayAnalysisCore2.RePlayGameDataTrafficRacer import RePlayGameDataTrafficRacer
 from RePlayAnalysisCore2.RePlayGameDataTyperShark import RePlayGameDataTyperShark
+from RePlayAnalysisCore2.ActivitySummaryTable import ActivitySummaryTable
+from RePlayAnalysisCore2.RePlayTreeTraversal import RePlayTreeTraversal
 from RePlayAnalysisCore2 import RePlayUtilities
 
 #Initialize colorama
@@ -71,6 +73,10 @@ db = ZODB.DB(storage)
 db_connection = db.open()
 root = db_connection.root
 
+#Walk over the participants, visits, and activities with a limited object cache, so that memory use
+#does not keep growing as more activities are analyzed
+traversal = RePlayTreeTraversal(db_connection, cache_size_bytes = 512 * 1024 * 1024)
+
 #Define a couple of things that will be used later in the script when it comes time to save figures
 current_date_str = datetime.now().strftime("%Y_%m_%d")
 figure_path = RePlayAnalysisConfiguration.figure_saving_location + f"/{current_date_str}/"
@@ -90,33 +96,33 @@ participant_data = pandas.DataFrame([],
 
 # %%
 
+#Flag to determine whether the activity summary table is brought up to date before it is used. This is not needed
+#if phase 6 of CreateDB was run after data was last loaded into the database (the table is always refreshed if
+#the database does not have one yet). Only activities that are new, or whose data files have changed, have
+#their metrics calculated.
+refresh_activity_summary = False
+
+#Grab the activity summary table as a pandas DataFrame
+activity_summary_table = ActivitySummaryTable.get_or_create(root, traversal, refresh_activity_summary)
+activity_summary = activity_summary_table.activity_summary
+
 #Get a starttime for the script
 script_start_time = datetime.now()
 
 #Iterate over every participant in the study
-for current_participant in root.participants:
+for (_, participant_rows) in activity_summary.groupby("ParticipantPosition", sort = True):
     #Skip this participant if the participant has been explicitly excluded
-    if (current_participant.uid is None):
+    current_participant_uid = participant_rows["UID"].iloc[0]
+    if (pandas.isna(current_participant_uid)):
         continue
-    if (not ("marked_for_exclusion" in current_participant.tags)):
-        continue
-    if (current_participant.tags["marked_for_exclusion"]):
+    if (participant_rows["ParticipantExcluded"].iloc[0]):
         continue
 
     #Printer a header for this participant to the console
-    print(f"Analyzing data for participant {Fore.GREEN}{str(current_participant.uid)}{Style.RESET_ALL}")
-
-    #Create some empty arrays that will hold the data for this participant
-    breakout_data = []
-    breakout_data_2 = []
-    spacerunner_data = []
-    trafficracer_data = []
-    fruitarchery_data = []
-    fruitninja_data = []
-    typershark_data = []
+    print(f"Analyzing data for participant {Fore.GREEN}{str(current_participant_uid)}{Style.RESET_ALL}")
 
     #Determine the experimental group of this participant
-    dfrow = root.participant_demographics_table.participants.loc[root.participant_demographics_table.participants["UID"] == current_participant.uid]
+    dfrow = root.participant_demographics_table.participants.loc[root.participant_demographics_table.participants["UID"] == current_participant_uid]
     try:
         hasbraininjury = dfrow["HasBrainInjury"].values[0]
     except:
@@ -125,53 +131,25 @@ for current_participant in root.participants:
     if(hasbraininjury == "Y"):
         participant_group_id = "Injury"
 
-    #Iterate over each visit for this participant
-    for current_visit in current_participant.visits:
-        #Check to see if this visit has been completely excluded
-        if (current_visit.tags["marked_for_exclusion"]):
-            continue
-
-        #Determine if we should consider this visit for the purposes of this figure
-        should_we_consider_this_visit = False
-        if (not (current_visit.is_at_home_visit)):
-            if ((current_visit.assignment_name == "Day 1") or (current_visit.assignment_name == "RePlay") or (current_visit.assignment_name == "Rx A: Mild")):
-                should_we_consider_this_visit = True
-
-        #Skip this visit if it has been determined we aren't using it for this figure
-        if (not (should_we_consider_this_visit)):
-            continue
-
-        #Iterate over every activity of this visit
-        for current_activity in current_visit.activities:
-            #Skip this activity if it has been explicitly excluded
-            if (current_activity.tags["marked_for_exclusion"]):
-                continue
-
-            if (current_activity.game_data is not None):
-                if (current_activity.game_data.game_data is not None):
-                    #Get the game data object from this activity
-                    current_game_data = current_activity.game_data.game_data
-
-                    #If this was a Breakout session...
-                    if (isinstance(current_game_data, RePlayGameDataBreakout)):
-                        (num_balls_lost, _, _, ball_loss_interval, _) = current_game_data.CalculateBreakoutGameMetrics()
-                        breakout_data.append(ball_loss_interval)
-                        breakout_data_2.append(num_balls_lost)
-                    elif (isinstance(current_game_data, RePlayGameDataSpaceRunner)):
-                        (_, _, attempt_durations, _, _) = current_game_data.CalculateSpaceRunnerMetrics()
-                        spacerunner_data.extend(attempt_durations)
-                    elif (isinstance(current_game_data, RePlayGameDataTrafficRacer)):
-                        percent_time_in_target_lane = current_game_data.CalculatePercentTimeInTargetLane()
-                        trafficracer_data.append(percent_time_in_target_lane)
-                    elif (isinstance(current_game_data, RePlayGameDataFruitArchery)):
-                        fruit_hit_per_minute = current_game_data.CalculateFruitHitPerMinute()
-                        fruitarchery_data.append(fruit_hit_per_minute)
-                    elif (isinstance(current_game_data, RePlayGameDataFruitNinja)):
-                        swipe_accuracy = current_game_data.CalculateSwipeAccuracy()
-                        fruitninja_data.append(swipe_accuracy)
-                    elif (isinstance(current_game_data, RePlayGameDataTyperShark)):
-                        (_, _, _, _, _, _, words_per_minute, _, _, _, _) = current_game_data.CalculateTyperSharkMetrics()
-                        typershark_data.append(words_per_minute)
+    #Grab the activities that should be considered for the purposes of this figure: activities that have not
+    #been excluded, from visits that have not been excluded and that took place in the clinic on "Day 1",
+    #or with the "RePlay" or "Rx A: Mild" assignment
+    activity_rows = participant_rows[
+        (participant_rows["VisitPosition"] >= 0) & 
+        (participant_rows["ActivityPosition"] >= 0) &
+        (participant_rows["VisitExcluded"] == False) &
+        (participant_rows["VisitIsAtHome"] == False) &
+        (participant_rows["VisitAssignmentName"].isin(["Day 1", "RePlay", "Rx A: Mild"])) &
+        (participant_rows["ActivityExcluded"] == False)]
+
+    #Grab the data for this participant. Each metric column only has a value for activities of its own game.
+    breakout_data = activity_rows["BreakoutBallLossInterval"].dropna().tolist()
+    breakout_data_2 = activity_rows["BreakoutBallsLost"].dropna().tolist()
+    spacerunner_data = [d for attempt_durations in activity_rows["SpaceRunnerAttemptDurations"].dropna() for d in attempt_durations]
+    trafficracer_data = activity_rows["TrafficRacerPercentTimeInTargetLane"].dropna().tolist()
+    fruitarchery_data = activity_rows["FruitArcheryFruitHitPerMinute"].dropna().tolist()
+    fruitninja_data = activity_rows["FruitNinjaSwipeAccuracy"].dropna().tolist()
+    typershark_data = activity_rows["TyperSharkWordsPerMinute"].dropna().tolist()
 
     #Calculate the mean statistic for each game for this participant
     breakout_mean = numpy.nanmean(breakout_data)
@@ -184,7 +162,7 @@ for current_participant in root.participants:
 
     #Add a row representing this participant to the participant dataframe
     participant_data = participant_data.append({
-        "UID" : current_participant.uid, 
+        "UID" : current_participant_uid, 
         "Group" : participant_group_id,
         "Breakout" : breakout_mean,
         "Breakout2" : breakout2_mean, 
@@ -195,6 +173,12 @@ for current_participant in root.participants:
         "TyperShark" : typershark_mean 
         }, ignore_index = True)
 
+script_end_time = datetime.now()
+script_running_time = script_end_time - script_start_time
+print(f"Running duration of script: {script_running_time}")
+traversal.PrintMemoryReport()
+print("")
+
 # %%
 
 # Now let's define a method that we will use to create our bar plots
@@ -0,0 +1,297 @@
+import persistent
+import pandas
+import math
+
+from datetime import timedelta
+from BTrees.OOBTree import OOBTree
+
+from .RePlayActivity import RePlayActivity
+from .RePlayCommitPolicy import RePlayCommitPolicy
+from .RePlayMetricsCache import RePlayMetricsCache
+from .RePlayGameDataBreakout import RePlayGameDataBreakout
+from .RePlayGameDataFruitArchery import RePlayGameDataFruitArchery
+from .RePlayGameDataFruitNinja import RePlayGameDataFruitNinja
+from .RePlayGameDataSpaceRunner import RePlayGameDataSpaceRunner
+from .RePlayGameDataTrafficRacer import RePlayGameDataTrafficRacer
+from .RePlayGameDataTyperShark import RePlayGameDataTyperShark
+
+#This class is a table that summarizes every activity of every visit of every participant, with one row for each
+#(participant, visit, activity). Participants that do not have any visits, and visits that do not have any activities,
+#have a single row in which the visit and activity columns are empty (and the visit or activity position is -1).
+#Each row holds:
+#   1. the participant's uid, and whether the participant has been excluded,
+#   2. the visit's start time, end time, setting and assignment, and whether the visit has been excluded,
+#   3. the activity's start time and game, and whether the activity has been excluded, and
+#   4. metrics of the activity: its duration, repetitions, time spent moving, and the metrics of each game.
+#An object that does not have a "marked_for_exclusion" tag is treated as if it has been excluded. The metrics of
+#an activity are only calculated if the activity, its visit, and its participant have not been excluded (otherwise
+#the metric columns are empty).
+#
+#The table is saved in the database, so figure scripts can get all of these values as a pandas DataFrame (see the
+#activity_summary property) without loading any game data. The table is brought up to date by calling Refresh,
+#which should be done after new data has been loaded into the database. The metrics of each activity are saved in
+#the metrics cache (see RePlayMetricsCache), so Refresh only calculates the metrics of activities that are new or
+#whose data files have changed.
+class ActivitySummaryTable(persistent.Persistent):
+
+    #The name and version of the activity metrics calculation (see RePlayMetricsCache). The version should be
+    #increased whenever calculate_activity_metrics changes in a way that could change its results.
+    activity_metrics_algorithm_name = "ActivitySummaryTable.calculate_activity_metrics"
+    activity_metrics_algorithm_version = 2
+
+    #The errors that are expected when the metrics of a game cannot be calculated from an activity's data
+    #(for example, a session that ended before any of the game's events were recorded)
+    game_metrics_errors = (ArithmeticError, LookupError, ValueError, TypeError, AttributeError, StopIteration)
+
+    #The columns of the table
+    column_names = [
+        "ParticipantPosition",
+        "VisitPosition",
+        "ActivityPosition",
+        "UID",
+        "ParticipantExcluded",
+        "VisitStartTime",
+        "VisitEndTime",
+        "VisitIsAtHome",
+        "VisitAssignmentName",
+        "VisitExcluded",
+        "ActivityStartTime",
+        "ActivityName",
+        "ActivityExcluded",
+        "GameDataType",
+        "Duration",
+        "RepCount",
+        "TimeMoving",
+        "BreakoutBallsLost",
+        "BreakoutBallLossInterval",
+        "SpaceRunnerAttemptDurations",
+        "TrafficRacerPercentTimeInTargetLane",
+        "FruitArcheryFruitHitPerMinute",
+        "FruitNinjaSwipeAccuracy",
+        "TyperSharkWordsPerMinute"
+    ]
+
+    #Constructor
+    def __init__(self):
+        #The rows of the table, indexed by (participant position, visit position, activity position)
+        self.rows = OOBTree()
+
+    #This property returns the table as a pandas DataFrame (with the columns in column_names, ordered by
+    #participant, visit, and activity). The DataFrame is only created when it is needed, and it is not saved
+    #to the database.
+    @property
+    def activity_summary(self):
+        activity_summary_dataframe = getattr(self, "_v_activity_summary", None)
+        if activity_summary_dataframe is None:
+            activity_summary_dataframe = pandas.DataFrame([k + v for (k, v) in self.rows.items()],
+                columns = ActivitySummaryTable.column_names, dtype = object)
+
+            #The metric columns (from "Duration" onwards) are left as python objects, so that each value is exactly
+            #the value that was calculated (integers are not converted to floats because some rows are empty)
+            other_column_names = ActivitySummaryTable.column_names[0:ActivitySummaryTable.column_names.index("Duration")]
+            activity_summary_dataframe[other_column_names] = activity_summary_dataframe[other_column_names].infer_objects()
+            self._v_activity_summary = activity_summary_dataframe
+        return activity_summary_dataframe
+
+    #This method brings the table up to date with the participants, their visits, and the activities of each visit.
+    #Rows are only written to the database if they have changed. The metrics of each activity are taken from the
+    #metrics cache, or calculated (and saved in the metrics cache, telling the commit policy) if they are not in it.
+    #If a tree traversal is passed in (see RePlayTreeTraversal), it is used to walk over the activities.
+    #It returns the number of rows that were added, changed, or removed.
+    def Refresh(self, participants, metrics_cache, commit_policy = None, traversal = None):
+        number_of_changed_rows = 0
+        keys_seen = set()
+
+        for (participant_position, current_participant) in enumerate(participants):
+            participant_columns = (
+                current_participant.uid,
+                ActivitySummaryTable.is_marked_for_exclusion(current_participant)
+            )
+
+            if (len(current_participant.visits) == 0):
+                key = (participant_position, -1, -1)
+                number_of_changed_rows += self.__set_row(key, participant_columns +
+                    ActivitySummaryTable.get_empty_visit_columns() + ActivitySummaryTable.get_empty_activity_columns())
+                keys_seen.add(key)
+
+            for (visit_position, current_visit) in enumerate(current_participant.visits):
+                visit_columns = (
+                    current_visit.start_time,
+                    current_visit.end_time,
+                    current_visit.is_at_home_visit,
+                    current_visit.assignment_name,
+                    ActivitySummaryTable.is_marked_for_exclusion(current_visit)
+                )
+
+                if (len(current_visit.activities) == 0):
+                    key = (participant_position, visit_position, -1)
+                    number_of_changed_rows += self.__set_row(key, participant_columns + visit_columns +
+                        ActivitySummaryTable.get_empty_activity_columns())
+                    keys_seen.add(key)
+
+                activities = current_visit.activities
+                if (traversal is not None):
+                    activities = traversal.Activities(activities)
+
+                for (activity_position, current_activity) in enumerate(activities):
+                    activity_columns = (
+                        current_activity.start_time,
+                        current_activity.activity_name,
+                        ActivitySummaryTable.is_marked_for_exclusion(current_activity)
+                    )
+
+                    if (participant_columns[1]) or (visit_columns[4]) or (activity_columns[2]):
+                        activity_metrics = ActivitySummaryTable.get_empty_activity_columns()[3:]
+                    else:
+                        incomplete_activity_metrics = []
+                        activity_metrics = metrics_cache.GetOrCalculateMetrics(current_activity,
+                            ActivitySummaryTable.activity_metrics_algorithm_name,
+                            ActivitySummaryTable.activity_metrics_algorithm_version,
+                            lambda: ActivitySummaryTable.calculate_activity_metrics(current_activity, metrics_cache, commit_policy,
+                                incomplete_activity_metrics),
+                            parameters = { "repetition_data_algorithm_version" : RePlayActivity.repetition_data_algorithm_version },
+                            commit_policy = commit_policy)
+
+                        #If a game metric of this activity could not be calculated, the row is given the metrics that
+                        #could be calculated. They are not saved in the metrics cache, so they are calculated again
+                        #the next time that the table is refreshed.
+                        if (activity_metrics is None):
+                            activity_metrics = incomplete_activity_metrics[0]
+                    activity_columns = activity_columns + tuple(activity_metrics)
+
+                    key = (participant_position, visit_position, activity_position)
+                    number_of_changed_rows += self.__set_row(key, participant_columns + visit_columns + activity_columns)
+                    keys_seen.add(key)
+
+        #Remove rows for participants, visits, and activities that no longer exist
+        keys_to_remove = [k for k in self.rows.keys() if (k not in keys_seen)]
+        for k in keys_to_remove:
+            del self.rows[k]
+        number_of_changed_rows += len(keys_to_remove)
+
+        if (number_of_changed_rows > 0):
+            self._v_activity_summary = None
+            self._p_changed = True
+
+        return number_of_changed_rows
+
+    #region Static methods
+
+    #This method returns the activity summary table of a database. If the database does not have a metrics cache
+    #or an activity summary table yet, they are created, and the new table is refreshed. The table is also refreshed
+    #if "refresh" is set (which is only needed if the database has changed since the table was last refreshed, for
+    #example if phase 6 of CreateDB was not run after new data was loaded). The metrics that are calculated while
+    #the table is refreshed are committed after every few activities (or every minute), and once more at the end.
+    @staticmethod
+    def get_or_create(root, traversal = None, refresh = False, objects_per_commit = 500, seconds_per_commit = 60):
+        if not(hasattr(root, "metrics_cache")):
+            root.metrics_cache = RePlayMetricsCache(maximum_age = timedelta(days = 365))
+        if not(hasattr(root, "activity_summary_table")):
+            root.activity_summary_table = ActivitySummaryTable()
+            refresh = True
+
+        if (refresh):
+            print("Refreshing the activity summary table...")
+            commit_policy = RePlayCommitPolicy(objects_per_commit = objects_per_commit, seconds_per_commit = seconds_per_commit)
+            root.activity_summary_table.Refresh(root.participants, root.metrics_cache, commit_policy, traversal)
+            commit_policy.Commit()
+
+        return root.activity_summary_table
+
+    #This method calculates the metrics of an activity. It returns a tuple that holds the values of the columns
+    #from "GameDataType" to the last column (see column_names). The duration, repetitions, and time spent moving
+    #(in seconds) are calculated for every activity. The metrics of each game are None, except for the game that
+    #the activity's game data belongs to.
+    #If the game metrics cannot be calculated from the activity's data, the error is printed and None is returned
+    #(so that the metrics are not saved in the metrics cache). In that case, if a list is passed in as
+    #"incomplete_metrics", the metrics that could be calculated (with the game metrics left empty) are appended to it.
+    @staticmethod
+    def calculate_activity_metrics(activity, metrics_cache = None, commit_policy = None, incomplete_metrics = None):
+        game_data_type = None
+        duration = 0
+        breakout_balls_lost = None
+        breakout_ball_loss_interval = None
+        spacerunner_attempt_durations = None
+        trafficracer_percent_time_in_target_lane = None
+        fruitarchery_fruit_hit_per_minute = None
+        fruitninja_swipe_accuracy = None
+        typershark_words_per_minute = None
+        game_metrics_failed = False
+
+        if (activity.game_data is not None):
+            if (activity.game_data.game_data is not None):
+                game_data = activity.game_data.game_data
+                game_data_type = type(game_data).__name__
+
+                #Grab the session duration
+                if ((game_data.signal_time is not None) and (len(game_data.signal_time) > 0)):
+                    duration = game_data.signal_time[-1]
+                    if (math.isnan(duration)):
+                        duration = 0
+                    elif (math.isinf(duration)):
+                        duration = 0
+
+                #Calculate the metrics of each game
+                try:
+                    if (isinstance(game_data, RePlayGameDataBreakout)):
+                        (breakout_balls_lost, _, _, breakout_ball_loss_interval, _) = game_data.CalculateBreakoutGameMetrics()
+                    elif (isinstance(game_data, RePlayGameDataSpaceRunner)):
+                        (_, _, spacerunner_attempt_durations, _, _) = game_data.CalculateSpaceRunnerMetrics()
+                        spacerunner_attempt_durations = tuple(spacerunner_attempt_durations)
+                    elif (isinstance(game_data, RePlayGameDataTrafficRacer)):
+                        trafficracer_percent_time_in_target_lane = game_data.CalculatePercentTimeInTargetLane()
+                    elif (isinstance(game_data, RePlayGameDataFruitArchery)):
+                        fruitarchery_fruit_hit_per_minute = game_data.CalculateFruitHitPerMinute()
+                    elif (isinstance(game_data, RePlayGameDataFruitNinja)):
+                        fruitninja_swipe_accuracy = game_data.CalculateSwipeAccuracy()
+                    elif (isinstance(game_data, RePlayGameDataTyperShark)):
+                        (_, _, _, _, _, _, typershark_words_per_minute, _, _, _, _) = game_data.CalculateTyperSharkMetrics()
+                except ActivitySummaryTable.game_metrics_errors as e:
+                    game_metrics_failed = True
+                    print(f"Could not calculate the {game_data_type} metrics of activity {activity.activity_name} " +
+                        f"({activity.uid}, {activity.start_time}) from file {getattr(activity.game_data, 'filename', None)}: {repr(e)}")
+
+        #Grab the repetition data
+        (rep_count, _, time_moving, _) = activity.GetRepetitionData(commit_policy = commit_policy, metrics_cache = metrics_cache)
+
+        activity_metrics = (game_data_type, duration, rep_count, time_moving.total_seconds(),
+            breakout_balls_lost, breakout_ball_loss_interval, spacerunner_attempt_durations,
+            trafficracer_percent_time_in_target_lane, fruitarchery_fruit_hit_per_minute,
+            fruitninja_swipe_accuracy, typershark_words_per_minute)
+
+        if (game_metrics_failed):
+            if (incomplete_metrics is not None):
+                incomplete_metrics.append(activity_metrics)
+            return None
+        return activity_metrics
+
+    #This method returns whether a participant, visit, or activity has been marked for exclusion
+    @staticmethod
+    def is_marked_for_exclusion(obj):
+        if ("marked_for_exclusion" not in obj.tags):
+            return True
+        return bool(obj.tags["marked_for_exclusion"])
+
+    #This method returns the visit columns of a row that does not have a visit
+    @staticmethod
+    def get_empty_visit_columns():
+        return (None, None, None, None, None)
+
+    #This method returns the activity columns of a row that does not have an activity
+    @staticmethod
+    def get_empty_activity_columns():
+        return (None, ) * 14
+
+    #endregion
+
+    #region Private methods
+
+    #This method sets a row of the table if it has changed. It returns 1 if the row was changed, or 0 if it was not.
+    def __set_row(self, key, row):
+        existing_row = self.rows.get(key, None)
+        if (existing_row is not None) and (repr(existing_row) == repr(row)):
+            return 0
+        self.rows[key] = row
+        return 1
+
+    #endregion
@@ -4,6 +4,8 @@ import pandas
 from datetime import datetime
 from datetime import timedelta
 from dateutil import parser
+from pathlib import Path
+from BTrees.OOBTree import OOBTree
 
 from .ReadGoogleSpreadsheet import GoogleSheets
 
@@ -11,30 +13,81 @@ class LoadedFilesTable(persistent.Persistent):
 
     #Constructor
     def __init__(self):
-        self.loaded_files = pandas.DataFrame([], columns = [
-            "UID",
-            "file_name",
-            "md5_checksum"
-        ])
+        #The loaded files are indexed by (file name, md5 checksum). The value for each file is
+        #a tuple of (the order in which the file was loaded, the participant id).
+        self.loaded_file_index = OOBTree()
+        self.loaded_file_count = 0
+
+        #The file manifest is indexed by the full path of each file that has been seen while loading
+        #files. The value for each file is a tuple of (file size, modification time in nanoseconds,
+        #md5 checksum, participant id), so that a file that has not changed since it was last seen
+        #does not need to be opened again.
+        self.file_manifest = OOBTree()
+
+    #This property returns the loaded files as a pandas DataFrame (with the columns "UID",
+    #"file_name", and "md5_checksum", in the order in which the files were loaded). The DataFrame
+    #is only created when it is needed, and it is not saved to the database.
+    @property
+    def loaded_files(self):
+        self.__update_loaded_file_index()
+        loaded_files_dataframe = getattr(self, "_v_loaded_files", None)
+        if loaded_files_dataframe is None:
+            loaded_files = sorted((x[1][0], x[1][1], x[0][0], x[0][1]) for x in self.loaded_file_index.items())
+            loaded_files_dataframe = pandas.DataFrame([x[1:] for x in loaded_files], columns = [
+                "UID",
+                "file_name",
+                "md5_checksum"
+            ])
+            self._v_loaded_files = loaded_files_dataframe
+        return loaded_files_dataframe
 
     def IsFileAlreadyLoaded (self, filename, md5checksum):
-        already_loaded = False
-        pre_existing_loaded_file = self.loaded_files[
-            (self.loaded_files["file_name"] == filename) & (self.loaded_files["md5_checksum"] == md5checksum)]
-        if (len(pre_existing_loaded_file) > 0):
-            already_loaded = True
-        else:
-            already_loaded = False
-        return already_loaded
+        self.__update_loaded_file_index()
+        return ((filename, md5checksum) in self.loaded_file_index)
+
+    #This method returns a set of (file name, md5 checksum) pairs: one for each file that has been loaded
+    def GetLoadedFiles (self):
+        self.__update_loaded_file_index()
+        return set(self.loaded_file_index.keys())
+
+    #This method returns True if a file has already been loaded and it has not changed since it was last
+    #seen (it has the same path, size, and modification time as it did when it was added to the file manifest)
+    def IsFileUnchangedSinceLoaded (self, file_path, file_size, file_mtime):
+        self.__update_loaded_file_index()
+        manifest_entry = self.file_manifest.get(file_path, None)
+        if (manifest_entry is None) or (manifest_entry[0:2] != (file_size, file_mtime)):
+            return False
+        return ((Path(file_path).name, manifest_entry[2]) in self.loaded_file_index)
+
+    #This method records the size, modification time, md5 checksum, and participant id of a file in the file manifest
+    def UpdateFileManifest (self, file_path, file_size, file_mtime, md5checksum, participant_id):
+        self.__update_loaded_file_index()
+        self.file_manifest[file_path] = (file_size, file_mtime, md5checksum, participant_id)
+        self._p_changed = True
 
     def AppendLoadedFileToTable (self, participant_id, filename, md5checksum):
-        #Add this file to the list of loaded files
-        self.loaded_files = self.loaded_files.append({
-            "UID" : participant_id,
-            "file_name" : filename,
-            "md5_checksum" : md5checksum
-        }, ignore_index = True)   
+        self.__update_loaded_file_index()
 
-        self._p_changed = True     
+        #Add this file to the list of loaded files
+        self.loaded_file_index[(filename, md5checksum)] = (self.loaded_file_count, participant_id)
+        self.loaded_file_count = self.loaded_file_count + 1
+        self._v_loaded_files = None
 
+        self._p_changed = True
 
+    #Databases that were created before the loaded files were indexed hold the loaded files in a
+    #pandas DataFrame. This method moves those files into the index the first time that they are used
+    #(and creates an empty file manifest for databases that were created before it existed).
+    def __update_loaded_file_index(self):
+        if not(hasattr(self, "loaded_file_index")):
+            loaded_files = self.__dict__.pop("loaded_files")
+            self.loaded_file_index = OOBTree()
+            self.loaded_file_count = 0
+            for (participant_id, filename, md5checksum) in zip(loaded_files["UID"], loaded_files["file_name"], loaded_files["md5_checksum"]):
+                self.loaded_file_index[(filename, md5checksum)] = (self.loaded_file_count, participant_id)
+                self.loaded_file_count = self.loaded_file_count + 1
+            self._v_loaded_files = None
+            self._p_changed = True
+        if not(hasattr(self, "file_manifest")):
+            self.file_manifest = OOBTree()
+            self._p_changed = True
@@ -1,7 +1,6 @@
 from RePlayAnalysisCore2.RePlayControllerData import RePlayControllerData
 from RePlayAnalysisCore2.RePlayDataFile import RePlayDataFile
 import persistent
-import transaction
 import math
 
 from datetime import datetime
@@ -13,9 +12,15 @@ from RePlayAnalysisCore2.RePlaySignalAnalyzer import RePlaySignalAnalyzer
 from RePlayAnalysisCore2.RePlayGameDataTyperShark import RePlayGameDataTyperShark
 from RePlayAnalysisCore2.RePlayVNSAlgorithm import RePlayVNSAlgorithm
 from RePlayAnalysisCore2.RePlayVNSAlgorithm_TyperShark import RePlayVNSAlgorithm_TyperShark
+from RePlayAnalysisCore2.RePlayActivityIndex import RePlayActivityIndex
+from RePlayAnalysisCore2.RePlayCommitPolicy import RePlayCommitPolicy
 
 class RePlayActivity(TxBDC_Generic_Activity):
 
+    #The version of the repetition data calculation. This should be increased whenever a change to the code
+    #that calculates repetition data could change its results, so that saved results are calculated again.
+    repetition_data_algorithm_version = 1
+
     def __init__(self):
         super().__init__()
         self.controller_data = None
@@ -54,15 +59,30 @@ class RePlayActivity(TxBDC_Generic_Activity):
 
         return result
 
-    def GetRepetitionData(self, prefer_metadata = False):
+    #If the repetition data is calculated, it is saved in this activity's metadata, and the commit policy is
+    #told that this activity has changed. If no commit policy is passed in, the change is committed right away.
+    #If a metrics cache is passed in (see RePlayMetricsCache), the repetition data is saved in the metrics cache
+    #instead, and it is only calculated again if the data files or the version of the algorithm have changed.
+    def GetRepetitionData(self, prefer_metadata = False, commit_policy = None, metrics_cache = None):
         #Initialize variables that will be used to store the result
         rep_list = []
         rep_count = 0
         time_moving = timedelta(seconds = 0)
         percent_time_moving = 0
 
+        if (commit_policy is None):
+            commit_policy = RePlayCommitPolicy(objects_per_commit = 1)
+
+        #If the caller passed in a metrics cache, use it...
+        if (metrics_cache is not None):
+            repetition_data = metrics_cache.GetOrCalculateMetrics(self, "RePlayActivity.GetRepetitionData",
+                RePlayActivity.repetition_data_algorithm_version, self.__calculate_repetition_data, 
+                commit_policy = commit_policy)
+            if (repetition_data is not None):
+                (rep_count, rep_list, time_moving, percent_time_moving) = repetition_data
+
         #If the caller prefers to use the pre-calculated metadata, let's grab that...
-        if (prefer_metadata) and ("replay_activity_metadata" in self.tags):
+        elif (prefer_metadata) and ("replay_activity_metadata" in self.tags):
             metadata = self.tags["replay_activity_metadata"]
             if ("rep_count" in metadata):
                 rep_count = metadata["rep_count"]
@@ -72,22 +92,20 @@ class RePlayActivity(TxBDC_Generic_Activity):
                 time_moving = metadata["time_moving"]
             if ("percent_time_moving" in metadata):
                 percent_time_moving = metadata["percent_time_moving"]
-        elif (self.game_data is not None):
+        else:
             #Otherwise, let's do a fresh calculation of the repetition data.
-            if (isinstance(self.game_data, RePlayDataFile)):
-                if ((self.game_data.game_data is not None) and (isinstance(self.game_data.game_data, RePlayGameData))):
-                    #Calculate the repetition data
-                    exercise_id = self.game_data.exercise_id
-                    (rep_count, rep_list, time_moving, percent_time_moving) = self.game_data.game_data.GetRepetitionData(exercise_id)
-
-                    #Save the calculated data into the metadata for this activity
-                    if ("replay_activity_metadata" not in self.tags):
-                        self.tags["replay_activity_metadata"] = persistent.mapping.PersistentMapping()
-                    self.tags["replay_activity_metadata"]["rep_count"] = rep_count
-                    self.tags["replay_activity_metadata"]["rep_list"] = rep_list
-                    self.tags["replay_activity_metadata"]["time_moving"] = time_moving
-                    self.tags["replay_activity_metadata"]["percent_time_moving"] = percent_time_moving
-                    transaction.commit()
+            repetition_data = self.__calculate_repetition_data()
+            if (repetition_data is not None):
+                (rep_count, rep_list, time_moving, percent_time_moving) = repetition_data
+
+                #Save the calculated data into the metadata for this activity
+                if ("replay_activity_metadata" not in self.tags):
+                    self.tags["replay_activity_metadata"] = persistent.mapping.PersistentMapping()
+                self.tags["replay_activity_metadata"]["rep_count"] = rep_count
+                self.tags["replay_activity_metadata"]["rep_list"] = rep_list
+                self.tags["replay_activity_metadata"]["time_moving"] = time_moving
+                self.tags["replay_activity_metadata"]["percent_time_moving"] = percent_time_moving
+                commit_policy.ObjectChanged()
 
         #Return the repetition data to the caller
         return (rep_count, rep_list, time_moving, percent_time_moving)
@@ -184,10 +202,25 @@ class RePlayActivity(TxBDC_Generic_Activity):
         return result
         
 
+    #region Private methods
+
+    #This method calculates the repetition data of this activity. It returns None if this activity has no game data.
+    def __calculate_repetition_data(self):
+        if (self.game_data is not None):
+            if (isinstance(self.game_data, RePlayDataFile)):
+                if ((self.game_data.game_data is not None) and (isinstance(self.game_data.game_data, RePlayGameData))):
+                    exercise_id = self.game_data.exercise_id
+                    return self.game_data.game_data.GetRepetitionData(exercise_id)
+        return None
+
+    #endregion
+
     #region Static methods
 
+    #If an activity index is passed in (see RePlayActivityIndex), it is used to find the activities that this session
+    #could belong to, instead of checking every activity in the activity list. The index is kept up to date with the list.
     @staticmethod
-    def AddSessionToActivityList(activity_list, session_data):
+    def AddSessionToActivityList(activity_list, session_data, activity_index = None):
         #Grab the participant ID and the start time of the session
         participant_id = session_data.subject_id
         activity_name = session_data.game_id
@@ -222,9 +255,16 @@ class RePlayActivity(TxBDC_Generic_Activity):
         time_allowance = 5
         found = False
 
-        #Iterate over all existing activities in the activity list
-        for i in range(0, len(activity_list)):
-            cur_activity = activity_list[i]
+        #Find the activities that could match this session
+        candidate_activities = activity_list
+        if (activity_index is not None) and \
+            (RePlayActivityIndex.get_activity_key(participant_id, activity_name, session_start_time) is not None):
+            activity_index.Update(activity_list)
+            candidate_activities = activity_index.FindActivities(participant_id, activity_name, session_start_time, time_allowance)
+
+        #Iterate over all existing activities that could match this session
+        for i in range(0, len(candidate_activities)):
+            cur_activity = candidate_activities[i]
 
             #Check to see if the UID and activity name match
             if ((cur_activity.uid == participant_id) and (cur_activity.activity_name == activity_name)):
@@ -260,6 +300,8 @@ class RePlayActivity(TxBDC_Generic_Activity):
                 new_activity.SetControllerData(session_data)
 
             activity_list.append(new_activity)
+            if (activity_index is not None):
+                activity_index.Update(activity_list)
     
     #endregion
 
@@ -0,0 +1,56 @@
+import persistent
+
+from datetime import datetime
+from datetime import timedelta
+from BTrees.OOBTree import OOBTree
+
+#This class is a persistent index of the activities in an activity list. The activities are indexed by
+#(uid, activity name, start time, position in the activity list), so all of the activities of a participant
+#and game that started within a window of time can be found without scanning the whole activity list.
+#
+#The activity list itself is not changed. Activities are only ever appended to the activity list,
+#so the index keeps track of how many activities it has indexed, and any activities that have been
+#appended to the list since then are added to the index the next time it is updated.
+class RePlayActivityIndex(persistent.Persistent):
+
+    def __init__(self):
+        self.activities = OOBTree()
+        self.number_of_indexed_activities = 0
+
+    #This method adds any activities that have been appended to the activity list to the index
+    def Update(self, activity_list):
+        #If the activity list is shorter than it was, then it was not just appended to, so index it again
+        if (len(activity_list) < self.number_of_indexed_activities):
+            self.activities.clear()
+            self.number_of_indexed_activities = 0
+
+        for i in range(self.number_of_indexed_activities, len(activity_list)):
+            current_activity = activity_list[i]
+            activity_key = RePlayActivityIndex.get_activity_key(
+                current_activity.uid, current_activity.activity_name, current_activity.start_time)
+            if (activity_key is not None):
+                self.activities[activity_key + (i, )] = current_activity
+
+        if (self.number_of_indexed_activities != len(activity_list)):
+            self.number_of_indexed_activities = len(activity_list)
+            self._p_changed = True
+
+    #This method returns the activities with a matching uid and activity name that started within
+    #"time_allowance" seconds of start_time, ordered by their start time.
+    def FindActivities(self, uid, activity_name, start_time, time_allowance):
+        time_allowance = timedelta(seconds = time_allowance)
+        return list(self.activities.values(
+            min = (uid, activity_name, start_time - time_allowance),
+            max = (uid, activity_name, start_time + time_allowance, float("inf"))))
+
+    #region Static methods
+
+    #This method returns the part of an activity's key that is used to look it up. Only activities with a
+    #text uid and activity name and a datetime start time can be indexed. None is returned for any other activity.
+    @staticmethod
+    def get_activity_key(uid, activity_name, start_time):
+        if isinstance(uid, str) and isinstance(activity_name, str) and isinstance(start_time, datetime):
+            return (uid, activity_name, start_time)
+        return None
+
+    #endregion
@@ -0,0 +1,95 @@
+import persistent
+
+from BTrees.IOBTree import IOBTree
+
+#This class is a persistent list that is stored in the database as a BTree, keyed by each item's position
+#in the list. It can be used in place of a PersistentList: items can be appended, counted, iterated over,
+#and read or replaced by their position.
+#
+#A PersistentList is saved in the database as a single object, so appending one item to it means that the
+#whole list is written to the database again when the transaction is committed. The BTree stores its items
+#in small "buckets" instead, so appending an item only writes the bucket that the item was added to (and
+#this object, which only holds the number of items). Items cannot be removed from this list.
+class RePlayBucketedList(persistent.Persistent):
+
+    def __init__(self, items = None):
+        self.items = IOBTree()
+        self.number_of_items = 0
+        if (items is not None):
+            self.extend(items)
+
+    #region Methods that act like a list
+
+    def __len__(self):
+        return self.number_of_items
+
+    def __iter__(self):
+        return iter(self.items.values())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.items[i] for i in range(*index.indices(self.number_of_items))]
+        return self.items[self.__get_key(index)]
+
+    def __setitem__(self, index, item):
+        self.items[self.__get_key(index)] = item
+
+    def __repr__(self):
+        return "{Item Count: " + f"{self.number_of_items}" + "}"
+
+    def append(self, item):
+        self.items[self.number_of_items] = item
+        self.number_of_items += 1
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
+
+    #endregion
+
+    #region Static methods
+
+    #This method returns a RePlayBucketedList that holds the same items (in the same order) as a list.
+    #If the list is already a RePlayBucketedList, it is returned as it is.
+    @staticmethod
+    def from_list(items):
+        if isinstance(items, RePlayBucketedList):
+            return items
+        return RePlayBucketedList(items)
+
+    #This method converts the activity list of a database, and the list of activities of every visit
+    #in the database, from PersistentLists into RePlayBucketedLists (for databases that were created
+    #before RePlayBucketedList existed). The order of the activities does not change, so indexes that
+    #refer to activities by their position in the activity list are still correct afterwards.
+    #It returns the number of lists that were converted.
+    @staticmethod
+    def migrate_activity_lists(root):
+        number_of_converted_lists = 0
+
+        if (hasattr(root, "activity_list")) and not(isinstance(root.activity_list, RePlayBucketedList)):
+            root.activity_list = RePlayBucketedList.from_list(root.activity_list)
+            number_of_converted_lists += 1
+
+        if (hasattr(root, "participants")):
+            for p in root.participants:
+                for v in p.visits:
+                    if not(isinstance(v.activities, RePlayBucketedList)):
+                        v.activities = RePlayBucketedList.from_list(v.activities)
+                        number_of_converted_lists += 1
+
+        return number_of_converted_lists
+
+    #endregion
+
+    #region Private methods
+
+    #This method converts a position in the list (which can be negative) to a key in the BTree
+    def __get_key(self, index):
+        index = int(index)
+        if (index < 0):
+            index += self.number_of_items
+        if (index < 0) or (index >= self.number_of_items):
+            raise IndexError("list index out of range")
+        return index
+
+    #endregion
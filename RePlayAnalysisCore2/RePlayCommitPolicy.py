@@ -0,0 +1,99 @@
+import time
+import transaction
+
+#This class decides when changes to the database are committed. Code that changes the database tells
+#the commit policy each time it has changed an object (or a group of objects), and the commit policy
+#commits the transaction once enough changes have built up. A commit can happen:
+#   1. after a number of objects have been changed ("objects_per_commit"),
+#   2. after a number of seconds have passed since the last commit ("seconds_per_commit"), or
+#   3. after an estimated number of bytes have been changed ("bytes_per_commit").
+#Any of these can be None, in which case it is not used. If none of them are used, changes are only
+#committed when Commit is called.
+#
+#Each commit writes a new copy of every changed object to the database file (and waits for it to be
+#written to disk), so committing less often makes scripts that change many objects much faster, and
+#keeps the database file from growing as quickly. Between commits, a savepoint can be made after every
+#"objects_per_savepoint" objects. A savepoint moves the changes that have not been committed yet out of
+#memory (into a temporary file), so a long run of changes does not use up all of the memory and crash the
+#script before it reaches the next commit.
+class RePlayCommitPolicy:
+
+    def __init__(self, objects_per_commit = None, seconds_per_commit = None, bytes_per_commit = None,
+        objects_per_savepoint = None, commit_message = None):
+        self.objects_per_commit = objects_per_commit
+        self.seconds_per_commit = seconds_per_commit
+        self.bytes_per_commit = bytes_per_commit
+        self.objects_per_savepoint = objects_per_savepoint
+
+        #A message that is printed after each commit made by this commit policy (or None)
+        self.commit_message = commit_message
+
+        #The changes that have been made since the last commit and since the last savepoint
+        self.objects_since_last_commit = 0
+        self.bytes_since_last_commit = 0
+        self.objects_since_last_savepoint = 0
+        self.last_commit_time = time.monotonic()
+
+        #The number of commits and savepoints that have been made by this commit policy
+        self.number_of_commits = 0
+        self.number_of_savepoints = 0
+
+    #region Public methods
+
+    #This method is called after one or more objects in the database have been changed. The number of bytes
+    #is an estimate of how much data was changed (for example, the size of a data file that was loaded).
+    #It returns True if the changes were committed.
+    def ObjectChanged(self, number_of_objects = 1, number_of_bytes = 0):
+        self.objects_since_last_commit += number_of_objects
+        self.bytes_since_last_commit += number_of_bytes
+        self.objects_since_last_savepoint += number_of_objects
+
+        if (self.IsCommitNeeded()):
+            self.Commit()
+            return True
+
+        if (self.objects_per_savepoint is not None) and (self.objects_since_last_savepoint >= self.objects_per_savepoint):
+            self.Savepoint()
+
+        return False
+
+    #This method returns True if enough changes have been made since the last commit that they should be committed
+    def IsCommitNeeded(self):
+        if (self.objects_since_last_commit == 0) and (self.bytes_since_last_commit == 0):
+            return False
+        if (self.objects_per_commit is not None) and (self.objects_since_last_commit >= self.objects_per_commit):
+            return True
+        if (self.seconds_per_commit is not None) and ((time.monotonic() - self.last_commit_time) >= self.seconds_per_commit):
+            return True
+        if (self.bytes_per_commit is not None) and (self.bytes_since_last_commit >= self.bytes_per_commit):
+            return True
+        return False
+
+    #This method returns True if any changes have been made since the last commit
+    def HasPendingChanges(self):
+        return (self.objects_since_last_commit > 0) or (self.bytes_since_last_commit > 0)
+
+    #This method commits the transaction, whether or not enough changes have been made to need a commit
+    def Commit(self):
+        transaction.commit()
+        self.objects_since_last_commit = 0
+        self.bytes_since_last_commit = 0
+        self.objects_since_last_savepoint = 0
+        self.last_commit_time = time.monotonic()
+        self.number_of_commits += 1
+        if (self.commit_message is not None):
+            print (self.commit_message)
+
+    #This method commits the transaction if any changes have been made since the last commit. It should be
+    #called once all changes have been made, so that the last few changes are not lost.
+    def Flush(self):
+        if (self.HasPendingChanges()):
+            self.Commit()
+
+    #This method makes a savepoint in the transaction
+    def Savepoint(self):
+        transaction.savepoint(optimistic = True)
+        self.objects_since_last_savepoint = 0
+        self.number_of_savepoints += 1
+
+    #endregion
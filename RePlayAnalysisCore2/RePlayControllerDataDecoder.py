@@ -0,0 +1,257 @@
+import io
+import struct
+import numpy as np
+
+from .RePlayUtilities import convert_datenum
+from .RePlayUtilities import convert_datenum_array
+from .RePlayUtilities import calculate_elapsed_seconds
+from .RePlayDataFileStatic import RePlayDataFileStatic
+
+#This class decodes the data region of a controller data file in bulk. Instead of
+#reading each field of each packet with its own call to read_byte_array, the whole
+#data region is held in memory, the packet boundaries are found in a single pass,
+#and then each fixed-size packet type is decoded all at once into a NumPy structured
+#array. The results are returned as plain lists that are identical to the lists
+#that RePlayControllerData has always produced.
+class RePlayControllerDataDecoder:
+
+    #region Packet layouts
+
+    #Layout of the data for a single FitMi puck within a type 1 packet
+    puck_dtype = np.dtype([
+        ('puck_num', 'i4'),
+        ('acc', 'i4', (3,)),
+        ('gyro', 'i4', (3,)),
+        ('mag', 'f8', (3,)),
+        ('quat', 'f8', (4,)),
+        ('loadcell', 'i4'),
+        ('touch', 'i1'),
+        ('battery', 'i4')
+    ])
+
+    #Layouts of the fixed-size packet types. Each layout includes the 4-byte packet type.
+    packet_dtypes = {
+        #FitMi puck data
+        1 : np.dtype([('packet_type', 'i4'), ('timenum', 'f8'), ('pucks', puck_dtype, (2,))]),
+
+        #RePlay device data
+        2 : np.dtype([('packet_type', 'i4'), ('timenum', 'f8'), ('replay_signal', 'f8')]),
+
+        #Stimulation request
+        3 : np.dtype([('packet_type', 'i4'), ('timenum', 'f8')]),
+
+        #Touchscreen data
+        4 : np.dtype([('packet_type', 'i4'), ('timenum', 'f8'), ('touch_position', 'f4', (2,))]),
+
+        #RePlay isometric task raw loadcell values
+        6 : np.dtype([('packet_type', 'i4'), ('timenum', 'f8'), ('loadcell1', 'f8'), ('loadcell2', 'f8')]),
+
+        #RePlay isometric task calibration values
+        7 : np.dtype([('packet_type', 'i4'), ('timenum', 'f8'), ('b1', 'f8'), ('b2', 'f8'), ('s1', 'f8'), ('s2', 'f8')]),
+
+        #RePlay range-of-motion task calibration values
+        8 : np.dtype([('packet_type', 'i4'), ('timenum', 'f8'), ('b1', 'f8')]),
+
+        #Session handedness
+        9 : np.dtype([('packet_type', 'i4'), ('timenum', 'f8'), ('is_left_handed', 'i1')])
+    }
+
+    #Packet types that carry a sample of the controller signal (and therefore a timestamp
+    #that belongs in signal_timenum)
+    signal_packet_types = (1, 2, 4, 6)
+
+    #Packet type of a ReStore service message, which is the only variable-length packet
+    restore_message_packet_type = 5
+
+    #Size of the footer at the end of a controller data file
+    footer_size = 8
+
+    #endregion
+
+    #region Public methods
+
+    #This method decodes the data region of a controller data file. The "buffer" parameter
+    #must be an object that supports the buffer protocol (bytes, bytearray, memoryview, mmap)
+    #and contains the WHOLE file. The result is a dictionary of lists.
+    @staticmethod
+    def DecodeControllerData (buffer, data_start_location):
+        (packet_positions, packet_types, restore_messages, crash_detected) = \
+            RePlayControllerDataDecoder.IndexPackets(buffer, data_start_location)
+
+        #Convert every timestamp that must become a python datetime. This happens in file order,
+        #so that a bad timestamp stops decoding at exactly the same packet as it always has.
+        timestamp_packets = np.flatnonzero(np.isin(packet_types, RePlayControllerDataDecoder.signal_packet_types + (3,)))
+        #Timestamps are converted all at once, up to the first one that is outside of the range that can
+        #always be converted. From there on, each timestamp is converted individually.
+        timestamp_values = RePlayControllerDataDecoder.__decode_field(
+            buffer, packet_positions[timestamp_packets], RePlayControllerDataDecoder.packet_dtypes[3], 'timenum')
+        is_valid_timestamp = ((timestamp_values >= RePlayDataFileStatic.valid_datenum_range[0]) & 
+            (timestamp_values < RePlayDataFileStatic.valid_datenum_range[1]))
+        valid_count = len(timestamp_values) if is_valid_timestamp.all() else int(np.argmin(is_valid_timestamp))
+        remaining_timestamps = []
+        try:
+            for t in timestamp_values[valid_count:].tolist():
+                remaining_timestamps.append(convert_datenum(t))
+        except ValueError:
+            crash_detected = True
+        converted_timestamps = np.concatenate([convert_datenum_array(timestamp_values[:valid_count]), 
+            np.array(remaining_timestamps, dtype = 'datetime64[us]')])
+
+        #If a timestamp could not be converted, drop that packet and everything that came after it
+        packet_count = len(packet_positions)
+        if (len(converted_timestamps) < len(timestamp_packets)):
+            packet_count = timestamp_packets[len(converted_timestamps)]
+            timestamp_packets = timestamp_packets[:len(converted_timestamps)]
+            packet_positions = packet_positions[:packet_count]
+            packet_types = packet_types[:packet_count]
+            restore_messages = [x for x in restore_messages if x[0] < packet_count]
+
+        result = {}
+        result["crash_detected"] = crash_detected
+
+        #Build the signal timestamps
+        is_signal_timestamp = np.isin(packet_types[timestamp_packets], RePlayControllerDataDecoder.signal_packet_types)
+        signal_timenum = converted_timestamps[is_signal_timestamp]
+        (signal_timeelapsed, signal_time) = calculate_elapsed_seconds(signal_timenum)
+        result["signal_timenum"] = signal_timenum.tolist()
+        result["signal_timeelapsed"] = signal_timeelapsed.tolist()
+        result["signal_time"] = signal_time.tolist()
+        result["stim_times"] = converted_timestamps[~is_signal_timestamp].tolist()
+
+        #ReStore service messages, and the times of successful stimulations that they report
+        result["restore_messages"] = [x[1] for x in restore_messages]
+        result["stim_times_successful"] = []
+        for restore_msg in result["restore_messages"]:
+            if (("secondary" in restore_msg) and ("time" in restore_msg)):
+                secondary = restore_msg["secondary"]
+                if ("COMMAND_STATUS" in secondary):
+                    if (secondary["COMMAND_STATUS"] == "STIM_SUCCESS"):
+                        result["stim_times_successful"].append(restore_msg["time"])
+
+        #Decode each of the fixed-size packet types
+        packets = {}
+        for packet_type in RePlayControllerDataDecoder.packet_dtypes.keys():
+            if (packet_type == 3):
+                continue
+            packet_idx = np.flatnonzero(packet_types == packet_type)
+            if (len(packet_idx) > 0):
+                packets[packet_type] = (packet_idx, RePlayControllerDataDecoder.__decode_packets(
+                    buffer, packet_positions[packet_idx], RePlayControllerDataDecoder.packet_dtypes[packet_type]))
+
+        #FitMi puck data
+        if (1 in packets):
+            pucks = packets[1][1]['pucks']
+            result["acc"] = pucks['acc'].tolist()
+            result["gyro"] = pucks['gyro'].tolist()
+            result["mag"] = pucks['mag'].tolist()
+            result["quat"] = pucks['quat'].tolist()
+            result["loadcell"] = pucks['loadcell'].tolist()
+            result["touch"] = pucks['touch'].tolist()
+            result["battery"] = pucks['battery'].tolist()
+
+        #RePlay device data
+        if (2 in packets):
+            result["replay_signal"] = packets[2][1]['replay_signal'].tolist()
+
+        #Touchscreen data
+        if (4 in packets):
+            result["touch_position"] = packets[4][1]['touch_position'].tolist()
+
+        #RePlay isometric task raw loadcell values
+        if (6 in packets):
+            result["replay_loadcell1_signal"] = packets[6][1]['loadcell1'].tolist()
+            result["replay_loadcell2_signal"] = packets[6][1]['loadcell2'].tolist()
+
+        #Calibration values from packet types 7 and 8 are interleaved in file order
+        calibration_data = []
+        if (7 in packets):
+            p = packets[7][1]
+            calibration_data.extend(zip(packets[7][0].tolist(),
+                zip(p['timenum'].tolist(), p['b1'].tolist(), p['b2'].tolist(), p['s1'].tolist(), p['s2'].tolist())))
+        if (8 in packets):
+            p = packets[8][1]
+            calibration_data.extend(zip(packets[8][0].tolist(), zip(p['timenum'].tolist(), p['b1'].tolist())))
+        if (len(calibration_data) > 0):
+            calibration_data.sort(key = lambda x: x[0])
+            result["replay_calibration_data"] = [x[1] for x in calibration_data]
+
+        #Session handedness. Only the final handedness packet in the file matters.
+        if (9 in packets):
+            result["is_session_handedness_known"] = True
+            result["is_session_left_handed"] = (int(packets[9][1]['is_left_handed'][-1]) == 1)
+
+        return result
+
+    #This method makes a single pass over the data region of a file, and finds the position and
+    #type of each packet. ReStore service messages have a variable length, so they are decoded
+    #during this pass. This method returns the packet positions and types as numpy arrays, the list
+    #of decoded ReStore messages (each paired with its packet index), and a flag indicating whether
+    #the pass was stopped early due to a corrupt packet.
+    @staticmethod
+    def IndexPackets (buffer, data_start_location):
+        packet_sizes = dict((k, v.itemsize) for (k, v) in RePlayControllerDataDecoder.packet_dtypes.items())
+        restore_packet_type = RePlayControllerDataDecoder.restore_message_packet_type
+        unpack_packet_type = RePlayDataFileStatic.struct_dictionary['int'].unpack_from
+
+        buffer_length = len(buffer)
+        end_location = buffer_length - RePlayControllerDataDecoder.footer_size
+
+        packet_positions = []
+        packet_types = []
+        restore_messages = []
+        crash_detected = False
+
+        restore_reader = None
+        position = data_start_location
+        try:
+            while (position < end_location):
+                packet_type = unpack_packet_type(buffer, position)[0]
+                if (packet_type in packet_sizes):
+                    packet_size = packet_sizes[packet_type]
+                    if ((position + packet_size) > buffer_length):
+                        raise struct.error(f"unpack requires a buffer of {packet_size} bytes")
+                    packet_positions.append(position)
+                    packet_types.append(packet_type)
+                    position += packet_size
+                elif (packet_type == restore_packet_type):
+                    if (restore_reader is None):
+                        #A memory-mapped file can be read from directly. Any other buffer is wrapped in a stream.
+                        if (hasattr(buffer, "seek") and hasattr(buffer, "read")):
+                            restore_reader = buffer
+                        else:
+                            restore_reader = io.BytesIO(buffer)
+                    restore_reader.seek(position + 4)
+                    restore_msg = RePlayDataFileStatic.read_restore_message(restore_reader)
+                    restore_messages.append((len(packet_positions), restore_msg))
+                    packet_positions.append(position)
+                    packet_types.append(packet_type)
+                    position = restore_reader.tell()
+                else:
+                    #Unrecognized packet types are skipped 4 bytes at a time
+                    position += 4
+        except ValueError:
+            crash_detected = True
+
+        return (np.array(packet_positions, dtype = np.int64), np.array(packet_types, dtype = np.int32), restore_messages, crash_detected)
+
+    #endregion
+
+    #region Private methods
+
+    #Gathers the bytes of each packet at the given positions and views them as a structured array. The packets are
+    #copied out of a sliding window view of the buffer (one row of bytes for each position), so that the only memory
+    #used is the memory that holds the packets themselves.
+    @staticmethod
+    def __decode_packets (buffer, packet_positions, packet_dtype):
+        if (len(packet_positions) == 0):
+            return np.zeros(0, dtype = packet_dtype)
+        raw_bytes = np.frombuffer(buffer, dtype = np.uint8)
+        packet_bytes = np.lib.stride_tricks.sliding_window_view(raw_bytes, packet_dtype.itemsize)[packet_positions]
+        return packet_bytes.view(packet_dtype).reshape(-1)
+
+    #Decodes a single field from packets that share a common header layout
+    @staticmethod
+    def __decode_field (buffer, packet_positions, packet_dtype, field_name):
+        return RePlayControllerDataDecoder.__decode_packets(buffer, packet_positions, packet_dtype)[field_name]
+
+    #endregion
@@ -30,7 +30,10 @@ from .RePlayVNSParameters import BufferExpirationPolicy
 
 class RePlayDataFile(persistent.Persistent):
         
-    def __init__(self, filepath):
+    #If use_mmap is True, the file is opened a single time and mapped into memory. The md5 checksum,
+    #the metadata, and the data packets are then all read from that mapping instead of from the disk.
+    #The mapping is released at the end of ReadData, or by calling CloseMappedFile.
+    def __init__(self, filepath, use_mmap = False):
         self.subject_id = None
         self.md5_checksum = None
         self.version = None
@@ -56,23 +59,48 @@ class RePlayDataFile(persistent.Persistent):
         self.controller_data = None
         self.game_data = None
 
-        self.__md5_checksum()
-        self.__read_meta_data()
+        #The memory-mapped file is a volatile attribute, so it is never saved to the database
+        self._v_mapped_file = None
+        if use_mmap:
+            self._v_mapped_file = RePlayDataFileStatic.map_data_file(self.filename)
+
+        try:
+            self.__md5_checksum()
+            self.__read_meta_data()
+        except:
+            self.CloseMappedFile()
+            raise
+
+    #This method releases the memory-mapped file (if there is one)
+    def CloseMappedFile(self):
+        mapped_file = getattr(self, "_v_mapped_file", None)
+        if mapped_file is not None:
+            self._v_mapped_file = None
+            try:
+                mapped_file.close()
+            except BufferError:
+                #Something still holds a view of the mapping. It will be released when that view is garbage collected.
+                pass
 
     # This method calculates the md5 checksum of the file's contents
     # This can be used for file verification
     def __md5_checksum(self):
         hash_md5 = hashlib.md5()
-        with open(self.filename, 'rb') as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
+        mapped_file = getattr(self, "_v_mapped_file", None)
+        if mapped_file is not None:
+            with memoryview(mapped_file) as file_view:
+                hash_md5.update(file_view)
+        else:
+            with open(self.filename, 'rb') as f:
+                for chunk in iter(lambda: f.read(4096), b""):
+                    hash_md5.update(chunk)
         self.md5_checksum = hash_md5.hexdigest()
         self._p_changed = True        
 
     def __read_meta_data(self):
         # print(f'Reading metadata from file: {self.filepath.stem}')
         # open the file and parse through to grab the meta data
-        with open(self.filename, 'rb') as f:
+        with RePlayDataFileStatic.open_data_file(self.filename, getattr(self, "_v_mapped_file", None)) as f:
             # seek to beginning of file and read the first 4 bytes: version number
             f.seek(0)
             self.version = RePlayDataFileStatic.read_byte_array(f, 'int32')
@@ -178,17 +206,18 @@ class RePlayDataFile(persistent.Persistent):
                         vns_algo_params_num_bytes = RePlayDataFileStatic.read_byte_array(f, 'int32')
 
                         #Read in the actual parameters
-                        vns_algo_enabled = RePlayDataFileStatic.read_byte_array(f, 'uint8')
-                        vns_algo_min_isi_ms = RePlayDataFileStatic.read_byte_array(f, 'double')
-                        vns_algo_desired_isi_ms = RePlayDataFileStatic.read_byte_array(f, 'double')
-                        vns_algo_selectivity = RePlayDataFileStatic.read_byte_array(f, 'double')
-                        vns_algo_compensatory_selectivity = RePlayDataFileStatic.read_byte_array(f, 'double')
-                        vns_algo_lookback_window = RePlayDataFileStatic.read_byte_array(f, 'double')
-                        vns_algo_smoothing_window = RePlayDataFileStatic.read_byte_array(f, 'double')
-                        vns_algo_noise_floor = RePlayDataFileStatic.read_byte_array(f, 'double')
-                        vns_algo_trig_pos = RePlayDataFileStatic.read_byte_array(f, 'uint8')
-                        vns_algo_trig_neg = RePlayDataFileStatic.read_byte_array(f, 'uint8')
-                        vns_algo_selectivity_controlled = RePlayDataFileStatic.read_byte_array(f, 'uint8')
+                        (vns_algo_enabled,
+                            vns_algo_min_isi_ms,
+                            vns_algo_desired_isi_ms,
+                            vns_algo_selectivity,
+                            vns_algo_compensatory_selectivity,
+                            vns_algo_lookback_window,
+                            vns_algo_smoothing_window,
+                            vns_algo_noise_floor,
+                            vns_algo_trig_pos,
+                            vns_algo_trig_neg,
+                            vns_algo_selectivity_controlled) = RePlayDataFileStatic.read_record(f, 
+                                ['uint8', 'double', 'double', 'double', 'double', 'double', 'double', 'double', 'uint8', 'uint8', 'uint8'])
                         n = RePlayDataFileStatic.read_byte_array(f, 'int32')
                         vns_algo_s1_smoothing = f.read(n).decode()
                         n = RePlayDataFileStatic.read_byte_array(f, 'int32')
@@ -270,10 +299,24 @@ class RePlayDataFile(persistent.Persistent):
             self.crash_detected = 0
         self._p_changed = True
 
-    def ReadData (self, trash_controller_device_data = False):
+    #If use_columnar_signals is True, the signal and signal timestamps of game data are stored
+    #as numpy arrays instead of lists (see RePlayGameData.ConvertSignalsToColumnar).
+    #If use_external_signals is True, the signals of the game data or controller data are saved as their
+    #own records in the database, and are only loaded when they are used (see RePlaySignalColumn).
+    def ReadData (self, trash_controller_device_data = False, use_columnar_signals = False, use_external_signals = False):
+        try:
+            self.__read_data(trash_controller_device_data, use_columnar_signals, use_external_signals, getattr(self, "_v_mapped_file", None))
+        finally:
+            self.CloseMappedFile()
+
+    def __read_data (self, trash_controller_device_data, use_columnar_signals, use_external_signals, mapped_file):
         if self.data_type == 0:
             self.controller_data = RePlayControllerData()
-            self.controller_data.ReadControllerData(self.filename, self.device_type, self.__data_start_location, trash_controller_device_data)
+            self.controller_data.ReadControllerData(self.filename, self.device_type, self.__data_start_location, 
+                trash_controller_device_data, mapped_file)
+
+            if use_external_signals:
+                self.controller_data.ExternalizeSignals()
 
         elif self.data_type == 1:
             
@@ -298,7 +341,7 @@ class RePlayDataFile(persistent.Persistent):
                 self.game_data = RePlayGameData()
 
             #Read the game data for this game session
-            self.game_data.ReadGameData(self.filepath, self.filename, self.__data_start_location)
+            self.game_data.ReadGameData(self.filepath, self.filename, self.__data_start_location, mapped_file)
             if ((int(self.replay_version_code) >= 30) or 
                 ((self.game_id == 'ReCheck') and (int(self.replay_version_code) >= 11))):
                 
@@ -311,6 +354,12 @@ class RePlayDataFile(persistent.Persistent):
             else:
                 self.__convert_signal_to_actual_signal()
 
+            if use_columnar_signals:
+                self.game_data.ConvertSignalsToColumnar()
+
+            if use_external_signals:
+                self.game_data.ExternalizeSignals()
+
         else:
             print("Unidentified data type detected")
         
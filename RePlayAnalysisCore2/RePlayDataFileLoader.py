@@ -0,0 +1,196 @@
+import os
+import traceback
+import multiprocessing
+
+from .RePlayDataFile import RePlayDataFile
+from .RePlayActivity import RePlayActivity
+from .RePlayCommitPolicy import RePlayCommitPolicy
+
+#This class loads RePlay data files into the database. Reading the data files is split across
+#a pool of worker processes: each worker reads a whole data file into a RePlayDataFile object,
+#which is then sent back to this process. Only this process changes the database. It adds each
+#data file to the table of loaded files and to the activity list (in the same order as the files
+#were passed in), and it commits transactions as often as its commit policy asks for (by default,
+#after every 50 files that are loaded).
+#
+#Worker processes import the script that created this object on some platforms (Windows and macOS),
+#so that script should only load files when it is running as the main process.
+class RePlayDataFileLoader:
+
+    #The names of the files (and their checksums) that were already in the database when the
+    #worker processes were started. This is only used by worker processes.
+    _previously_loaded_files = set()
+
+    def __init__(self, root, number_of_workers = None, commit_policy = None, use_mmap = False, use_columnar_signals = False,
+        use_file_manifest = True, use_external_signals = False):
+        #The root of the database that the data files will be loaded into
+        self.root = root
+
+        #The number of worker processes that will read data files. If this is 1 (or less),
+        #data files are read in this process instead of in worker processes.
+        if (number_of_workers is None):
+            number_of_workers = multiprocessing.cpu_count()
+        self.number_of_workers = number_of_workers
+
+        #The commit policy that decides when loaded data files are committed to the database. Each data file
+        #that is loaded counts as one changed object, and the size of the data file counts as its number of bytes.
+        if (commit_policy is None):
+            commit_policy = RePlayCommitPolicy(objects_per_commit = 50, commit_message = "(Partial commit complete)")
+        self.commit_policy = commit_policy
+
+        #Options that are passed along to RePlayDataFile
+        self.use_mmap = use_mmap
+        self.use_columnar_signals = use_columnar_signals
+        self.use_external_signals = use_external_signals
+
+        #If this is True, files that have already been loaded, and whose size and modification time have not
+        #changed since they were last seen, are skipped without being opened (see LoadedFilesTable.file_manifest)
+        self.use_file_manifest = use_file_manifest
+
+        #Counters that keep track of how many files have been loaded
+        self.loaded_previously = 0
+        self.loaded_successfully = 0
+        self.loaded_unrecognized = 0
+        self.loaded_failed = 0
+
+    #region Public methods
+
+    #This method loads a list of data files into the database. Each element of the list is a
+    #pair of [directory path, file name]. Files that are not ".txt" files are skipped.
+    def LoadFiles(self, file_list):
+        tasks = []
+        for (dirpath, file_name) in file_list:
+            if file_name.lower().endswith(".txt"):
+                full_file_path = dirpath + "/" + file_name
+                (file_size, file_mtime) = RePlayDataFileLoader.get_file_stat(full_file_path)
+                task = (full_file_path, file_name, file_size, file_mtime, self.use_mmap, self.use_columnar_signals, self.use_external_signals)
+
+                #Skip files that were already loaded and have not changed since then
+                if (self.use_file_manifest) and (file_size is not None) and \
+                    (self.root.loaded_files.IsFileUnchangedSinceLoaded(full_file_path, file_size, file_mtime)):
+                    self.__add_result_to_database(task, ("previously_loaded", file_name, None))
+                else:
+                    tasks.append(task)
+
+        previously_loaded_files = self.root.loaded_files.GetLoadedFiles()
+
+        if (self.number_of_workers > 1) and (len(tasks) > 1):
+            with multiprocessing.Pool(self.number_of_workers, RePlayDataFileLoader.initialize_worker,
+                (previously_loaded_files, )) as pool:
+
+                for (task, task_result) in zip(tasks, pool.imap(RePlayDataFileLoader.read_data_file, tasks)):
+                    self.__add_result_to_database(task, task_result)
+        else:
+            RePlayDataFileLoader.initialize_worker(previously_loaded_files)
+            for task in tasks:
+                self.__add_result_to_database(task, RePlayDataFileLoader.read_data_file(task))
+
+        #Commit any files that have been loaded since the last commit
+        self.commit_policy.Flush()
+
+    #endregion
+
+    #region Static methods
+
+    #This method returns the size and modification time (in nanoseconds) of a file, or (None, None)
+    #if the file cannot be found
+    @staticmethod
+    def get_file_stat(file_path):
+        try:
+            file_stat = os.stat(file_path)
+            return (file_stat.st_size, file_stat.st_mtime_ns)
+        except OSError:
+            return (None, None)
+
+    #This method is called once when each worker process is started (or in this process,
+    #if data files are not being read by worker processes)
+    @staticmethod
+    def initialize_worker(previously_loaded_files):
+        RePlayDataFileLoader._previously_loaded_files = previously_loaded_files
+
+    #This method reads a single data file (in a worker process). It returns a tuple of (status, file name, result), where the
+    #status is "unrecognized", "previously_loaded", "loaded", or "failed". If the file was loaded, the
+    #result is the RePlayDataFile object. If the file was previously loaded, the result is a tuple of
+    #the file's md5 checksum and participant id. If the file failed to load, the result is a tuple that
+    #holds the class of the exception and the traceback (as text).
+    @staticmethod
+    def read_data_file(task):
+        (full_file_path, file_name, _, _, use_mmap, use_columnar_signals, use_external_signals) = task
+
+        #Do an initial read of the file's metadata
+        try:
+            this_file_data = RePlayDataFile(full_file_path, use_mmap = use_mmap)
+        except:
+            return ("unrecognized", file_name, None)
+
+        #Check to see if this file has already been loaded into the database
+        if ((file_name, this_file_data.md5_checksum) in RePlayDataFileLoader._previously_loaded_files):
+            this_file_data.CloseMappedFile()
+            return ("previously_loaded", file_name, (this_file_data.md5_checksum, this_file_data.subject_id))
+
+        #Read the whole file
+        try:
+            this_file_data.ReadData(use_columnar_signals = use_columnar_signals, use_external_signals = use_external_signals)
+        except Exception as e:
+            return ("failed", file_name, (e.__class__, traceback.format_exc()))
+
+        return ("loaded", file_name, this_file_data)
+
+    #endregion
+
+    #region Private methods
+
+    #This method adds the result of reading a single data file to the database, and lets the commit
+    #policy know if the data file was added.
+    def __add_result_to_database(self, task, task_result):
+        (full_file_path, _, file_size, file_mtime, _, _, _) = task
+        (status, file_name, result) = task_result
+
+        if (status == "unrecognized"):
+            print ("THIS FILE DOESN'T LOOK LIKE A REPLAY FILE: " + file_name)
+            self.loaded_unrecognized = self.loaded_unrecognized + 1
+
+        elif (status == "failed"):
+            (exception_class, exception_traceback) = result
+            print(exception_traceback, end = "")
+            print(exception_class)
+            print("FAILED TO LOAD FILE: " + file_name)
+            self.loaded_failed = self.loaded_failed + 1
+
+        elif (status == "loaded") and (not self.root.loaded_files.IsFileAlreadyLoaded(file_name, result.md5_checksum)):
+            try:
+                #Add this file to the list of loaded files
+                self.root.loaded_files.AppendLoadedFileToTable(result.subject_id, file_name, result.md5_checksum)
+
+                #Update the list of activities
+                RePlayActivity.AddSessionToActivityList(self.root.activity_list, result, getattr(self.root, "activity_index", None))
+
+                #Remember the size and modification time of this file
+                self.__update_file_manifest(full_file_path, file_size, file_mtime, result.md5_checksum, result.subject_id)
+
+                print("Successfully loaded file: " + file_name)
+                self.loaded_successfully = self.loaded_successfully + 1
+                self.commit_policy.ObjectChanged(1, file_size if (file_size is not None) else 0)
+            except Exception as e:
+                traceback.print_exc()
+                print(e.__class__)
+                print("FAILED TO LOAD FILE: " + file_name)
+                self.loaded_failed = self.loaded_failed + 1
+
+        else:
+            #This file was either in the database before loading started, or an identical
+            #copy of this file was loaded earlier in this call
+            if (status == "previously_loaded") and (result is not None):
+                self.__update_file_manifest(full_file_path, file_size, file_mtime, result[0], result[1])
+            elif (status == "loaded"):
+                self.__update_file_manifest(full_file_path, file_size, file_mtime, result.md5_checksum, result.subject_id)
+            print(file_name + " was previously loaded into the database.")
+            self.loaded_previously = self.loaded_previously + 1
+            self.loaded_successfully = self.loaded_successfully + 1
+
+    #This method records the size and modification time of a file that has been loaded
+    def __update_file_manifest(self, full_file_path, file_size, file_mtime, md5checksum, participant_id):
+        if (self.use_file_manifest) and (file_size is not None):
+            self.root.loaded_files.UpdateFileManifest(full_file_path, file_size, file_mtime, md5checksum, participant_id)
+
+    #endregion
@@ -1,5 +1,7 @@
 import os
+import mmap
 import struct
+import contextlib
 import time
 import itertools
 import hashlib
@@ -10,40 +12,106 @@ from datetime import timedelta
 from pathlib import Path
 
 from .RePlayUtilities import convert_datenum
+from .RePlayUtilities import convert_datenum_array
+from .RePlayUtilities import calculate_elapsed_seconds
 
 class RePlayDataFileStatic:
 
+    #Format characters for each type that can be read from a data file
+    type_dictionary = {'char': 'c',
+                'int': 'i',
+                'int32': 'i',
+                'int8': 'b',
+                'unsigned int': 'I',
+                'uint8': 'B',
+                'float': 'f',
+                'float64': 'd',
+                'double': 'd'}
+
+    #Number of bytes occupied by each type in a data file
+    length_dictionary = {'char': 2,
+                'int': 4,
+                'int32': 4,
+                'int8': 1,
+                'unsigned int': 4,
+                'uint8': 1,
+                'float': 4,
+                'float64': 8,
+                'double': 8}
+
+    #Precompiled struct objects for each individual type
+    struct_dictionary = {k: struct.Struct(v) for (k, v) in type_dictionary.items()}
+
+    #Precompiled struct objects for multi-field records. This is filled in as new record layouts are requested.
+    record_struct_dictionary = {}
+
+    #Precompiled struct object for a 16-byte GUID
+    guid_struct = struct.Struct('=16B')
+
     @staticmethod
     def read_16byte_guid(opened_file):
-        result_guid = []
-        for _ in itertools.repeat(None, 16):
-            result_guid.append(RePlayDataFileStatic.read_byte_array(opened_file, 'uint8'))
-        return result_guid
+        return list(RePlayDataFileStatic.guid_struct.unpack(opened_file.read(16)))
 
     @staticmethod
     def read_byte_array(opened_file, desired_type):
-        type_dictionary = {'char': 'c',
-                    'int': 'i',
-                    'int32': 'i',
-                    'int8': 'b',
-                    'unsigned int': 'I',
-                    'uint8': 'B',
-                    'float': 'f',
-                    'float64': 'd',
-                    'double': 'd'}
-
-        length_dictionary = {'char': 2,
-                    'int': 4,
-                    'int32': 4,
-                    'int8': 1,
-                    'unsigned int': 4,
-                    'uint8': 1,
-                    'float': 4,
-                    'float64': 8,
-                    'double': 8}                    
-        unpacked = struct.unpack(type_dictionary[desired_type], opened_file.read(length_dictionary[desired_type]))
+        unpacked = RePlayDataFileStatic.struct_dictionary[desired_type].unpack(
+            opened_file.read(RePlayDataFileStatic.length_dictionary[desired_type]))
         return unpacked[0]
 
+    #This method returns a precompiled struct object for a record made up of several consecutive fields.
+    #The record is packed (there are no alignment bytes between fields), which is how RePlay writes its data files.
+    @staticmethod
+    def get_record_struct(desired_types):
+        desired_types = tuple(desired_types)
+        record_struct = RePlayDataFileStatic.record_struct_dictionary.get(desired_types, None)
+        if record_struct is None:
+            record_struct = struct.Struct('=' + ''.join(RePlayDataFileStatic.type_dictionary[x] for x in desired_types))
+            RePlayDataFileStatic.record_struct_dictionary[desired_types] = record_struct
+        return record_struct
+
+    #This method reads a record made up of several consecutive fields with a single read and a single unpack.
+    #It returns a tuple with one value for each of the desired types.
+    @staticmethod
+    def read_record(opened_file, desired_types):
+        record_struct = RePlayDataFileStatic.get_record_struct(desired_types)
+        return record_struct.unpack(opened_file.read(record_struct.size))
+
+    #This method unpacks a record made up of several consecutive fields from a buffer (bytes, memoryview, mmap)
+    #at the given offset. It returns a tuple with one value for each of the desired types.
+    @staticmethod
+    def unpack_record_from(buffer, offset, desired_types):
+        return RePlayDataFileStatic.get_record_struct(desired_types).unpack_from(buffer, offset)
+
+    #This method opens a data file a single time and maps its whole contents into memory (read-only).
+    #The returned mmap object supports the buffer protocol (so it can be hashed, viewed with memoryview,
+    #or decoded with numpy without copying), and it also supports read/seek/tell like an open file.
+    @staticmethod
+    def map_data_file(filename):
+        with open(filename, 'rb') as f:
+            return mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+
+    #This method returns the size of a data file in bytes. If the file has already been
+    #mapped into memory, the size of the mapping is used instead of querying the disk.
+    @staticmethod
+    def get_data_file_length(filename, mapped_file = None):
+        if mapped_file is None:
+            return os.stat(filename).st_size
+        else:
+            return len(mapped_file)
+
+    #This method returns an object that can be used in a "with" statement to read from a data file.
+    #If the file has already been mapped into memory, the mapping is used and no file is opened.
+    #The mapping is NOT closed at the end of the "with" statement, because it is owned by the caller.
+    @staticmethod
+    @contextlib.contextmanager
+    def open_data_file(filename, mapped_file = None):
+        if mapped_file is None:
+            with open(filename, 'rb') as f:
+                yield f
+        else:
+            mapped_file.seek(0)
+            yield mapped_file
+
     @staticmethod
     def read_restore_message(f):
         #This code handles reading in a "ReStore Service Message" packet.
@@ -96,6 +164,27 @@ class RePlayDataFileStatic:
                + timedelta(days=days) \
                - timedelta(days=366)
 
+    #Range of Matlab datenums that can always be converted to a python datetime
+    valid_datenum_range = (367, 3652059)
+
+    #This method raises an exception if (and only if) convert_datenum would raise an exception for this datenum.
+    #Readers call this on each timestamp as it is read, so that a bad timestamp is still handled at the same
+    #packet as before, but the actual conversion can be deferred and done for all timestamps at once.
+    @staticmethod
+    def validate_datenum(datenum):
+        if not (RePlayDataFileStatic.valid_datenum_range[0] <= datenum < RePlayDataFileStatic.valid_datenum_range[1]):
+            convert_datenum(datenum)
+
+    #This method converts a list of Matlab datenums (all of which must be valid) into the 3 lists
+    #that are used for signal timestamps: the datetime of each sample, the timedelta of each sample
+    #since the initial datetime, and the number of seconds since the initial datetime.
+    #If the initial datetime is not given, the first datenum in the list is used.
+    @staticmethod
+    def convert_datenums_to_signal_times(datenums, initial_datetime = None):
+        timenum = convert_datenum_array(datenums)
+        (timeelapsed, time_seconds) = calculate_elapsed_seconds(timenum, initial_datetime)
+        return (timenum.tolist(), timeelapsed.tolist(), time_seconds.tolist())
+
     @staticmethod
     def calculate_timedelta_from_datenums(initial_datenum, final_datenum):
         initial_datetime = RePlayDataFileStatic.convert_datenum_to_dateTime(initial_datenum)
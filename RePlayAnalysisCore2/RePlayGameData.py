@@ -12,6 +12,8 @@ from datetime import timedelta
 from pathlib import Path
 
 from RePlayAnalysisCore2.RePlaySignalAnalyzer import RePlaySignalAnalyzer
+from RePlayAnalysisCore2.RePlayDataFileStatic import RePlayDataFileStatic
+from RePlayAnalysisCore2.RePlaySignalColumn import RePlaySignalColumn
 
 class RePlayGameData(persistent.Persistent):
 
@@ -19,6 +21,10 @@ class RePlayGameData(persistent.Persistent):
     def __init__(self):
         self.game_data_file_version = 0
 
+    #Signals that have been moved out of this object (see ExternalizeSignals) are loaded the first time they are used
+    def __getattr__(self, name):
+        return RePlaySignalColumn.get_signal_column(self, name)
+
     #Empty shell of a function that will be inherited by child classes.
     #This function will tell the analysis code how to convert the signal
     #that was saved in the data file into 2 signals: the signal in 
@@ -28,9 +34,60 @@ class RePlayGameData(persistent.Persistent):
 
     #Empty shell of a function that will be inherited by child classes. 
     #This method will be used to read in game data for each individual game.
-    def ReadGameData(self, file_path, file_name, data_start_location):
+    def ReadGameData(self, file_path, file_name, data_start_location, mapped_file = None):
+        self._p_changed = True
+
+    #This method converts the Matlab datenums that were collected for each sample of the signal
+    #during ReadGameData, and appends them to signal_timenum, signal_timeelapsed, and signal_time.
+    def AppendSignalTimestamps(self, signal_datenums):
+        if (len(signal_datenums) > 0):
+            initial_datetime = None
+            if (len(self.signal_timenum) > 0):
+                initial_datetime = self.signal_timenum[0]
+            (signal_timenum, signal_timeelapsed, signal_time) = \
+                RePlayDataFileStatic.convert_datenums_to_signal_times(signal_datenums, initial_datetime)
+            self.signal_timenum.extend(signal_timenum)
+            self.signal_timeelapsed.extend(signal_timeelapsed)
+            self.signal_time.extend(signal_time)
+        self._p_changed = True
+
+    #This method converts the signal and its timestamps from lists into contiguous numpy arrays:
+    #float64 for signal and signal_time, datetime64 for signal_timenum, and timedelta64 for
+    #signal_timeelapsed. Indexing, len(), and iteration work the same way as they do for lists.
+    #A list that cannot be represented this way (for example, a signal that contains None
+    #values) is left as a list.
+    def ConvertSignalsToColumnar(self):
+        column_types = [("signal", np.float64), ("signal_time", np.float64), 
+            ("signal_timenum", "datetime64[us]"), ("signal_timeelapsed", "timedelta64[us]")]
+
+        for (column_name, column_type) in column_types:
+            column = getattr(self, column_name, None)
+            if not isinstance(column, list):
+                continue
+
+            try:
+                if (column_type == np.float64):
+                    column_array = np.array(column)
+                    if (column_array.dtype == object):
+                        continue
+                    column_array = column_array.astype(np.float64)
+                else:
+                    column_array = np.array(column, dtype = column_type)
+            except (TypeError, ValueError):
+                continue
+
+            #If the "actual" signal is the same list as the signal, keep it that way
+            if (column_name == "signal") and (getattr(self, "signal_actual", None) is column):
+                self.signal_actual = column_array
+            setattr(self, column_name, column_array)
+
         self._p_changed = True
 
+    #This method moves the signals of this object (and any other long lists or arrays) into their own records
+    #in the database, so that they are only loaded when they are used (see RePlaySignalColumn).
+    def ExternalizeSignals(self):
+        RePlaySignalColumn.externalize_signal_columns(self)
+
     def GetRepetitionData(self, exercise_name):
         result_rep_start_idx = []
         result_repetition_count = 0
@@ -76,5 +133,91 @@ class RePlayGameData(persistent.Persistent):
             else:
                 result = self.difficulty        
         return result
-        
 
+    #region Signal time lookups
+
+    #This method returns, for each of the given times, the index of the first sample of the signal whose timestamp
+    #is at or after that time (the same sample that a linear search from the start of the signal would find).
+    #The timestamps are taken from signal_time, or from another timestamp column (such as signal_timenum) if its
+    #name is passed in. Each lookup is a binary search (see get_signal_time_search_array). Times that are after
+    #every sample are given the fallback index (if one is passed in), or else the length of the signal.
+    #It returns an integer if a single time is passed in, or an array of integers if a list of times is passed in.
+    def FindSignalTimeIndices(self, times, fallback_idx = None, column_name = "signal_time"):
+        search_array = self.__get_signal_time_search_array(column_name)
+        result = np.searchsorted(search_array, np.asarray(times, dtype = search_array.dtype), side = "left")
+        if (fallback_idx is not None):
+            result = np.where(result >= len(search_array), fallback_idx, result)
+        if (np.ndim(result) == 0):
+            return int(result)
+        return result
+
+    #This method returns a boolean array with one element for each sample of the signal, which is True for the
+    #samples that are inside at least one of the given time windows. Each window holds the samples from the first
+    #sample at or after its start time, up to (but not including) the first sample at or after its end time
+    #(see FindSignalTimeIndices).
+    def GetSignalTimeWindowMask(self, start_times, end_times, fallback_idx = None, column_name = "signal_time"):
+        signal_length = len(self.__get_signal_time_search_array(column_name))
+        start_idx = self.FindSignalTimeIndices(start_times, fallback_idx, column_name)
+        end_idx = self.FindSignalTimeIndices(end_times, fallback_idx, column_name)
+        return RePlayGameData.get_window_mask(signal_length, start_idx, end_idx)
+
+    #endregion
+
+    #region Static methods
+
+    #This method returns an array that can be binary searched to find the first sample of a timestamp column at or
+    #after a time. The timestamps do not need to be sorted: the array holds their running maximum, which is first
+    #at or after a time at the same sample as the timestamps themselves. Missing timestamps (NaN or NaT) are never
+    #at or after a time. Columns of datetimes are returned as datetime64 arrays, and other columns as float64 arrays.
+    @staticmethod
+    def get_signal_time_search_array(column):
+        column_array = np.asarray(column)
+        if (column_array.dtype.kind not in "fM"):
+            if (len(column_array) > 0) and isinstance(column_array[0], datetime):
+                column_array = column_array.astype("datetime64[us]")
+            else:
+                column_array = column_array.astype(np.float64)
+
+        search_array = np.fmax.accumulate(column_array.ravel())
+        if (search_array.dtype.kind == "M"):
+            search_array[np.isnat(search_array)] = np.datetime64(np.iinfo(np.int64).min + 1, "us")
+        else:
+            search_array[np.isnan(search_array)] = -np.inf
+        return search_array
+
+    #This method returns a boolean array of the given length, which is True for the elements that are inside
+    #at least one of the windows from start_idx (inclusive) to end_idx (exclusive)
+    @staticmethod
+    def get_window_mask(length, start_idx, end_idx):
+        start_idx = np.asarray(start_idx, dtype = np.int64).ravel()
+        end_idx = np.asarray(end_idx, dtype = np.int64).ravel()
+        is_window_nonempty = (start_idx < end_idx)
+
+        window_edges = np.zeros(length + 1, dtype = np.int64)
+        np.add.at(window_edges, start_idx[is_window_nonempty], 1)
+        np.add.at(window_edges, end_idx[is_window_nonempty], -1)
+        return (np.cumsum(window_edges[0:-1]) > 0)
+
+    #endregion
+
+    #region Private methods
+
+    #This method returns the search array of a timestamp column (see get_signal_time_search_array). The search array
+    #is kept in memory (it is not saved to the database), and it is created again if the column is replaced or its
+    #length changes.
+    def __get_signal_time_search_array(self, column_name):
+        column = getattr(self, column_name)
+        search_arrays = getattr(self, "_v_signal_time_search_arrays", None)
+        if (search_arrays is None):
+            search_arrays = {}
+            self._v_signal_time_search_arrays = search_arrays
+
+        cached_search_array = search_arrays.get(column_name, None)
+        if (cached_search_array is not None) and (cached_search_array[0] is column) and (cached_search_array[1] == len(column)):
+            return cached_search_array[2]
+
+        search_array = RePlayGameData.get_signal_time_search_array(column)
+        search_arrays[column_name] = (column, len(column), search_array)
+        return search_array
+
+    #endregion
@@ -13,11 +13,23 @@ from py_linq import Enumerable
 from .RePlayUtilities import convert_datenum
 from .RePlayGameData import RePlayGameData
 from .RePlayDataFileStatic import RePlayDataFileStatic
+from .RePlayRaggedArray import RePlayRaggedArray
 from .RePlayExercises import RePlayExercises
 from .RePlayExercises import RePlayDevice
 
 class RePlayGameDataBreakout(RePlayGameData):
 
+    #Layout of the information for each block (x, y, block type, durability)
+    block_record_dtype = np.dtype([('x', '<f4'), ('y', '<f4'), ('block_type', 'O'), ('durability', '<i4')])
+
+    #Layout of the information for each ball (guid, x, y, speed, radius). Balls from game file
+    #version 1 do not have a GUID, so their GUID is all zeros.
+    ball_record_dtype = np.dtype([('guid', 'u1', (16,)), ('x', '<f4'), ('y', '<f4'), ('speed', '<f4'), ('radius', '<f4')])
+
+    #Layouts of each ball as it is saved in the data file
+    ball_file_record_dtype_v1 = np.dtype([('x', '<f4'), ('y', '<f4'), ('speed', '<f4'), ('radius', '<f4')])
+    ball_file_record_dtype_v2 = ball_record_dtype
+
     def __init__(self):
         super().__init__()
 
@@ -73,7 +85,7 @@ class RePlayGameDataBreakout(RePlayGameData):
 
         return (result_signal, self.signal_time, result_units)                
 
-    def ReadGameData(self, file_path, file_name, data_start_location):
+    def ReadGameData(self, file_path, file_name, data_start_location, mapped_file = None):
         self.filepath = file_path
         self.filename = file_name
         self.__data_start_location = data_start_location
@@ -86,7 +98,7 @@ class RePlayGameDataBreakout(RePlayGameData):
         self.block_height = []
         self.num_blocks = []
         
-        self.block_info = []
+        self.block_info = RePlayRaggedArray(RePlayGameDataBreakout.block_record_dtype)
 
         self.signal = []
         self.signal_timenum = []
@@ -97,7 +109,7 @@ class RePlayGameDataBreakout(RePlayGameData):
         self.paddle_size = []
 
         self.num_balls = []
-        self.ball_info = []
+        self.ball_info = RePlayRaggedArray(RePlayGameDataBreakout.ball_record_dtype)
 
         self.collision_time = []
         self.collided_block = []
@@ -107,10 +119,13 @@ class RePlayGameDataBreakout(RePlayGameData):
         self.number_rebaseline_values = []
         self.rebaseline_values = []
 
+        #Raw Matlab datenums of each signal sample. These are converted all at once after the file has been read.
+        signal_datenums = []
+
         #Grab the file size in bytes
-        flength = os.stat(self.filename).st_size
+        flength = RePlayDataFileStatic.get_data_file_length(self.filename, mapped_file)
 
-        with open(self.filename, 'rb') as f:
+        with RePlayDataFileStatic.open_data_file(self.filename, mapped_file) as f:
 
             # seek to the position in the file to begin reading trial information
             f.seek(self.__data_start_location)
@@ -136,73 +151,55 @@ class RePlayGameDataBreakout(RePlayGameData):
                             set_blocks_info = []
                             #this is a more efficient way of looping a set number of times
                             for _ in itertools.repeat(None, num_blocks):
-                                ind_block_info = []
-                                
                                 #read in the x and y coordinates of the block
-                                ind_block_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                                ind_block_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
+                                (block_x, block_y) = RePlayDataFileStatic.read_record(f, ['float'] * 2)
 
                                 # read in block type
                                 temp_length = RePlayDataFileStatic.read_byte_array(f, 'int32')
-                                ind_block_info.append(f.read(temp_length).decode())
+                                block_type = f.read(temp_length).decode()
 
                                 #Read in the block durability
-                                ind_block_info.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
+                                block_durability = RePlayDataFileStatic.read_byte_array(f, 'int')
 
-                                set_blocks_info.append(ind_block_info)
+                                set_blocks_info.append((block_x, block_y, block_type, block_durability))
                                 
-                            self.block_info.append(set_blocks_info)
+                            self.block_info.AppendFrame(set_blocks_info)
 
                         #Packet 2 indicates stream data
                         elif packet_type == 2:
                             timenum_read = RePlayDataFileStatic.read_byte_array(f, 'float64')
-                            self.signal_timenum.append(convert_datenum(timenum_read))
-                            self.signal_timeelapsed.append(self.signal_timenum[-1]-self.signal_timenum[0])
-                            self.signal_time.append(self.signal_timeelapsed[-1].total_seconds())
+                            RePlayDataFileStatic.validate_datenum(timenum_read)
+                            signal_datenums.append(timenum_read)
                             self.signal.append(RePlayDataFileStatic.read_byte_array(f, 'double'))
 
                             #read in the x and y position of the paddle
                             pad_pos = []
-                            pad_pos.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                            pad_pos.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
+                            pad_pos.extend(RePlayDataFileStatic.read_record(f, ['float'] * 2))
                             self.paddle_position.append(pad_pos)
 
                             #read in the width and height of the paddle
                             pad_size = []
-                            pad_size.append(RePlayDataFileStatic.read_byte_array(f, 'int'))    
-                            pad_size.append(RePlayDataFileStatic.read_byte_array(f, 'int'))      
+                            pad_size.extend(RePlayDataFileStatic.read_record(f, ['int'] * 2))
                             self.paddle_size.append(pad_size)
 
                             #read in information for each ball
                             num_balls = (RePlayDataFileStatic.read_byte_array(f, 'int'))
                             self.num_balls.append(num_balls)
-                            set_balls_info = []
-                            for _ in itertools.repeat(None, num_balls):
-                                ind_ball_info = []
 
+                            #read in the guid (game file version 2 and above), x and y position, speed, and radius of each ball
+                            ball_file_record_dtype = None
+                            if (num_balls > 0):
                                 if (self.game_file_version[0] >= 2):
-                                    ind_ball_info.append(RePlayDataFileStatic.read_16byte_guid(f))
+                                    ball_file_record_dtype = RePlayGameDataBreakout.ball_file_record_dtype_v2
                                 else:
-                                    ind_ball_info.append(["UNKNOWN"])
-
-                                #read in x,y position of ball
-                                ind_ball_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                                ind_ball_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                                #read in ball speed
-                                ind_ball_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                                #read in ball radius
-                                ind_ball_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-
-                                set_balls_info.append(ind_ball_info)
-                            
-                            self.ball_info.append(set_balls_info)
+                                    ball_file_record_dtype = RePlayGameDataBreakout.ball_file_record_dtype_v1
+                            self.ball_info.ReadFrame(f, num_balls, ball_file_record_dtype)
 
                         elif packet_type == 3:
                             self.collision_time.append(RePlayDataFileStatic.read_byte_array(f, 'float64'))
 
                             collided_block = []
-                            collided_block.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                            collided_block.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
+                            collided_block.extend(RePlayDataFileStatic.read_record(f, ['float'] * 2))
 
                             #Durability
                             if self.game_file_version[0] >= 2:
@@ -297,6 +294,7 @@ class RePlayGameDataBreakout(RePlayGameData):
                                 self.aborted_file = True
                                 self._p_changed = True
                                 print("Aborting file because bad packet count exceeded 10 bad packets.")
+                                self.AppendSignalTimestamps(signal_datenums)
                                 return
 
                     except:
@@ -305,12 +303,16 @@ class RePlayGameDataBreakout(RePlayGameData):
                             self.aborted_file = True
                             self._p_changed = True
                             print("Aborting file because bad packet count exceeded 10 bad packets.")
+                            self.AppendSignalTimestamps(signal_datenums)
                             return
 
             except:
                 print(f'\nGame Crash detected during read of file: {self.filepath.stem}')
                 self.crash_detected = 1
 
+        #Convert the timestamps of the signal samples
+        self.AppendSignalTimestamps(signal_datenums)
+
         self._p_changed = True
 
     def CalculateBreakoutGameMetrics (self):
@@ -325,22 +327,8 @@ class RePlayGameDataBreakout(RePlayGameData):
             #Define the threshold that must be crossed by a ball for it to be considered as "lost"
             paddle_y_threshold = 1500
 
-            #Get an array of the main ball position over time
-            ball_1_ypos = []
-            for i in range(0, len(self.ball_info)):
-                success = False
-                cur_all_ball_info = self.ball_info[i]
-                if (len(cur_all_ball_info) > 0):
-                    cur_ball_info = cur_all_ball_info[0]
-                    if (len(cur_ball_info) >= 3):
-                        cur_ypos = cur_ball_info[2]
-                        ball_1_ypos.append(cur_ypos)
-                        success = True
-                
-                if (not success):
-                    ball_1_ypos.append(float("NaN"))
-
-            main_ball_position_signal = np.array(ball_1_ypos)
+            #Get an array of the main ball position over time (the y position of the first ball in each frame)
+            main_ball_position_signal = RePlayRaggedArray.get_first_record_field_in_each_frame(self.ball_info, 2).astype(np.float64)
             num_balls_signal = np.array(self.num_balls)
             timestamps_signal = np.array(self.signal_time)
 
@@ -103,7 +103,7 @@ class RePlayGameDataFruitArchery(RePlayGameData):
                 
         return (result_signal, self.signal_time, result_units)  
 
-    def ReadGameData(self, file_path, file_name, data_start_location):
+    def ReadGameData(self, file_path, file_name, data_start_location, mapped_file = None):
         self.filepath = file_path
         self.filename = file_name
         self.__data_start_location = data_start_location
@@ -140,10 +140,17 @@ class RePlayGameDataFruitArchery(RePlayGameData):
         self.number_rebaseline_values = []
         self.rebaseline_values = []
 
+        #Raw Matlab datenums of each signal sample. These are converted all at once after the file has been read.
+        signal_datenums = []
+
+        #Arrow, bow, and fruit information lists that begin with the timestamp of their frame. Until the file
+        #has been read, the first element of each of these lists is the index of that frame.
+        frame_info_with_timestamps = []
+
         #Grab the file size in bytes
-        flength = os.stat(self.filename).st_size
+        flength = RePlayDataFileStatic.get_data_file_length(self.filename, mapped_file)
 
-        with open(self.filename, 'rb') as f:
+        with RePlayDataFileStatic.open_data_file(self.filename, mapped_file) as f:
             f.seek(self.__data_start_location)
             try:
                 while (f.tell() < flength - 4):
@@ -162,9 +169,8 @@ class RePlayGameDataFruitArchery(RePlayGameData):
                     #Packet 2 indicates frame data
                     elif packet_type == 2:
                         timenum_read = RePlayDataFileStatic.read_byte_array(f, 'float64')
-                        self.signal_timenum.append(convert_datenum(timenum_read))
-                        self.signal_timeelapsed.append(self.signal_timenum[-1]-self.signal_timenum[0])
-                        self.signal_time.append(self.signal_timeelapsed[-1].total_seconds())
+                        RePlayDataFileStatic.validate_datenum(timenum_read)
+                        signal_datenums.append(timenum_read)
 
                         arrow_exists = RePlayDataFileStatic.read_byte_array(f, 'uint8')
                         self.arrow_exists.append(arrow_exists)
@@ -175,11 +181,9 @@ class RePlayGameDataFruitArchery(RePlayGameData):
                             #arrow_info [timestamp, arrow_pos_x, arrow_pos_y, arrow_vel_x, arrow_vel_y]
                             arrow_info = []
                             if arrow_flying == 1:
-                                arrow_info.append(self.signal_timeelapsed[-1])
-                                arrow_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                                arrow_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                                arrow_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                                arrow_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
+                                arrow_info.append(len(signal_datenums) - 1)
+                                frame_info_with_timestamps.append(arrow_info)
+                                arrow_info.extend(RePlayDataFileStatic.read_record(f, ['float'] * 4))
 
                                 self.arrow_info.append(arrow_info)
 
@@ -206,7 +210,8 @@ class RePlayGameDataFruitArchery(RePlayGameData):
 
                         bow_info = []
                         if bow_exists == 1:
-                            bow_info.append(self.signal_timeelapsed[-1])
+                            bow_info.append(len(signal_datenums) - 1)
+                            frame_info_with_timestamps.append(bow_info)
 
                             #File Version 2: bow_info = [bow_pos_x, bow_pos_y, bow_rot(radians)]
                             if self.game_file_version[0] >= 2:
@@ -220,16 +225,12 @@ class RePlayGameDataFruitArchery(RePlayGameData):
                                     self.signal_force.append(RePlayDataFileStatic.read_byte_array(f, 'double'))
                                 self.signal.append(RePlayDataFileStatic.read_byte_array(f, 'double'))
 
-                                bow_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                                bow_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                                bow_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
+                                bow_info.extend(RePlayDataFileStatic.read_record(f, ['float'] * 3))
                                 self.bow_info.append(bow_info)
 
                             #File Version 1: bow_info consists of [bow_pos_x, bow_pos_y, bow_rot(radians)]
                             elif self.game_file_version[0] == 1:
-                                bow_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                                bow_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                                bow_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
+                                bow_info.extend(RePlayDataFileStatic.read_record(f, ['float'] * 3))
                                 
                                 self.bow_info.append(bow_info)
 
@@ -259,13 +260,9 @@ class RePlayGameDataFruitArchery(RePlayGameData):
                         #fruit_info = [timestamp, fruit_pos_x, fruit_pos_y, fruit_rotation, fruit_size_x, fruit_size_y, fruit_hit]
                         fruit_info = []
                         if fruit_exists == 1:
-                            fruit_info.append(self.signal_timeelapsed[-1])
-                            fruit_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                            fruit_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                            fruit_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                            fruit_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                            fruit_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                            fruit_info.append(RePlayDataFileStatic.read_byte_array(f, 'uint8'))
+                            fruit_info.append(len(signal_datenums) - 1)
+                            frame_info_with_timestamps.append(fruit_info)
+                            fruit_info.extend(RePlayDataFileStatic.read_record(f, ['float', 'float', 'float', 'float', 'float', 'uint8']))
 
                             self.fruit_info.append(fruit_info)
 
@@ -301,14 +298,25 @@ class RePlayGameDataFruitArchery(RePlayGameData):
                         if (self.bad_packet_count > 10):
                             self.aborted_file = True
                             print("Aborting file because bad packet count exceeded 10 bad packets.")
+                            self.__append_frame_timestamps(signal_datenums, frame_info_with_timestamps)
                             return                        
 
             except:
                 print(f'\nGame Crash detected during read of file: {self.filepath.stem}')
                 self.crash_detected = 1        
 
+        #Convert the timestamps of the signal samples
+        self.__append_frame_timestamps(signal_datenums, frame_info_with_timestamps)
+
         self._p_changed = True
 
+    #Converts the timestamps of the signal samples, and then replaces the frame index at the start of
+    #each arrow, bow, and fruit information list with the time elapsed at that frame
+    def __append_frame_timestamps(self, signal_datenums, frame_info_with_timestamps):
+        self.AppendSignalTimestamps(signal_datenums)
+        for frame_info in frame_info_with_timestamps:
+            frame_info[0] = self.signal_timeelapsed[frame_info[0]]
+
     def CalculateFruitHitPerMinute (self):
         fruit_hit_per_minute = 0
         try:
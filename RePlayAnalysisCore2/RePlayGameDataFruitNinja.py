@@ -10,18 +10,31 @@ from datetime import timedelta
 from pathlib import Path
 
 import math
-import persistent
 
 from .RePlayUtilities import convert_datenum
 from .RePlayGameData import RePlayGameData
 from .RePlayDataFileStatic import RePlayDataFileStatic
+from .RePlayRaggedArray import RePlayRaggedArray
 
 class RePlayGameDataFruitNinja(RePlayGameData):
 
+    #Layout of the information for each touch (x position, y position, ID, state)
+    touch_record_dtype = np.dtype([('x', '<f4'), ('y', '<f4'), ('id', '<i4'), ('state', '<i4')])
+
+    #Layout of the information for each fruit (fruit_id, fruit_speed, fruit_gravity, fruit_x, fruit_abs_y, 
+    #fruit_is_alive, fruit_is_obstacle, fruit_time)
+    fruit_record_dtype = np.dtype([('id', '<i4'), ('speed', '<i4'), ('gravity', '<f4'), ('x', '<i4'), ('abs_y', '<i4'), 
+        ('is_alive', 'u1'), ('is_obstacle', 'u1'), ('time', '<f4')])
+
+    #The fields of each touch trajectory and each object trajectory, with the position of each field in the touch
+    #or object records (the time of each point of a trajectory is taken from signal_time instead)
+    touch_trajectory_fields = [("x", 0), ("y", 1), ("t", None)]
+    object_trajectory_fields = [("t", None), ("x", 3), ("y", 4), ("is_alive", 5), ("is_bomb", 6)]
+
     def __init__(self):
         super().__init__()
 
-    def ReadGameData(self, file_path, file_name, data_start_location):
+    def ReadGameData(self, file_path, file_name, data_start_location, mapped_file = None):
         self.filepath = file_path
         self.filename = file_name
         self.__data_start_location = data_start_location
@@ -33,14 +46,14 @@ class RePlayGameDataFruitNinja(RePlayGameData):
         self.signal_time = []
         self.signal_timenum = []
         self.signal_timeelapsed = []
-        self.touch_info = []
+        self.touch_info = RePlayRaggedArray(RePlayGameDataFruitNinja.touch_record_dtype)
         self.remaining_time = []
 
         self.manager_data = []
         self.game_data = []
         self.num_touches = []
         self.num_fruit = []
-        self.fruit_data = []
+        self.fruit_data = RePlayRaggedArray(RePlayGameDataFruitNinja.fruit_record_dtype)
 
         self.is_cutting = []
         self.num_strokes = []
@@ -48,11 +61,14 @@ class RePlayGameDataFruitNinja(RePlayGameData):
 
         self.cut_velocity = []
             
+        #Raw Matlab datenums of each signal sample. These are converted all at once after the file has been read.
+        signal_datenums = []
+
         #Grab the file size in bytes
-        flength = os.stat(self.filename).st_size
+        flength = RePlayDataFileStatic.get_data_file_length(self.filename, mapped_file)
         packet_type = 0
 
-        with open(self.filename, 'rb') as f:
+        with RePlayDataFileStatic.open_data_file(self.filename, mapped_file) as f:
 
             # seek to the position in the file to begin reading trial information
             f.seek(self.__data_start_location)
@@ -70,32 +86,14 @@ class RePlayGameDataFruitNinja(RePlayGameData):
 
                     elif packet_type == 2:
                         timenum_read = RePlayDataFileStatic.read_byte_array(f, 'float64')
-                        self.signal_timenum.append(convert_datenum(timenum_read))
-                        self.signal_timeelapsed.append(self.signal_timenum[-1]-self.signal_timenum[0])  
-                        self.signal_time.append(self.signal_timeelapsed[-1].total_seconds())                    
+                        RePlayDataFileStatic.validate_datenum(timenum_read)
+                        signal_datenums.append(timenum_read)
 
                         num_touches = RePlayDataFileStatic.read_byte_array(f, 'int')
                         self.num_touches.append(num_touches)
-                        
-                        ind_touch_info = []
-                        frame_touch_info = []
-                        if num_touches > 0:
-                            #For each touch, info is saved as Xpos, Ypos, ID, State
-                            for _ in itertools.repeat(None, num_touches):
-                                ind_touch_info = []
-                                ind_touch_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                                ind_touch_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                                ind_touch_info.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
-                                ind_touch_info.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
-                                frame_touch_info.append(ind_touch_info)
-                        else:
-                            ind_touch_info.append(None)
-                            ind_touch_info.append(None)
-                            ind_touch_info.append(None)
-                            ind_touch_info.append(None)
-                            frame_touch_info.append(ind_touch_info)
-                        
-                        self.touch_info.append(frame_touch_info)
+
+                        #For each touch, info is saved as Xpos, Ypos, ID, State
+                        self.touch_info.ReadFrame(f, num_touches)
 
                         if (hasattr(self, "game_file_version")):
                             if ((isinstance(self.game_file_version, list)) and (len(self.game_file_version) > 0) and (self.game_file_version[0] >= 2)):
@@ -110,12 +108,7 @@ class RePlayGameDataFruitNinja(RePlayGameData):
                         #Fruit Created, Bombs Hit, Max Fruit Speed, Fruit Spawn Interval, Bomb Spawn Interval
                         frame_game_data = []
                         if (manager_data):
-                            frame_game_data.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
-                            frame_game_data.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
-                            frame_game_data.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
-                            frame_game_data.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
-                            frame_game_data.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
-                            frame_game_data.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
+                            frame_game_data.extend(RePlayDataFileStatic.read_record(f, ['int'] * 6))
                         else:
                             frame_game_data.append(None)
                             frame_game_data.append(None)
@@ -128,38 +121,11 @@ class RePlayGameDataFruitNinja(RePlayGameData):
 
                         num_fruit = RePlayDataFileStatic.read_byte_array(f, 'int')
                         self.num_fruit.append(num_fruit)
-                        
-                        frame_fruit_data = []
-                        ind_fruit_data = []
+
 
                         #fruit_id, fruit_speed, fruit_gravity, fruit_x, fruit_abs_y, fruit_is_alive, 
                         #fruit_is_obstacle, fruit_time
-                        if num_fruit > 0:
-                            for _ in itertools.repeat(None, num_fruit):
-                                ind_fruit_data = []
-                                ind_fruit_data.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
-                                ind_fruit_data.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
-                                ind_fruit_data.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                                ind_fruit_data.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
-                                ind_fruit_data.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
-                                ind_fruit_data.append(RePlayDataFileStatic.read_byte_array(f, 'uint8'))
-                                ind_fruit_data.append(RePlayDataFileStatic.read_byte_array(f, 'uint8'))
-                                ind_fruit_data.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-
-                                frame_fruit_data.append(ind_fruit_data)
-                        else:
-                            ind_fruit_data.append(None)
-                            ind_fruit_data.append(None)
-                            ind_fruit_data.append(None)
-                            ind_fruit_data.append(None)
-                            ind_fruit_data.append(None)
-                            ind_fruit_data.append(None)
-                            ind_fruit_data.append(None)
-                            ind_fruit_data.append(None)
-
-                            frame_fruit_data.append(ind_fruit_data)
-
-                        self.fruit_data.append(frame_fruit_data)
+                        self.fruit_data.ReadFrame(f, num_fruit)
 
                         is_cutting = RePlayDataFileStatic.read_byte_array(f, 'uint8')
                         self.is_cutting.append(is_cutting)
@@ -176,8 +142,7 @@ class RePlayGameDataFruitNinja(RePlayGameData):
                                     ind_stroke_data = []
                                     timenum_read = RePlayDataFileStatic.read_byte_array(f, 'float64')
                                     ind_stroke_data.append(convert_datenum(timenum_read))
-                                    ind_stroke_data.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                                    ind_stroke_data.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
+                                    ind_stroke_data.extend(RePlayDataFileStatic.read_record(f, ['float'] * 2))
                                     frame_stroke_data.append(ind_stroke_data)
                             else:
                                 ind_stroke_data.append(0)
@@ -209,6 +174,7 @@ class RePlayGameDataFruitNinja(RePlayGameData):
                         if (self.bad_packet_count > 10):
                             self.aborted_file = True
                             print("Aborting file because bad packet count exceeded 10 bad packets.")
+                            self.AppendSignalTimestamps(signal_datenums)
                             return
                                                     
             except:
@@ -216,75 +182,26 @@ class RePlayGameDataFruitNinja(RePlayGameData):
                 print(f"File location: {f.tell()}, Most recent packet type: {packet_type}")
                 self.crash_detected = 1
 
+        #Convert the timestamps of the signal samples
+        self.AppendSignalTimestamps(signal_datenums)
+
         self._p_changed = True
     
+    #This method returns the trajectory of each touch, as a dictionary that maps each touch ID to a dictionary of
+    #NumPy arrays ("x", "y", and "t"), with the touches in the order in which they first appear. The trajectories
+    #are kept in memory (they are not saved to the database), so they are only calculated once for each game data
+    #object, and they should not be changed by the caller.
     def CalculateTouchTrajectories(self):
-        #Create an object to hold all the resulting touch trajectories
-        touch_trajectories = persistent.mapping.PersistentMapping()
-
-        #Let's iterate over the the "touch_info" object
-        for t in range(0, len(self.touch_info)):
-            time_elapsed = self.signal_time[t]
-            for touch in self.touch_info[t]:
-                if touch is not None:
-                    if len(touch) >= 4:
-                        touch_x = touch[0]
-                        touch_y = touch[1]
-                        touch_id = touch[2]
-                        if (touch_id is not None):
-                            if (not (touch_id in touch_trajectories)):
-                                new_touch_object = persistent.mapping.PersistentMapping()
-                                new_touch_object["x"] = persistent.list.PersistentList()
-                                new_touch_object["y"] = persistent.list.PersistentList()
-                                new_touch_object["t"] = persistent.list.PersistentList()
-                                touch_trajectories[touch_id] = new_touch_object
-
-                            touch_trajectories[touch_id]["x"].append(touch_x)
-                            touch_trajectories[touch_id]["y"].append(touch_y)
-                            touch_trajectories[touch_id]["t"].append(time_elapsed)
-
-                                
-        
-        return touch_trajectories
+        return self.__get_trajectories("touch_info", RePlayGameDataFruitNinja.touch_trajectory_fields, 2)
 
+    #This method returns the trajectory of each object (fruit or bomb), as a dictionary that maps each object ID to
+    #a dictionary of NumPy arrays ("t", "x", "y", "is_alive", and "is_bomb"). If the "only fruit" flag is set, bombs
+    #are left out. Just like the touch trajectories, the object trajectories are only calculated once.
     def CalculateObjectTrajectories(self, only_fruit = False):
-        #Create an object to hold all the resulting touch trajectories
-        object_trajectories = persistent.mapping.PersistentMapping()
-
-        #Let's iterate over the the "touch_info" object
-        for t in range(0, len(self.fruit_data)):
-            time_elapsed = self.signal_time[t]
-
-            for object_data in self.fruit_data[t]:
-                if object_data is not None:
-                    if len(object_data) >= 4:
-                        object_id = object_data[0]
-                        object_x = object_data[3]
-                        object_y = object_data[4]
-                        object_is_alive = object_data[5]
-                        object_is_bomb = object_data[6]
-
-                        #If the "only fruit" flag is set, and this is a bomb, then skip it
-                        if (object_is_bomb and only_fruit):
-                            continue
-                        
-                        if (object_id is not None):
-                            if (not (object_id in object_trajectories)):
-                                new_object = persistent.mapping.PersistentMapping()
-                                new_object["t"] = persistent.list.PersistentList()
-                                new_object["x"] = persistent.list.PersistentList()
-                                new_object["y"] = persistent.list.PersistentList()
-                                new_object["is_alive"] = persistent.list.PersistentList()
-                                new_object["is_bomb"] = persistent.list.PersistentList()
-                                object_trajectories[object_id] = new_object
-
-                            object_trajectories[object_id]["t"].append(time_elapsed)
-                            object_trajectories[object_id]["x"].append(object_x)
-                            object_trajectories[object_id]["y"].append(object_y)
-                            object_trajectories[object_id]["is_alive"].append(object_is_alive)
-                            object_trajectories[object_id]["is_bomb"].append(object_is_bomb)
-        
-        return object_trajectories
+        bomb_field_index = None
+        if (only_fruit):
+            bomb_field_index = 6
+        return self.__get_trajectories("fruit_data", RePlayGameDataFruitNinja.object_trajectory_fields, 0, bomb_field_index)
 
     def GetFruitNinjaRepetitionData (self, touch_trajectories):
         result_repetition_count = 0
@@ -304,7 +221,9 @@ class RePlayGameDataFruitNinja(RePlayGameData):
                     touch_start_time = touch_time_list[0]
                     touch_end_time = touch_time_list[-1]
                     touch_duration = touch_end_time - touch_start_time
-                    touch_start_idx = next(x[0] for x in enumerate(self.signal_time) if x[1] >= touch_start_time)
+                    touch_start_idx = self.FindSignalTimeIndices(touch_start_time)
+                    if (touch_start_idx >= len(self.signal_time)):
+                        raise IndexError(f"touch {touch_key} starts after the last sample of the signal")
                     result_rep_start_idx.append(touch_start_idx)
                     result_time_moving += touch_duration
 
@@ -335,7 +254,7 @@ class RePlayGameDataFruitNinja(RePlayGameData):
             else:
                 for t_idx in range(0, len(self.signal_time)):
                     cur_cut_velocity = 0
-                    touch = self.touch_info[t_idx]
+                    touch = RePlayRaggedArray.get_frame_records(self.touch_info, t_idx)
                     if (touch is not None) and (len(touch) > 0):
                         touch = touch[0]
                         touch_x = touch[0]
@@ -398,3 +317,112 @@ class RePlayGameDataFruitNinja(RePlayGameData):
 
         return swipe_accuracy
 
+    #region Static methods
+
+    #This method groups the points of every trajectory together. It is given the trajectory ID of each point, and
+    #the values of each field (one array for each field, with one value for each point). It returns a dictionary
+    #that maps each trajectory ID to a dictionary of NumPy arrays (one for each field), in the order in which the
+    #trajectories first appear, with the points of each trajectory in their original order.
+    @staticmethod
+    def group_trajectory_points(point_ids, field_values):
+        result = {}
+        if (len(point_ids) == 0):
+            return result
+
+        (unique_ids, first_point_idx, point_group) = np.unique(point_ids, return_index = True, return_inverse = True)
+        point_group = point_group.ravel()
+
+        #Number the trajectories in the order in which they first appear
+        trajectory_order = np.argsort(first_point_idx, kind = "stable")
+        trajectory_number = np.empty(len(unique_ids), dtype = np.int64)
+        trajectory_number[trajectory_order] = np.arange(len(unique_ids))
+        point_trajectory_number = trajectory_number[point_group]
+
+        sorted_point_idx = np.argsort(point_trajectory_number, kind = "stable")
+        trajectory_offsets = np.concatenate([[0], np.cumsum(np.bincount(point_trajectory_number, minlength = len(unique_ids)))])
+        sorted_field_values = [(field_name, values[sorted_point_idx]) for (field_name, values) in field_values]
+
+        for (i, trajectory_id) in enumerate(unique_ids[trajectory_order].tolist()):
+            (start_idx, end_idx) = (trajectory_offsets[i], trajectory_offsets[i + 1])
+            result[trajectory_id] = { field_name : values[start_idx:end_idx] for (field_name, values) in sorted_field_values }
+
+        return result
+
+    #endregion
+
+    #region Private methods
+
+    #This method returns the trajectories of the touches ("touch_info") or objects ("fruit_data") of the session
+    #(see CalculateTouchTrajectories). The trajectories are kept in memory, and they are calculated again if the
+    #records or signal_time are replaced or their lengths change. Records whose bomb field is set are left out
+    #(if the position of the bomb field is passed in).
+    def __get_trajectories(self, frames_name, trajectory_fields, id_field_index, bomb_field_index = None):
+        frames = getattr(self, frames_name)
+        signal_time = self.signal_time
+        trajectories_cache = getattr(self, "_v_trajectories", None)
+        if (trajectories_cache is None):
+            trajectories_cache = {}
+            self._v_trajectories = trajectories_cache
+
+        cache_key = (frames_name, bomb_field_index)
+        cached_trajectories = trajectories_cache.get(cache_key, None)
+        if (cached_trajectories is not None) and (cached_trajectories[0] is frames) and (cached_trajectories[1] == len(frames)) and \
+            (cached_trajectories[2] is signal_time) and (cached_trajectories[3] == len(signal_time)):
+            return cached_trajectories[4]
+
+        if isinstance(frames, RePlayRaggedArray):
+            trajectories = self.__calculate_trajectories_from_records(frames, trajectory_fields, id_field_index, bomb_field_index)
+        else:
+            trajectories = self.__calculate_trajectories_from_lists(frames, trajectory_fields, id_field_index, bomb_field_index)
+
+        trajectories_cache[cache_key] = (frames, len(frames), signal_time, len(signal_time), trajectories)
+        return trajectories
+
+    #This method calculates trajectories from records that are held in a RePlayRaggedArray
+    def __calculate_trajectories_from_records(self, frames, trajectory_fields, id_field_index, bomb_field_index):
+        #Every frame needs a timestamp, even if it does not have any records. This raises the same error as looking up
+        #the timestamp of each frame one at a time did, when signal_time is shorter than the frames.
+        if (len(frames) > len(self.signal_time)):
+            raise IndexError("list index out of range")
+
+        records = frames.GetRecords()
+        frame_idx = frames.GetFrameIndices()
+        if (bomb_field_index is not None):
+            is_fruit = (records[frames.record_dtype.names[bomb_field_index]] == 0)
+            records = records[is_fruit]
+            frame_idx = frame_idx[is_fruit]
+
+        field_values = []
+        for (field_name, field_index) in trajectory_fields:
+            if (field_index is None):
+                values = np.asarray(self.signal_time[0:len(frames)])[frame_idx]
+            else:
+                values = records[frames.record_dtype.names[field_index]]
+                values = values.astype(np.float64 if (values.dtype.kind == "f") else np.int64)
+            field_values.append((field_name, values))
+
+        return RePlayGameDataFruitNinja.group_trajectory_points(records[frames.record_dtype.names[id_field_index]], field_values)
+
+    #This method calculates trajectories from records that are held in a list of lists (as they were in databases
+    #created before RePlayRaggedArray existed). Records that are missing, too short, or that do not have an ID
+    #are skipped.
+    def __calculate_trajectories_from_lists(self, frames, trajectory_fields, id_field_index, bomb_field_index):
+        points = {}
+        for t in range(0, len(frames)):
+            time_elapsed = self.signal_time[t]
+            for record in frames[t]:
+                if (record is not None) and (len(record) >= 4):
+                    point = [(time_elapsed if (field_index is None) else record[field_index]) for (_, field_index) in trajectory_fields]
+                    if (bomb_field_index is not None) and (record[bomb_field_index]):
+                        continue
+                    record_id = record[id_field_index]
+                    if (record_id is not None):
+                        points.setdefault(record_id, []).append(point)
+
+        result = {}
+        for (record_id, trajectory_points) in points.items():
+            result[record_id] = { field_name : np.asarray([x[i] for x in trajectory_points])
+                for (i, (field_name, _)) in enumerate(trajectory_fields) }
+        return result
+
+    #endregion
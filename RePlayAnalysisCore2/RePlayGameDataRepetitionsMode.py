@@ -85,7 +85,7 @@ class RePlayGameDataRepetitionsMode(RePlayGameData):
         else:
             return super().GetGameSignal(use_real_world_units)
 
-    def ReadGameData(self, file_path, file_name, data_start_location):
+    def ReadGameData(self, file_path, file_name, data_start_location, mapped_file = None):
         self.filepath = file_path
         self.filename = file_name
         self.__data_start_location = data_start_location
@@ -116,10 +116,13 @@ class RePlayGameDataRepetitionsMode(RePlayGameData):
         self.number_rebaseline_values = []
         self.rebaseline_values = []
 
+        #Raw Matlab datenums of each signal sample. These are converted all at once after the file has been read.
+        signal_datenums = []
+
         #Grab the file size in bytes
-        flength = os.stat(self.filename).st_size
+        flength = RePlayDataFileStatic.get_data_file_length(self.filename, mapped_file)
 
-        with open(self.filename, 'rb') as f:
+        with RePlayDataFileStatic.open_data_file(self.filename, mapped_file) as f:
 
             f.seek(self.__data_start_location)
             try:
@@ -162,17 +165,15 @@ class RePlayGameDataRepetitionsMode(RePlayGameData):
                     elif packet_type == 2:
                         if self.game_file_version >= 5:
                             timenum_read = RePlayDataFileStatic.read_byte_array(f, 'float64')
-                            self.signal_timenum.append(convert_datenum(timenum_read))
-                            self.signal_timeelapsed.append(self.signal_timenum[-1]-self.signal_timenum[0])
-                            self.signal_time.append(self.signal_timeelapsed[-1].total_seconds())
+                            RePlayDataFileStatic.validate_datenum(timenum_read)
+                            signal_datenums.append(timenum_read)
 
                             self.signal.append(RePlayDataFileStatic.read_byte_array(f, 'double'))
                             self.signal_not_normalized.append(RePlayDataFileStatic.read_byte_array(f, 'double'))
                         elif self.game_file_version >= 3:
                             timenum_read = RePlayDataFileStatic.read_byte_array(f, 'float64')
-                            self.signal_timenum.append(convert_datenum(timenum_read))
-                            self.signal_timeelapsed.append(self.signal_timenum[-1]-self.signal_timenum[0])
-                            self.signal_time.append(self.signal_timeelapsed[-1].total_seconds())
+                            RePlayDataFileStatic.validate_datenum(timenum_read)
+                            signal_datenums.append(timenum_read)
 
                             self.signal.append(RePlayDataFileStatic.read_byte_array(f, 'double'))
                         else:
@@ -251,12 +252,16 @@ class RePlayGameDataRepetitionsMode(RePlayGameData):
                         if (self.bad_packet_count > 10):
                             self.aborted_file = True
                             print("Aborting file because bad packet count exceeded 10 bad packets.")
+                            self.AppendSignalTimestamps(signal_datenums)
                             return
 
             except:
                 print(f'\nGame Crash detected during read of file: {self.filepath.stem}')
                 self.crash_detected = 1
 
+        #Convert the timestamps of the signal samples
+        self.AppendSignalTimestamps(signal_datenums)
+
         #Final clean-up work. This is necessary to catch the last data in the file that is not properly
         #handled in the if-else statement above (for game file versions < 3).
         if self.game_file_version < 3:
@@ -296,13 +301,16 @@ class RePlayGameDataRepetitionsMode(RePlayGameData):
                 for i in range(0, len(self.rep_start_time)):
                     current_rep_start_time = self.rep_start_time[i]
                     try:
-                        idx = next(x[0] for x in enumerate(self.signal_timenum) if x[1] >= current_rep_start_time)
-                        result_rep_start_idx.append(idx)
-
-                        (_, _, result_time_moving, result_percent_time_moving) = super().GetRepetitionData(exercise_name)
+                        idx = self.FindSignalTimeIndices(current_rep_start_time, column_name = "signal_timenum")
+                        if (idx < len(self.signal_timenum)):
+                            result_rep_start_idx.append(idx)
                     except:
                         continue
 
+                #The time spent moving does not depend on the rep start times, so it is only calculated once
+                if (len(result_rep_start_idx) > 0):
+                    (_, _, result_time_moving, result_percent_time_moving) = super().GetRepetitionData(exercise_name)
+
         return (result_repetition_count, result_rep_start_idx, result_time_moving, result_percent_time_moving)
         
     def GetDifficulty(self):
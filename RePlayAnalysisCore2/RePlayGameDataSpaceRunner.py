@@ -13,11 +13,19 @@ from py_linq import Enumerable
 from .RePlayUtilities import convert_datenum
 from .RePlayGameData import RePlayGameData
 from .RePlayDataFileStatic import RePlayDataFileStatic
+from .RePlayRaggedArray import RePlayRaggedArray
 from .RePlayExercises import RePlayExercises
 from .RePlayExercises import RePlayDevice
 
 class RePlayGameDataSpaceRunner(RePlayGameData):
 
+    #Layout of the information for each coin and each obstacle (x, y, width, height)
+    object_record_dtype = np.dtype([('x', '<i4'), ('y', '<i4'), ('width', '<i4'), ('height', '<i4')])
+
+    #Layout of each coin and each obstacle as they are saved in data files from game file version 3 and above.
+    #The GUID is not kept.
+    object_file_record_dtype_v3 = np.dtype([('guid', 'u1', (16,))] + object_record_dtype.descr)
+
     def __init__(self):
         super().__init__()
 
@@ -58,7 +66,7 @@ class RePlayGameDataSpaceRunner(RePlayGameData):
 
         return (result_signal, self.signal_time, result_units)          
 
-    def ReadGameData(self, file_path, file_name, data_start_location):
+    def ReadGameData(self, file_path, file_name, data_start_location, mapped_file = None):
         self.filepath = file_path
         self.filename = file_name
         self.__data_start_location = data_start_location
@@ -79,10 +87,10 @@ class RePlayGameDataSpaceRunner(RePlayGameData):
         self.space_speed = []
 
         self.num_coins = []
-        self.coin_info = []
+        self.coin_info = RePlayRaggedArray(RePlayGameDataSpaceRunner.object_record_dtype)
 
         self.num_obstacles = []
-        self.obstacle_info = []
+        self.obstacle_info = RePlayRaggedArray(RePlayGameDataSpaceRunner.object_record_dtype)
 
         self.current_score = []
 
@@ -94,10 +102,13 @@ class RePlayGameDataSpaceRunner(RePlayGameData):
         self.number_rebaseline_values = []
         self.rebaseline_values = []
         
+        #Raw Matlab datenums of each signal sample. These are converted all at once after the file has been read.
+        signal_datenums = []
+
         #Grab the file size in bytes
-        flength = os.stat(self.filename).st_size
+        flength = RePlayDataFileStatic.get_data_file_length(self.filename, mapped_file)
 
-        with open(self.filename, 'rb') as f:
+        with RePlayDataFileStatic.open_data_file(self.filename, mapped_file) as f:
 
             # seek to the position in the file to begin reading trial information
             f.seek(self.__data_start_location)
@@ -115,9 +126,8 @@ class RePlayGameDataSpaceRunner(RePlayGameData):
 
                     elif packet_type == 2:
                         timenum_read = RePlayDataFileStatic.read_byte_array(f, 'float64')
-                        self.signal_timenum.append(convert_datenum(timenum_read))
-                        self.signal_timeelapsed.append(self.signal_timenum[-1]-self.signal_timenum[0])
-                        self.signal_time.append(self.signal_timeelapsed[-1].total_seconds())
+                        RePlayDataFileStatic.validate_datenum(timenum_read)
+                        signal_datenums.append(timenum_read)
                         
                         self.signal.append(RePlayDataFileStatic.read_byte_array(f, 'double'))
 
@@ -126,62 +136,39 @@ class RePlayGameDataSpaceRunner(RePlayGameData):
 
                         #save space1 width, height, and space1_x (Obstacle)
                         packet_space1_info = []
-                        packet_space1_info.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
-                        packet_space1_info.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
-                        packet_space1_info.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
+                        packet_space1_info.extend(RePlayDataFileStatic.read_record(f, ['int'] * 3))
                         self.space1_info.append(packet_space1_info)
 
                         
                         #save space1 width, height, and space1_x (Obstacle)
                         packet_space2_info = []
-                        packet_space2_info.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
-                        packet_space2_info.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
-                        packet_space2_info.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
+                        packet_space2_info.extend(RePlayDataFileStatic.read_record(f, ['int'] * 3))
                         self.space2_info.append(packet_space2_info)
 
                         #save rocketship width, height, x, y
                         packet_rocket_info = []
-                        packet_rocket_info.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
-                        packet_rocket_info.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
-                        packet_rocket_info.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
-                        packet_rocket_info.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
+                        packet_rocket_info.extend(RePlayDataFileStatic.read_record(f, ['int'] * 4))
                         self.rocket_info.append(packet_rocket_info)
 
                         self.space_speed.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
 
                         num_coins = RePlayDataFileStatic.read_byte_array(f, 'int')
                         self.num_coins.append(num_coins)
-                        set_coins_info = []
-                        for _ in itertools.repeat(None, num_coins):
-                            #save coin x, y, width, height
-                            ind_coin_info = []
-                            if (self.game_file_version[0] >= 3):
-                                _ = RePlayDataFileStatic.read_16byte_guid(f)                            
-                            ind_coin_info.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
-                            ind_coin_info.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
-                            ind_coin_info.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
-                            ind_coin_info.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
 
-                            set_coins_info.append(ind_coin_info)
-
-                        self.coin_info.append(set_coins_info)
+                        #save coin x, y, width, height
+                        coin_file_record_dtype = None
+                        if (num_coins > 0) and (self.game_file_version[0] >= 3):
+                            coin_file_record_dtype = RePlayGameDataSpaceRunner.object_file_record_dtype_v3
+                        self.coin_info.ReadFrame(f, num_coins, coin_file_record_dtype)
 
                         num_obstacles = RePlayDataFileStatic.read_byte_array(f, 'int')
                         self.num_obstacles.append(num_obstacles)
-                        set_obs_info = []
-                        for _ in itertools.repeat(None, num_obstacles):
-                            #save obstacle x, y, width, height
-                            ind_obs_info = []
-                            if (self.game_file_version[0] >= 3):
-                                _ = RePlayDataFileStatic.read_16byte_guid(f)                            
-                            ind_obs_info.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
-                            ind_obs_info.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
-                            ind_obs_info.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
-                            ind_obs_info.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
-
-                            set_obs_info.append(ind_obs_info)
 
-                        self.obstacle_info.append(set_obs_info)
+                        #save obstacle x, y, width, height
+                        obstacle_file_record_dtype = None
+                        if (num_obstacles > 0) and (self.game_file_version[0] >= 3):
+                            obstacle_file_record_dtype = RePlayGameDataSpaceRunner.object_file_record_dtype_v3
+                        self.obstacle_info.ReadFrame(f, num_obstacles, obstacle_file_record_dtype)
 
                         self.current_score.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
 
@@ -218,12 +205,16 @@ class RePlayGameDataSpaceRunner(RePlayGameData):
                         if (self.bad_packet_count > 10):
                             self.aborted_file = True
                             print("Aborting file because bad packet count exceeded 10 bad packets.")
+                            self.AppendSignalTimestamps(signal_datenums)
                             return                                                  
 
             except:
                 print(f'\nGame Crash detected during read of file: {self.filepath.stem}')
                 self.crash_detected = 1
 
+        #Convert the timestamps of the signal samples
+        self.AppendSignalTimestamps(signal_datenums)
+
         self._p_changed = True
 
     def CalculateSpaceRunnerMetrics (self):
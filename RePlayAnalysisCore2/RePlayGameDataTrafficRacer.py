@@ -14,11 +14,23 @@ from py_linq import Enumerable
 from .RePlayUtilities import convert_datenum
 from .RePlayGameData import RePlayGameData
 from .RePlayDataFileStatic import RePlayDataFileStatic
+from .RePlayRaggedArray import RePlayRaggedArray
 from .RePlayExercises import RePlayExercises
 from .RePlayExercises import RePlayDevice
 
 class RePlayGameDataTrafficRacer(RePlayGameData):
 
+    #Layout of the information for each traffic vehicle (body width, height, x position, y position, x velocity, y velocity)
+    vehicle_record_dtype = np.dtype([('width', '<f4'), ('height', '<f4'), ('x', '<f4'), ('y', '<f4'), ('x_velocity', '<f4'), ('y_velocity', '<f4')])
+
+    #Layout of the information for each coin (x position, y position, width, height)
+    coin_record_dtype = np.dtype([('x', '<f4'), ('y', '<f4'), ('width', '<f4'), ('height', '<f4')])
+
+    #Layouts of each vehicle and coin as they are saved in data files from game file version 2 and above.
+    #The GUID is not kept.
+    vehicle_file_record_dtype_v2 = np.dtype([('guid', 'u1', (16,))] + vehicle_record_dtype.descr)
+    coin_file_record_dtype_v2 = np.dtype([('guid', 'u1', (16,))] + coin_record_dtype.descr)
+
     def __init__(self, replay_version_code):
         super().__init__()
         try:
@@ -66,7 +78,7 @@ class RePlayGameDataTrafficRacer(RePlayGameData):
 
         return (result_signal, self.signal_time, result_units)           
 
-    def ReadGameData(self, file_path, file_name, data_start_location):
+    def ReadGameData(self, file_path, file_name, data_start_location, mapped_file = None):
         self.filepath = file_path
         self.filename = file_name
         self.__data_start_location = data_start_location
@@ -89,9 +101,9 @@ class RePlayGameDataTrafficRacer(RePlayGameData):
         self.player_vehicle_info = []
         self.num_vehicles = []
         self.vehicle_info = []
-        self.traffic_info = []
+        self.traffic_info = RePlayRaggedArray(RePlayGameDataTrafficRacer.vehicle_record_dtype)
         self.num_coins = []
-        self.coin_info = []
+        self.coin_info = RePlayRaggedArray(RePlayGameDataTrafficRacer.coin_record_dtype)
         self.highlighted_lane = []
         
         #Create lists for rebaselining information
@@ -99,8 +111,11 @@ class RePlayGameDataTrafficRacer(RePlayGameData):
         self.number_rebaseline_values = []
         self.rebaseline_values = []
         
+        #Raw Matlab datenums of each signal sample. These are converted all at once after the file has been read.
+        signal_datenums = []
+
         #Grab the file size in bytes
-        flength = os.stat(self.filename).st_size
+        flength = RePlayDataFileStatic.get_data_file_length(self.filename, mapped_file)
 
         #We need to handle a bug in data files from ALL RePlay versions through VERSION CODE 31:
         if (self.replay_version_code < 25):
@@ -115,7 +130,7 @@ class RePlayGameDataTrafficRacer(RePlayGameData):
             self.lane_width.append(5)
         #End of code handling the bug
 
-        with open(self.filename, 'rb') as f:
+        with RePlayDataFileStatic.open_data_file(self.filename, mapped_file) as f:
             f.seek(self.__data_start_location)
             try:
                 while (f.tell() < flength - 4):
@@ -136,9 +151,8 @@ class RePlayGameDataTrafficRacer(RePlayGameData):
                     #Packet 2 indicates gamedata
                     elif packet_type == 2:
                         timenum_read = RePlayDataFileStatic.read_byte_array(f, 'float64')
-                        self.signal_timenum.append(convert_datenum(timenum_read))
-                        self.signal_timeelapsed.append(self.signal_timenum[-1]-self.signal_timenum[0])
-                        self.signal_time.append(self.signal_timeelapsed[-1].total_seconds())
+                        RePlayDataFileStatic.validate_datenum(timenum_read)
+                        signal_datenums.append(timenum_read)
 
                         self.current_score.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
                         self.remaining_time.append(RePlayDataFileStatic.read_byte_array(f, 'double'))
@@ -146,60 +160,37 @@ class RePlayGameDataTrafficRacer(RePlayGameData):
 
                         #Bug fix for ALL TRAFFIC RACER GAME DATA FILES FROM ALL REPLAY VERSIONS THROUGH VERSION CODE 31
                         if (self.replay_version_code <= 31):
-                            if (len(self.signal_timenum) == 1):
-                                self.start_time.append(self.signal_timenum[0])
+                            if (len(signal_datenums) == 1):
+                                self.start_time.append(convert_datenum(signal_datenums[0]))
                             if (len(self.remaining_time) == 1):
                                 self.game_duration.append(self.remaining_time[0])
                         #End of code handling the bug
                         
                         #store the position (x, y) and then the velocity (x, y) in to the player_veh list
                         player_veh = []
-                        player_veh.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                        player_veh.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                        player_veh.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                        player_veh.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
+                        player_veh.extend(RePlayDataFileStatic.read_record(f, ['float'] * 4))
 
                         self.player_vehicle_info.append(player_veh)
 
                         #save out the vehicle information for the traffic
                         num_vehicles = RePlayDataFileStatic.read_byte_array(f, 'int')
                         self.num_vehicles.append(num_vehicles)
-                        all_vehicles_info = []
 
-                        for _ in itertools.repeat(None, num_vehicles):
-                            each_veh_info = []
-                            #body width, height, vehicle x pos, vehicle y pos, veh x velocity, veh y velocity
-                            if (self.game_file_version[0] >= 2):
-                                _ = RePlayDataFileStatic.read_16byte_guid(f)                            
-                            each_veh_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                            each_veh_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                            each_veh_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                            each_veh_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                            each_veh_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                            each_veh_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-
-                            #now add the veh_info list to the traffic info list
-                            all_vehicles_info.append(each_veh_info)
-
-                        self.traffic_info.append(all_vehicles_info)
+                        #body width, height, vehicle x pos, vehicle y pos, veh x velocity, veh y velocity
+                        vehicle_file_record_dtype = None
+                        if (num_vehicles > 0) and (self.game_file_version[0] >= 2):
+                            vehicle_file_record_dtype = RePlayGameDataTrafficRacer.vehicle_file_record_dtype_v2
+                        self.traffic_info.ReadFrame(f, num_vehicles, vehicle_file_record_dtype)
 
                         #now save out the coin data
                         num_coins = RePlayDataFileStatic.read_byte_array(f, 'int')
                         self.num_coins.append(num_coins)
-                        all_coin_info = []
-
-                        for _ in itertools.repeat(None, num_coins):
-                            each_coin_info = []
-                            #position x, position y, width, height
-                            if (self.game_file_version[0] >= 2):
-                                _ = RePlayDataFileStatic.read_16byte_guid(f)                            
-                            each_coin_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                            each_coin_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                            each_coin_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                            each_coin_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                            all_coin_info.append(each_coin_info)
-
-                        self.coin_info.append(all_coin_info)
+
+                        #position x, position y, width, height
+                        coin_file_record_dtype = None
+                        if (num_coins > 0) and (self.game_file_version[0] >= 2):
+                            coin_file_record_dtype = RePlayGameDataTrafficRacer.coin_file_record_dtype_v2
+                        self.coin_info.ReadFrame(f, num_coins, coin_file_record_dtype)
                         self.highlighted_lane.append(RePlayDataFileStatic.read_byte_array(f, 'int'))
 
                     elif packet_type == 3:
@@ -233,11 +224,15 @@ class RePlayGameDataTrafficRacer(RePlayGameData):
                         if (self.bad_packet_count > 10):
                             self.aborted_file = True
                             print("Aborting file because bad packet count exceeded 10 bad packets.")
+                            self.AppendSignalTimestamps(signal_datenums)
                             return
             except:
                 print(f'\nGame Crash detected during read of file: {self.filepath.stem}')
                 self.crash_detected = 1
 
+        #Convert the timestamps of the signal samples
+        self.AppendSignalTimestamps(signal_datenums)
+
         self._p_changed = True
 
     def GetDifficulty(self):
@@ -13,14 +13,21 @@ import math
 from .RePlayUtilities import convert_datenum
 from .RePlayGameData import RePlayGameData
 from .RePlayDataFileStatic import RePlayDataFileStatic
+from .RePlayRaggedArray import RePlayRaggedArray
 
 class RePlayGameDataTyperShark(RePlayGameData):
 
+    #Layout of the information for each shark (guid, new shark data, current word index, current character index,
+    #position x, position y, velocity x, velocity y). The new shark data is only present (as a list of the shark type, 
+    #the number of words, and the words) on the first frame in which the shark appears. Otherwise it is None.
+    shark_record_dtype = np.dtype([('guid', 'u1', (16,)), ('new_shark_data', 'O'), ('word_idx', '<i4'), ('letter_idx', '<i4'), 
+        ('x', '<f4'), ('y', '<f4'), ('x_velocity', '<f4'), ('y_velocity', '<f4')])
+
     def __init__(self, version):
         super().__init__()
         self.version = version
 
-    def ReadGameData(self, file_path, file_name, data_start_location):
+    def ReadGameData(self, file_path, file_name, data_start_location, mapped_file = None):
 
         self.filepath = file_path
         self.filename = file_name
@@ -35,7 +42,7 @@ class RePlayGameDataTyperShark(RePlayGameData):
         self.stage_type = []
 
         self.shark_guids = []
-        self.shark_info = []
+        self.shark_info = RePlayRaggedArray(RePlayGameDataTyperShark.shark_record_dtype)
 
         self.num_sharks_stage = []
         self.num_sharks_alive = []
@@ -49,10 +56,15 @@ class RePlayGameDataTyperShark(RePlayGameData):
         self.restore_messages = []
         self.stim_times_successful = []
 
+        #Raw Matlab datenums of each signal sample. These are converted all at once after the file has been read,
+        #unless a timestamp that cannot be converted is found.
+        signal_datenums = []
+        convert_timestamps_immediately = False
+
         #Grab the file size in bytes
-        flength = os.stat(self.filename).st_size
+        flength = RePlayDataFileStatic.get_data_file_length(self.filename, mapped_file)
 
-        with open(self.filename, 'rb') as f:
+        with RePlayDataFileStatic.open_data_file(self.filename, mapped_file) as f:
 
             # seek to the position in the file to begin reading trial information
             f.seek(self.__data_start_location)
@@ -104,17 +116,29 @@ class RePlayGameDataTyperShark(RePlayGameData):
 
                         if is_actual_packet:
                             timenum_read = RePlayDataFileStatic.read_byte_array(f, 'float64')
-                            try:
-                                self.signal_timenum.append(convert_datenum(timenum_read))
-                            except:
-                                print("TyperShark: Unable to convert float64 to datenum")
-                                self.signal_timenum.append(float("NaN"))
-                            self.signal_timeelapsed.append(self.signal_timenum[-1]-self.signal_timenum[0])
-
-                            try:
-                                self.signal_time.append(self.signal_timeelapsed[-1].total_seconds())
-                            except:
-                                self.signal_time.append(0)
+                            if not convert_timestamps_immediately:
+                                try:
+                                    RePlayDataFileStatic.validate_datenum(timenum_read)
+                                    signal_datenums.append(timenum_read)
+                                except:
+                                    #This timestamp cannot be converted. Convert the timestamps that have been collected 
+                                    #so far, and then convert each remaining timestamp as it is read.
+                                    self.AppendSignalTimestamps(signal_datenums)
+                                    signal_datenums = []
+                                    convert_timestamps_immediately = True
+
+                            if convert_timestamps_immediately:
+                                try:
+                                    self.signal_timenum.append(convert_datenum(timenum_read))
+                                except:
+                                    print("TyperShark: Unable to convert float64 to datenum")
+                                    self.signal_timenum.append(float("NaN"))
+                                self.signal_timeelapsed.append(self.signal_timenum[-1]-self.signal_timenum[0])
+
+                                try:
+                                    self.signal_time.append(self.signal_timeelapsed[-1].total_seconds())
+                                except:
+                                    self.signal_time.append(0)
 
                             self.current_stage_index.append(RePlayDataFileStatic.read_byte_array(f, 'int32'))
 
@@ -130,15 +154,9 @@ class RePlayGameDataTyperShark(RePlayGameData):
                             set_shark_info = []
 
                             for _ in itertools.repeat(None, num_sharks_alive):
-                                ind_shark_info = []
-
-                                shark_guid = []
-                                for _ in itertools.repeat(None, 16):
-                                    shark_guid.append(RePlayDataFileStatic.read_byte_array(f, 'uint8'))
-                                
-
                                 #Save the GUID (Global Unique ID) for the shark
-                                ind_shark_info.append(shark_guid)
+                                shark_guid = RePlayDataFileStatic.read_16byte_guid(f)
+                                ind_shark_info = (shark_guid, )
 
                                 #If data for this shark GUID has not been read, then read it in
                                 if shark_guid not in self.shark_guids:
@@ -164,35 +182,25 @@ class RePlayGameDataTyperShark(RePlayGameData):
 
                                     shark_guid_info.append(word)
 
-                                    ind_shark_info.append(shark_guid_info)
+                                    ind_shark_info += (shark_guid_info, )
                                 
                                 else:
-                                    ind_shark_info.append(None)
-
+                                    ind_shark_info += (None, )
 
-                                #Save current word index
-                                ind_shark_info.append(RePlayDataFileStatic.read_byte_array(f, 'int32'))
 
-                                #Save current character index (which character of the current word)
-                                ind_shark_info.append(RePlayDataFileStatic.read_byte_array(f, 'int32'))
-
-                                #Save the current position_x, position_y, velocity_x, velocity_y
-                                ind_shark_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                                ind_shark_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                                ind_shark_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
-                                ind_shark_info.append(RePlayDataFileStatic.read_byte_array(f, 'float'))
+                                #Save current word index, current character index (which character of the current word),
+                                #and the current position_x, position_y, velocity_x, velocity_y
+                                ind_shark_info += RePlayDataFileStatic.read_record(f, ['int32', 'int32', 'float', 'float', 'float', 'float'])
 
                                 set_shark_info.append(ind_shark_info)
 
                             #add the shark info to the list
-                            self.shark_info.append(set_shark_info)
+                            self.shark_info.AppendFrame(set_shark_info)
 
                             #Read in a bool if a shark is currently selected
                             read_byte = RePlayDataFileStatic.read_byte_array(f, 'uint8')
                             if read_byte == 1:
-                                selected_shark_guid = []
-                                for _ in itertools.repeat(None, 16):
-                                    selected_shark_guid.append(RePlayDataFileStatic.read_byte_array(f, 'uint8'))
+                                selected_shark_guid = RePlayDataFileStatic.read_16byte_guid(f)
                                 self.selected_shark_guid.append(selected_shark_guid)
 
                             else:
@@ -227,12 +235,16 @@ class RePlayGameDataTyperShark(RePlayGameData):
                         if (self.bad_packet_count > 10):
                             self.aborted_file = True
                             print("Aborting file because bad packet count exceeded 10 bad packets.")
+                            self.AppendSignalTimestamps(signal_datenums)
                             return
 
             except:
                 print(f'\nGame Crash detected during read of file: {self.filepath.stem}')
                 self.crash_detected = 1
 
+        #Convert the timestamps of the signal samples
+        self.AppendSignalTimestamps(signal_datenums)
+
         self._p_changed = True
 
     def GetRepetitionData(self, exercise_name):
@@ -249,26 +261,12 @@ class RePlayGameDataTyperShark(RePlayGameData):
 
             #Calculate a metric for "time spent moving"
             #We will consider each keypress to have 0.5 seconds of movement before and 0.5 second of movement after
+            signal_time = np.asarray(self.signal_time, dtype = np.float64)
+            keypress_signal_time = signal_time[result_rep_idx]
+            is_moving = self.GetSignalTimeWindowMask(keypress_signal_time - 0.5, keypress_signal_time + 0.5,
+                fallback_idx = result_rep_idx)
             temp_movement_array = np.zeros(len(self.signal_time))
-
-            for i in range(0, len(result_rep_idx)):
-                signal_time_idx = result_rep_idx[i]
-                keypress_signal_time = self.signal_time[signal_time_idx]
-                keypress_start_time = keypress_signal_time - 0.5
-                keypress_finish_time = keypress_signal_time + 0.5
-
-                try:
-                    keypress_start_idx = next(x[0] for x in enumerate(self.signal_time) if x[1] >= keypress_start_time)
-                except:
-                    keypress_start_idx = signal_time_idx
-
-                try:
-                    keypress_end_idx = next(x[0] for x in enumerate(self.signal_time) if x[1] >= keypress_finish_time)
-                except:
-                    keypress_end_idx = signal_time_idx
-
-                for j in range(keypress_start_idx, keypress_end_idx):
-                    temp_movement_array[j] = 1
+            temp_movement_array[is_moving] = 1
 
             temp_sum = np.nansum(temp_movement_array)
             result_time_spent_moving = (temp_sum / len(self.signal_time)) * self.signal_time[-1]
@@ -295,93 +293,12 @@ class RePlayGameDataTyperShark(RePlayGameData):
         return replay_normalized_difficulty
 
     #The purpose of this method is to calclate what the "expected" keypress is at any timepoint
-    #during the session. The input to this method is a Pandas dataframe representing the SQL data
-    #table of a TyperShark session. The output of this method is a list, equal in size to the number
-    #of rows of the dataframe, that contains the value of the "expected keypress" at each timepoint.
+    #during the session. The output of this method is a list, equal in size to the number
+    #of timepoints of the session, that contains the value of the "expected keypress" at each timepoint.
+    #It also returns the state of each shark at the end of the session, in a dictionary that is keyed by
+    #the shark's guid (as a string).
     def CalculateExpectedKeypresses (self):
-
-        #Create an empty array that will hold an expected keypress for each timepoint. This will
-        #be the result that we return to the caller of this function.
-        all_expected_keypresses = []
-
-        #Create a set of unique sharks, where the shark's guid is the key. This set is initially
-        #empty, but will be updated throughout this function.
-        sharks = {}
-
-        #Iterate over each row of the table (in other words, each timepoint of the session)
-        for idx in range(0, len(self.signal_time)):
-            #Get the stage type at the current timepoint
-            current_stage_type = self.stage_type[idx]
-
-            #Grab the currently active sharks
-            current_active_sharks = self.shark_info[idx]
-
-            #Iterate over all sharks that are currently alive to grab updated information
-            num_sharks_alive = self.num_sharks_alive[idx]
-            alive_shark_guids = []
-            for s in range(num_sharks_alive):
-                this_shark_info = self.shark_info[idx][s]
-                this_shark_guid = str(this_shark_info[0])
-                alive_shark_guids.append(this_shark_guid)
-
-                #Check to see if this shark is brand new
-                this_shark_newsharkdata = this_shark_info[1]
-    
-                #If this is a new shark, add it to the set of all sharks
-                if this_shark_newsharkdata is not None:
-                    sharks[this_shark_guid] = {
-                        "shark_data" : this_shark_newsharkdata,
-                        "cur_word_idx" : 0,
-                        "cur_letter_idx" : 0,
-                        "updated_word_idx" : 0,
-                        "updated_letter_idx" : 0,
-                        "shark_killed" : False
-                    }
-
-                #Now let's grab the updated word/letter idx (that take effect AFTER this frame)
-                this_shark_updated_word_idx = this_shark_info[2]
-                this_shark_updated_letter_idx = this_shark_info[3]
-                
-                #Set the current word/letter indices for this shark
-                sharks[this_shark_guid]["updated_word_idx"] = int(this_shark_updated_word_idx)
-                sharks[this_shark_guid]["updated_letter_idx"] = int(this_shark_updated_letter_idx)
-  
-            #Now let's see which shark is selected, which word we are on, and which letter we are on
-            selected_shark_guid_raw = self.selected_shark_guid[idx]
-            selected_shark_guid = None
-            if selected_shark_guid_raw is not None:
-                selected_shark_guid = str(selected_shark_guid_raw)
-            if (current_stage_type == "SingleShark_WordAtBottom"):
-                if (len(current_active_sharks) > 0):
-                    first_active_shark = current_active_sharks[0]
-                    if (len(first_active_shark) > 0):
-                        selected_shark_guid = str(first_active_shark[0])
-            elif (current_stage_type == "OceanFloor_ShipwreckBonus"):
-                selected_shark_guid = None
-            
-            #Now determine the "expected keypress" at this timepoint
-            if (selected_shark_guid is not None):
-                try:
-                    cur_shark_word_idx = sharks[selected_shark_guid]["cur_word_idx"]
-                    cur_shark_letter_idx = sharks[selected_shark_guid]["cur_letter_idx"]
-                    this_shark_words = sharks[selected_shark_guid]["shark_data"][2]
-                    this_word = this_shark_words[cur_shark_word_idx]
-                    expected_keypress = this_word[cur_shark_letter_idx]
-                except:
-                    expected_keypress = None
-                all_expected_keypresses.append(expected_keypress)
-            else:
-                all_expected_keypresses.append(None)
-
-            #Now let's iterate through all alive sharks and update the cur word/letter idx
-            for cur_shark_guid in alive_shark_guids:
-                sharks[cur_shark_guid]["cur_word_idx"] = sharks[cur_shark_guid]["updated_word_idx"]
-                sharks[cur_shark_guid]["cur_letter_idx"] = sharks[cur_shark_guid]["updated_letter_idx"]
-                this_shark_num_words = int(sharks[cur_shark_guid]["shark_data"][1])
-                if (sharks[cur_shark_guid]["cur_word_idx"] >= this_shark_num_words):
-                    sharks[cur_shark_guid]["shark_killed"] = True
-
-        return (all_expected_keypresses, sharks)
+        return self.__calculate_expected_keypresses(np.arange(len(self.signal_time)))
 
     #This function simply calculates the total number of keypresses that occurred and what they were.
     #It returns to things: (1) an integer representing the total number of keypresses, and (2) a list
@@ -417,32 +334,32 @@ class RePlayGameDataTyperShark(RePlayGameData):
     #Outputs:
     #
     def CalculateTyperSharkMetrics (self):
-        (all_expected_keypresses, sharks) = self.CalculateExpectedKeypresses()
-
-        #Calculate the percentage of accurate keypresses
+        #Find the timepoints at which a key was pressed
         #In this metric, we exclude anything that happened during an "OceanFloor_ShipwreckBonus" stage,
         #because the data file does not contain the appropriate data to be able to calculate accuracy during
         #that stage.
-        total_keypresses = 0
+        number_of_timepoints = len(self.signal_time)
+        number_of_keypress_timepoints = min(number_of_timepoints, len(self.key_released_strings), len(self.stage_type))
+        keys_released_count = np.fromiter(map(len, self.key_released_strings[0:number_of_keypress_timepoints]), 
+            dtype = np.int64, count = number_of_keypress_timepoints)
+        keypress_idx = [idx for idx in np.flatnonzero(keys_released_count > 0).tolist() 
+            if (self.stage_type[idx] != "OceanFloor_ShipwreckBonus")]
+
+        #Calculate the expected keypress at each of those timepoints
+        (expected_keypresses, sharks) = self.__calculate_expected_keypresses(np.array(keypress_idx, dtype = np.int64))
+
+        #Timepoints that do not have any keypress information are only allowed during the "shipwreck bonus" stage
+        for idx in range(len(self.key_released_strings), number_of_timepoints):
+            if (self.stage_type[idx] != "OceanFloor_ShipwreckBonus"):
+                raise IndexError("list index out of range")
+
+        #Calculate the percentage of accurate keypresses
+        total_keypresses = len(keypress_idx)
         total_correct_keypresses = 0
-        for idx in range(0, len(self.signal_time)):
-            cur_stage = self.stage_type[idx]
-
-            #If this is NOT the "shipwreck bonus" stage
-            if (cur_stage != "OceanFloor_ShipwreckBonus"):
-                #Get the current keypress
-                cur_keypress = self.key_released_strings[idx]
-                if (len(cur_keypress) > 0):
-                    cur_keypress = cur_keypress[0]
-                else:
-                    cur_keypress = None
-
-                #Check to see if the current keypress matches the expected keypress
-                if (cur_keypress is not None):
-                    expected_keypress = all_expected_keypresses[idx]
-                    total_keypresses += 1
-                    if (cur_keypress == expected_keypress):
-                        total_correct_keypresses += 1
+        for (idx, expected_keypress) in zip(keypress_idx, expected_keypresses):
+            #Check to see if the current keypress matches the expected keypress
+            if (self.key_released_strings[idx][0] == expected_keypress):
+                total_correct_keypresses += 1
         
         #Now calculate the keypress accuracy
         try:
@@ -516,4 +433,198 @@ class RePlayGameDataTyperShark(RePlayGameData):
             correct_keys_per_minute, 
             mistakes_per_minute,
             total_session_time)
-    
\ No newline at end of file
+    
+
+    #region Private methods
+
+    #This method returns the information of every shark record of the session (one record for each shark that
+    #is alive at each timepoint) as flat arrays: the index of the timepoint, the shark's integer id, its word
+    #index and character index, whether the record holds the data of a new shark, and the new shark data.
+    #It also returns the number of records at each timepoint, the position of each record within its timepoint,
+    #and the guid of each shark id. The shark ids are calculated once and then kept in memory (they are not saved
+    #to the database).
+    def __get_shark_records(self):
+        shark_records = getattr(self, "_v_shark_records", None)
+        if (shark_records is None):
+            if isinstance(self.shark_info, RePlayRaggedArray):
+                records = self.shark_info.GetRecords()
+                frame_counts = self.shark_info.GetFrameCounts()
+                frame_indices = self.shark_info.GetFrameIndices()
+                guid_keys = np.ascontiguousarray(records["guid"]).view(np.dtype((np.void, 16))).reshape(-1)
+                (shark_guids, shark_ids) = np.unique(guid_keys, return_inverse = True)
+                shark_guids = [tuple(x.tobytes()) for x in shark_guids]
+                word_idx = records["word_idx"].astype(np.int64)
+                letter_idx = records["letter_idx"].astype(np.int64)
+                new_shark_data = records["new_shark_data"]
+            else:
+                #The shark information of databases that were created before RePlayRaggedArray existed
+                #is a list of records for each timepoint
+                frame_counts = np.array([len(x) for x in self.shark_info], dtype = np.int64)
+                frame_indices = np.repeat(np.arange(len(frame_counts)), frame_counts)
+                shark_ids_by_guid = {}
+                shark_ids = []
+                word_idx = []
+                letter_idx = []
+                new_shark_data = []
+                for frame_records in self.shark_info:
+                    for this_shark_info in frame_records:
+                        shark_ids.append(shark_ids_by_guid.setdefault(tuple(this_shark_info[0]), len(shark_ids_by_guid)))
+                        new_shark_data.append(this_shark_info[1])
+                        word_idx.append(int(this_shark_info[2]))
+                        letter_idx.append(int(this_shark_info[3]))
+                shark_guids = list(shark_ids_by_guid.keys())
+                shark_ids = np.array(shark_ids, dtype = np.int64)
+                word_idx = np.array(word_idx, dtype = np.int64)
+                letter_idx = np.array(letter_idx, dtype = np.int64)
+                new_shark_data = np.array(new_shark_data + [None], dtype = object)[0:-1]
+
+            is_new_shark = np.fromiter((x is not None for x in new_shark_data), dtype = bool, count = len(new_shark_data))
+            frame_offsets = np.concatenate([[0], np.cumsum(frame_counts)])
+            position_in_frame = np.arange(len(frame_indices)) - frame_offsets[frame_indices]
+
+            shark_records = (frame_indices, np.asarray(shark_ids, dtype = np.int64).reshape(-1), word_idx, letter_idx, 
+                is_new_shark, new_shark_data, frame_counts, position_in_frame, shark_guids)
+            self._v_shark_records = shark_records
+
+        return shark_records
+
+    #This method calculates the "expected" keypress at each of the given timepoints, and the state of each shark at
+    #the end of the session (see CalculateExpectedKeypresses). Instead of stepping through every timepoint, the state
+    #of the selected shark at each timepoint is looked up from the shark records: at the start of a timepoint, a
+    #shark's current word and character are the ones that were saved in its most recent record before that timepoint
+    #(or the first word and character, if the shark appears for the first time at that timepoint).
+    def __calculate_expected_keypresses(self, timepoint_idx):
+        number_of_timepoints = len(self.signal_time)
+        if (number_of_timepoints == 0):
+            return ([], {})
+
+        (frame_indices, shark_ids, word_idx, letter_idx, is_new_shark, new_shark_data, frame_counts, 
+            position_in_frame, shark_guids) = self.__get_shark_records()
+        number_of_sharks = len(shark_guids)
+
+        #Every timepoint must have its stage type, shark information, and selected shark. Any errors in the
+        #information are raised in the same order in which stepping through the timepoints would find them:
+        #each error is listed with its timepoint and its position within the timepoint.
+        errors = []
+        number_of_complete_timepoints = min(number_of_timepoints, len(self.stage_type), len(self.shark_info), 
+            len(self.num_sharks_alive))
+        if (number_of_complete_timepoints < number_of_timepoints):
+            errors.append((number_of_complete_timepoints, 0, IndexError("list index out of range")))
+        if (len(self.selected_shark_guid) < number_of_timepoints):
+            errors.append((len(self.selected_shark_guid), math.inf, IndexError("list index out of range")))
+
+        #Only the first "num_sharks_alive" records of each timepoint are used
+        num_sharks_alive = np.array(self.num_sharks_alive[0:number_of_complete_timepoints], dtype = np.int64)
+        missing_records_idx = np.flatnonzero(num_sharks_alive > frame_counts[0:number_of_complete_timepoints])
+        if (len(missing_records_idx) > 0):
+            idx = missing_records_idx[0]
+            errors.append((idx, 1 + frame_counts[idx], IndexError("list index out of range")))
+        is_used = (frame_indices < number_of_complete_timepoints)
+        is_used[is_used] &= (position_in_frame[is_used] < num_sharks_alive[frame_indices[is_used]])
+        used_idx = np.flatnonzero(is_used)
+
+        #Sort the records by shark, and then by timepoint (records of the same shark at the same timepoint
+        #stay in the order in which they were saved)
+        record_keys = shark_ids[used_idx] * (number_of_timepoints + 1) + frame_indices[used_idx]
+        sort_order = np.argsort(record_keys, kind = "stable")
+        sorted_idx = used_idx[sort_order]
+        sorted_keys = record_keys[sort_order]
+        new_shark_sorted_idx = sorted_idx[is_new_shark[sorted_idx]]
+        new_shark_sorted_keys = sorted_keys[is_new_shark[sorted_idx]]
+
+        #The first record of each shark must hold the data of a new shark
+        is_first_record_of_shark = np.ones(len(sorted_idx), dtype = bool)
+        is_first_record_of_shark[1:] = (shark_ids[sorted_idx[1:]] != shark_ids[sorted_idx[0:-1]])
+        first_record_idx = sorted_idx[is_first_record_of_shark]
+        is_missing_data = ~is_new_shark[first_record_idx]
+        if np.any(is_missing_data):
+            missing_data_idx = np.min(first_record_idx[is_missing_data])
+            errors.append((frame_indices[missing_data_idx], 1 + position_in_frame[missing_data_idx], 
+                KeyError(str(list(shark_guids[shark_ids[missing_data_idx]])))))
+
+        if (len(errors) > 0):
+            raise min(errors, key = lambda x: (x[0], x[1]))[2]
+
+        #Determine which shark is selected at each of the requested timepoints
+        shark_ids_by_guid = { g : i for (i, g) in enumerate(shark_guids) }
+        frame_offsets = np.concatenate([[0], np.cumsum(frame_counts)])
+        timepoint_idx = np.asarray(timepoint_idx, dtype = np.int64)
+        selected_shark_ids = np.full(len(timepoint_idx), -1, dtype = np.int64)
+        for (i, idx) in enumerate(timepoint_idx.tolist()):
+            current_stage_type = self.stage_type[idx]
+            if (current_stage_type == "SingleShark_WordAtBottom") and (frame_counts[idx] > 0):
+                selected_shark_ids[i] = shark_ids[frame_offsets[idx]]
+            elif (current_stage_type != "OceanFloor_ShipwreckBonus") and (self.selected_shark_guid[idx] is not None):
+                selected_shark_ids[i] = shark_ids_by_guid.get(tuple(self.selected_shark_guid[idx]), -1)
+
+        #Find the most recent data of the selected shark (at or before each timepoint), and its most recent record
+        #before each timepoint
+        query_keys = selected_shark_ids * (number_of_timepoints + 1) + timepoint_idx
+        new_shark_position = np.searchsorted(new_shark_sorted_keys, query_keys, side = "right") - 1
+        previous_record_position = np.searchsorted(sorted_keys, query_keys, side = "left") - 1
+        has_shark_data = (selected_shark_ids >= 0) & (new_shark_position >= 0)
+        has_shark_data[has_shark_data] &= (shark_ids[new_shark_sorted_idx[new_shark_position[has_shark_data]]] == 
+            selected_shark_ids[has_shark_data])
+
+        query_idx = np.flatnonzero(has_shark_data)
+        query_data_idx = new_shark_sorted_idx[new_shark_position[query_idx]]
+        query_record_idx = sorted_idx[previous_record_position[query_idx]]
+        is_new_at_timepoint = (frame_indices[query_data_idx] == timepoint_idx[query_idx])
+        query_word_idx = np.where(is_new_at_timepoint, 0, word_idx[query_record_idx])
+        query_letter_idx = np.where(is_new_at_timepoint, 0, letter_idx[query_record_idx])
+
+        #Look up the expected keypress once for each combination of shark data, word, and character
+        all_expected_keypresses = np.full(len(timepoint_idx), None, dtype = object)
+        if (len(query_idx) > 0):
+            (unique_queries, query_inverse) = np.unique(np.stack([query_data_idx, query_word_idx, query_letter_idx], axis = 1), 
+                axis = 0, return_inverse = True)
+            unique_expected_keypresses = np.full(len(unique_queries), None, dtype = object)
+            for (i, (data_idx, cur_shark_word_idx, cur_shark_letter_idx)) in enumerate(unique_queries.tolist()):
+                try:
+                    this_shark_words = new_shark_data[data_idx][2]
+                    this_word = this_shark_words[cur_shark_word_idx]
+                    unique_expected_keypresses[i] = this_word[cur_shark_letter_idx]
+                except:
+                    unique_expected_keypresses[i] = None
+            all_expected_keypresses[query_idx] = unique_expected_keypresses[query_inverse.reshape(-1)]
+
+        #Now calculate the state of each shark at the end of the session. A shark has been killed if, since the
+        #most recent time that its data was saved, its word index has reached the number of words that it has.
+        is_last_record_of_timepoint = np.ones(len(sorted_idx), dtype = bool)
+        is_last_record_of_timepoint[0:-1] = (sorted_keys[1:] != sorted_keys[0:-1])
+        is_last_record_of_shark = np.ones(len(sorted_idx), dtype = bool)
+        is_last_record_of_shark[0:-1] = (shark_ids[sorted_idx[1:]] != shark_ids[sorted_idx[0:-1]])
+        is_last_new_record_of_shark = np.ones(len(new_shark_sorted_idx), dtype = bool)
+        is_last_new_record_of_shark[0:-1] = (shark_ids[new_shark_sorted_idx[1:]] != shark_ids[new_shark_sorted_idx[0:-1]])
+
+        last_record_idx = np.full(number_of_sharks, -1, dtype = np.int64)
+        last_record_idx[shark_ids[sorted_idx[is_last_record_of_shark]]] = sorted_idx[is_last_record_of_shark]
+        last_data_idx = np.full(number_of_sharks, -1, dtype = np.int64)
+        last_data_idx[shark_ids[new_shark_sorted_idx[is_last_new_record_of_shark]]] = new_shark_sorted_idx[is_last_new_record_of_shark]
+
+        number_of_words = np.zeros(number_of_sharks, dtype = np.int64)
+        for k in np.flatnonzero(last_data_idx >= 0).tolist():
+            number_of_words[k] = int(new_shark_data[last_data_idx[k]][1])
+
+        killed_record_idx = sorted_idx[is_last_record_of_timepoint]
+        killed_shark_ids = shark_ids[killed_record_idx]
+        is_killed_record = (frame_indices[killed_record_idx] >= frame_indices[last_data_idx[killed_shark_ids]]) & \
+            (word_idx[killed_record_idx] >= number_of_words[killed_shark_ids])
+        is_shark_killed = np.zeros(number_of_sharks, dtype = bool)
+        is_shark_killed[killed_shark_ids[is_killed_record]] = True
+
+        #Sharks are listed in the order in which they first appeared
+        sharks = {}
+        for k in shark_ids[np.sort(first_record_idx)].tolist():
+            sharks[str(list(shark_guids[k]))] = {
+                "shark_data" : new_shark_data[last_data_idx[k]],
+                "cur_word_idx" : int(word_idx[last_record_idx[k]]),
+                "cur_letter_idx" : int(letter_idx[last_record_idx[k]]),
+                "updated_word_idx" : int(word_idx[last_record_idx[k]]),
+                "updated_letter_idx" : int(letter_idx[last_record_idx[k]]),
+                "shark_killed" : bool(is_shark_killed[k])
+            }
+
+        return (all_expected_keypresses.tolist(), sharks)
+
+    #endregion
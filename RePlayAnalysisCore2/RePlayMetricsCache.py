@@ -0,0 +1,184 @@
+import persistent
+
+from datetime import datetime
+from datetime import timedelta
+from BTrees.OOBTree import OOBTree
+
+#This class is a persistent cache of metrics that have been calculated from activities (for example, the number
+#of repetitions in an activity). It is saved in the database, so that any script can use metrics that were
+#calculated by an earlier run of itself (or by another script), instead of calculating them again.
+#
+#Each metric is saved under a key that is made from:
+#   1. the identity of the activity (its participant id, activity name, and start time),
+#   2. the md5 checksums of the data files that the activity was loaded from,
+#   3. the name of the algorithm that calculated the metric,
+#   4. the version of that algorithm, and
+#   5. the parameters that were passed to the algorithm.
+#If any part of the key changes (for example, when a data file is loaded again with different contents, or when
+#the version number of an algorithm is increased because its code was changed), the saved metric is not used,
+#and the metric is calculated again. Algorithms should increase their version number whenever a change to their
+#code could change the metrics that they calculate.
+#
+#Saved metrics are removed from the cache when they have not been used for longer than "maximum_age" (this is
+#checked at most once a day, when metrics are saved), or when there are more than "maximum_number_of_entries"
+#saved metrics (the least recently used are removed first).
+#When a metric is saved for an activity, any metrics that were saved for the same activity and algorithm with a
+#different data file checksum or algorithm version are removed, since they can no longer be used.
+class RePlayMetricsCache(persistent.Persistent):
+
+    #The time that a metric was last used is only updated if it was last updated longer ago than this,
+    #so that reading metrics from the cache does not change the database every time
+    last_used_resolution = timedelta(days = 1)
+
+    #If there is a maximum age, metrics that are too old are removed when metrics are saved, but no more often
+    #than this (since every saved metric has to be looked at to find the ones that are too old)
+    age_eviction_interval = timedelta(days = 1)
+
+    def __init__(self, maximum_number_of_entries = None, maximum_age = None):
+        #The saved metrics. The key of each entry is (activity id, algorithm name, source checksum,
+        #algorithm version, parameters), and the value is (metrics, time saved, time last used).
+        self.entries = OOBTree()
+        self.number_of_entries = 0
+
+        #The limits on how many metrics are saved (None = no limit)
+        self.maximum_number_of_entries = maximum_number_of_entries
+        self.maximum_age = maximum_age
+
+        #The last time that metrics were removed from the cache (see Evict)
+        self.last_eviction_time = None
+
+    #region Public methods
+
+    #This method returns the saved metrics for an activity, or None if there are no valid saved metrics
+    def GetMetrics(self, activity, algorithm_name, algorithm_version, parameters = None):
+        key = RePlayMetricsCache.get_key(activity, algorithm_name, algorithm_version, parameters)
+        entry = self.entries.get(key, None)
+        if (entry is None):
+            return None
+
+        (metrics, time_saved, time_last_used) = entry
+        current_time = datetime.utcnow()
+        if (current_time - time_last_used) >= RePlayMetricsCache.last_used_resolution:
+            self.entries[key] = (metrics, time_saved, current_time)
+
+        return metrics
+
+    #This method saves the metrics for an activity
+    def SetMetrics(self, activity, algorithm_name, algorithm_version, metrics, parameters = None):
+        key = RePlayMetricsCache.get_key(activity, algorithm_name, algorithm_version, parameters)
+
+        #Remove metrics for this activity and algorithm that were calculated from different data files,
+        #or by a different version of the algorithm
+        (activity_id, _, source_checksum, _, _) = key
+        stale_keys = []
+        for k in self.entries.keys(min = (activity_id, algorithm_name)):
+            if (k[0] != activity_id) or (k[1] != algorithm_name):
+                break
+            if (k[2] != source_checksum) or (k[3] != algorithm_version):
+                stale_keys.append(k)
+        for k in stale_keys:
+            del self.entries[k]
+        self.number_of_entries -= len(stale_keys)
+
+        current_time = datetime.utcnow()
+        if (key not in self.entries):
+            self.number_of_entries += 1
+        self.entries[key] = (metrics, current_time, current_time)
+
+        if (self.maximum_number_of_entries is not None) and (self.number_of_entries > self.maximum_number_of_entries):
+            self.Evict()
+        elif (self.maximum_age is not None):
+            last_eviction_time = getattr(self, "last_eviction_time", None)
+            if (last_eviction_time is None) or ((current_time - last_eviction_time) >= RePlayMetricsCache.age_eviction_interval):
+                self.Evict()
+
+        self._p_changed = True
+
+    #This method returns the saved metrics for an activity. If there are no valid saved metrics, the metrics
+    #are calculated by calling "calculate_metrics" (with no arguments), and saved before they are returned
+    #(unless they are None). If a commit policy is passed in, it is told each time that metrics are saved.
+    def GetOrCalculateMetrics(self, activity, algorithm_name, algorithm_version, calculate_metrics, parameters = None,
+        commit_policy = None):
+        metrics = self.GetMetrics(activity, algorithm_name, algorithm_version, parameters)
+        if (metrics is None):
+            metrics = calculate_metrics()
+            if (metrics is not None):
+                self.SetMetrics(activity, algorithm_name, algorithm_version, metrics, parameters)
+                if (commit_policy is not None):
+                    commit_policy.ObjectChanged()
+
+        return metrics
+
+    #This method removes the metrics that have not been used for longer than the maximum age, and then
+    #removes the least recently used metrics until there are no more than the maximum number of entries.
+    #It returns the number of metrics that were removed.
+    def Evict(self):
+        keys_to_remove = []
+        if (self.maximum_age is not None):
+            oldest_time_allowed = datetime.utcnow() - self.maximum_age
+            keys_to_remove = [k for (k, entry) in self.entries.items() if (entry[2] < oldest_time_allowed)]
+
+        if (self.maximum_number_of_entries is not None):
+            number_to_remove = (self.number_of_entries - len(keys_to_remove)) - self.maximum_number_of_entries
+            if (number_to_remove > 0):
+                keys_being_removed = set(keys_to_remove)
+                remaining_entries = sorted([(entry[2], k) for (k, entry) in self.entries.items() if (k not in keys_being_removed)])
+                keys_to_remove.extend([k for (_, k) in remaining_entries[0:number_to_remove]])
+
+        for k in keys_to_remove:
+            del self.entries[k]
+        self.number_of_entries -= len(keys_to_remove)
+
+        self.last_eviction_time = datetime.utcnow()
+        self._p_changed = True
+
+        return len(keys_to_remove)
+
+    #This method removes all saved metrics that were calculated by an algorithm (for any activity)
+    def ClearAlgorithm(self, algorithm_name):
+        keys_to_remove = [k for k in self.entries.keys() if (k[1] == algorithm_name)]
+        for k in keys_to_remove:
+            del self.entries[k]
+        self.number_of_entries -= len(keys_to_remove)
+        self._p_changed = True
+
+    #endregion
+
+    #region Static methods
+
+    #This method returns the key that the metrics for an activity are saved under
+    @staticmethod
+    def get_key(activity, algorithm_name, algorithm_version, parameters = None):
+        return (RePlayMetricsCache.get_activity_id(activity), algorithm_name,
+            RePlayMetricsCache.get_source_checksum(activity), algorithm_version,
+            RePlayMetricsCache.get_parameters_key(parameters))
+
+    #This method returns a string that identifies an activity
+    @staticmethod
+    def get_activity_id(activity):
+        start_time = activity.start_time
+        if isinstance(start_time, datetime):
+            start_time = start_time.isoformat()
+        return f"{activity.uid}|{activity.activity_name}|{start_time}"
+
+    #This method returns the md5 checksums of the game data file and the controller data file of an activity
+    @staticmethod
+    def get_source_checksum(activity):
+        game_data_checksum = ""
+        controller_data_checksum = ""
+        if (getattr(activity, "game_data", None) is not None):
+            game_data_checksum = getattr(activity.game_data, "md5_checksum", "")
+        if (getattr(activity, "controller_data", None) is not None):
+            controller_data_checksum = getattr(activity.controller_data, "md5_checksum", "")
+        return f"{game_data_checksum}|{controller_data_checksum}"
+
+    #This method returns a string that represents the parameters that were passed to an algorithm
+    @staticmethod
+    def get_parameters_key(parameters):
+        if (parameters is None):
+            return ""
+        if isinstance(parameters, dict):
+            return repr(sorted(parameters.items()))
+        return repr(parameters)
+
+    #endregion
@@ -7,9 +7,37 @@ class RePlayParticipant(persistent.Persistent):
         self.visits = persistent.list.PersistentList()
         self.tags = persistent.mapping.PersistentMapping()
 
+        #An index of this participant's visits by (start time, end time), and the number of visits that have been indexed
+        self.visits_by_time = {}
+        self.number_of_indexed_visits = 0
+
     def __str__(self):
         return self.uid
 
     def __repr__(self):
         return "{UID: " + f"{self.uid}" + ", Visit Count: " + f"{len(self.visits)}" + "}"
-        
+
+    #This method returns the first of this participant's visits with a matching start and end time,
+    #or None if there is no such visit
+    def FindVisit(self, start_time, end_time):
+        self.__update_visit_index()
+        return self.visits_by_time.get((start_time, end_time), None)
+
+    #This method adds a visit to this participant
+    def AddVisit(self, visit):
+        self.visits.append(visit)
+        self.__update_visit_index()
+
+    #Visits are only ever appended to the list of visits, so this method adds any visits that have been
+    #appended since the index was last updated (this also builds the index for participants that were
+    #saved before the index existed).
+    def __update_visit_index(self):
+        if not(hasattr(self, "visits_by_time")) or (len(self.visits) < self.number_of_indexed_visits):
+            self.visits_by_time = {}
+            self.number_of_indexed_visits = 0
+
+        if (self.number_of_indexed_visits != len(self.visits)):
+            for i in range(self.number_of_indexed_visits, len(self.visits)):
+                self.visits_by_time.setdefault((self.visits[i].start_time, self.visits[i].end_time), self.visits[i])
+            self.number_of_indexed_visits = len(self.visits)
+            self._p_changed = True
@@ -0,0 +1,31 @@
+import persistent
+
+#This class is a persistent index of the participants in a participant list, so that a participant can be
+#found by their UID without scanning the whole list. If more than one participant has the same UID, the
+#first of them in the list is the one that is found.
+#
+#The participant list itself is not changed. Participants are only ever appended to the participant list,
+#so the index keeps track of how many participants it has indexed, and any participants that have been
+#appended to the list since then are added to the index the next time it is updated.
+class RePlayParticipantIndex(persistent.Persistent):
+
+    def __init__(self):
+        self.participants_by_uid = {}
+        self.number_of_indexed_participants = 0
+
+    #This method adds any participants that have been appended to the participant list to the index
+    def Update(self, participants):
+        #If the participant list is shorter than it was, then it was not just appended to, so index it again
+        if (len(participants) < self.number_of_indexed_participants):
+            self.participants_by_uid = {}
+            self.number_of_indexed_participants = 0
+
+        if (self.number_of_indexed_participants != len(participants)):
+            for i in range(self.number_of_indexed_participants, len(participants)):
+                self.participants_by_uid.setdefault(participants[i].uid, participants[i])
+            self.number_of_indexed_participants = len(participants)
+            self._p_changed = True
+
+    #This method returns the first participant with a matching UID, or None if there is no such participant
+    def FindParticipant(self, uid):
+        return self.participants_by_uid.get(uid, None)
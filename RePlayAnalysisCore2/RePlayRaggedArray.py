@@ -0,0 +1,203 @@
+import struct
+import operator
+import numpy as np
+
+#This class holds a variable number of fixed-layout records for each frame of a game session
+#(for example: the balls in each Breakout frame, or the sharks in each TyperShark frame).
+#Instead of holding one Python list per record per frame, all of the records are held in a single
+#flat NumPy structured array, and a second array holds the offset of the first record of each frame.
+#Indexing this object with a frame index returns a view of the records in that frame, so
+#len(), indexing, and iteration over frames work the same way they do for a list of lists.
+#
+#Records are collected while a data file is being read (either as tuples with AppendFrame,
+#or as raw bytes straight from the file with ReadFrame), and they are assembled into the
+#flat array the first time the records are accessed.
+class RePlayRaggedArray:
+
+    def __init__(self, record_dtype):
+        #The layout of each record
+        self.record_dtype = np.dtype(record_dtype)
+
+        #The records of all frames, one after another
+        self.records = np.zeros(0, dtype = self.record_dtype)
+
+        #The offset of the first record of each frame. The final element is the total number of records.
+        self.frame_offsets = np.zeros(1, dtype = np.int64)
+
+        self.__reset_pending_frames()
+
+    #region Methods used while reading a data file
+
+    #This method adds a frame to the end of this object. The frame is a sequence of records, where each
+    #record is a tuple with one value for each field of the record layout.
+    def AppendFrame(self, frame_records):
+        if (len(self.__pending_chunks) == 0) or (self.__pending_chunks[-1][0] is not None):
+            self.__pending_chunks.append((None, []))
+        self.__pending_chunks[-1][1].extend(frame_records)
+        self.__pending_counts.append(len(frame_records))
+
+    #This method reads a frame of records directly from an opened data file (or mmap). The records are
+    #stored in the file one after another using the layout "file_record_dtype". Fields of the file layout
+    #that are not part of this object's record layout are discarded, and fields of this object's record layout
+    #that are not in the file are set to zero. A struct.error is raised if the file ends before all of the
+    #records have been read, just as it would be if the records were read one at a time.
+    def ReadFrame(self, opened_file, number_of_records, file_record_dtype = None):
+        number_of_records = max(0, number_of_records)
+        if (number_of_records > 0):
+            if (file_record_dtype is None):
+                file_record_dtype = self.record_dtype
+            file_record_dtype = np.dtype(file_record_dtype)
+
+            number_of_bytes = number_of_records * file_record_dtype.itemsize
+            raw_bytes = opened_file.read(number_of_bytes)
+            if (len(raw_bytes) != number_of_bytes):
+                raise struct.error(f"unpack requires a buffer of {number_of_bytes} bytes")
+
+            if (len(self.__pending_chunks) == 0) or (self.__pending_chunks[-1][0] is None) or \
+                (self.__pending_chunks[-1][0] != file_record_dtype):
+                self.__pending_chunks.append((file_record_dtype, bytearray()))
+            self.__pending_chunks[-1][1].extend(raw_bytes)
+
+        self.__pending_counts.append(number_of_records)
+
+    #endregion
+
+    #region Methods for accessing frames and records
+
+    def __len__(self):
+        return (len(self.frame_offsets) - 1) + len(self.__pending_counts)
+
+    #This method returns a view of the records in a single frame
+    def __getitem__(self, frame_index):
+        self.__assemble_pending_frames()
+        frame_index = operator.index(frame_index)
+        number_of_frames = len(self.frame_offsets) - 1
+        if (frame_index < 0):
+            frame_index += number_of_frames
+        if (frame_index < 0) or (frame_index >= number_of_frames):
+            raise IndexError("list index out of range")
+        return self.records[self.frame_offsets[frame_index]:self.frame_offsets[frame_index + 1]]
+
+    def __iter__(self):
+        self.__assemble_pending_frames()
+        for frame_index in range(0, len(self.frame_offsets) - 1):
+            yield self.records[self.frame_offsets[frame_index]:self.frame_offsets[frame_index + 1]]
+
+    #This method returns the flat array of records from all frames
+    def GetRecords(self):
+        self.__assemble_pending_frames()
+        return self.records
+
+    #This method returns the number of records in each frame
+    def GetFrameCounts(self):
+        self.__assemble_pending_frames()
+        return np.diff(self.frame_offsets)
+
+    #This method returns the index of the frame that each record belongs to. Together with GetRecords,
+    #this allows calculations to be grouped by frame (or by any field of the records) using NumPy.
+    def GetFrameIndices(self):
+        frame_counts = self.GetFrameCounts()
+        return np.repeat(np.arange(len(frame_counts)), frame_counts)
+
+    #This method returns one value of a field for each frame: the value from the first record in
+    #that frame. Frames that do not have any records are given the fill value.
+    def GetFirstRecordInEachFrame(self, field_name, fill_value = float("NaN")):
+        self.__assemble_pending_frames()
+        frame_counts = np.diff(self.frame_offsets)
+        field_values = self.records[field_name]
+        result = np.full(len(frame_counts), fill_value, dtype = np.result_type(field_values.dtype, np.asarray(fill_value).dtype))
+        has_records = (frame_counts > 0)
+        result[has_records] = field_values[self.frame_offsets[:-1][has_records]]
+        return result
+
+    #This method returns the records of a single frame as a list of tuples of plain Python values
+    #(fields that hold several values, like a GUID, are returned as lists).
+    def GetFrameAsList(self, frame_index):
+        frame_records = self[frame_index].tolist()
+        if any(self.record_dtype[x].shape for x in self.record_dtype.names):
+            frame_records = [tuple((y.tolist() if isinstance(y, np.ndarray) else y) for y in x) for x in frame_records]
+        return frame_records
+
+    #endregion
+
+    #region Static methods
+
+    #This method returns the records of a single frame as a list, whether the per-frame information
+    #is held in a RePlayRaggedArray or in a list of lists (as it was in databases created before
+    #RePlayRaggedArray existed).
+    @staticmethod
+    def get_frame_records(frames, frame_index):
+        if isinstance(frames, RePlayRaggedArray):
+            return frames.GetFrameAsList(frame_index)
+        else:
+            return frames[frame_index]
+
+    #This method returns the value of a field from the first record of each frame. The field is given by its
+    #position in the record, so that the same call works for a RePlayRaggedArray and for a list of lists.
+    @staticmethod
+    def get_first_record_field_in_each_frame(frames, field_index, fill_value = float("NaN")):
+        if isinstance(frames, RePlayRaggedArray):
+            return frames.GetFirstRecordInEachFrame(frames.record_dtype.names[field_index], fill_value)
+        else:
+            result = []
+            for frame_records in frames:
+                if (len(frame_records) > 0) and (len(frame_records[0]) > field_index):
+                    result.append(frame_records[0][field_index])
+                else:
+                    result.append(fill_value)
+            return np.array(result)
+
+    #endregion
+
+    #region Private methods
+
+    def __reset_pending_frames(self):
+        #Records that have been collected but not yet added to the flat array. Each chunk is a tuple of
+        #(file record layout, bytearray) for records read from a file, or (None, list of tuples) for records
+        #that were appended as tuples.
+        self.__pending_chunks = []
+
+        #The number of records in each frame that has not yet been added to the flat array
+        self.__pending_counts = []
+
+    def __assemble_pending_frames(self):
+        if (len(self.__pending_counts) == 0):
+            return
+
+        all_records = [self.records]
+        for (file_record_dtype, chunk) in self.__pending_chunks:
+            if (file_record_dtype is None):
+                all_records.append(np.array(chunk, dtype = self.record_dtype))
+            elif (file_record_dtype == self.record_dtype):
+                all_records.append(np.frombuffer(chunk, dtype = self.record_dtype).copy())
+            else:
+                file_records = np.frombuffer(chunk, dtype = file_record_dtype)
+                chunk_records = np.zeros(len(file_records), dtype = self.record_dtype)
+                for field_name in self.record_dtype.names:
+                    if field_name in file_record_dtype.names:
+                        chunk_records[field_name] = file_records[field_name]
+                all_records.append(chunk_records)
+
+        self.records = np.concatenate(all_records)
+        self.frame_offsets = np.concatenate([self.frame_offsets,
+            self.frame_offsets[-1] + np.cumsum(self.__pending_counts, dtype = np.int64)])
+
+        self.__reset_pending_frames()
+
+    #endregion
+
+    #region Pickling
+
+    #Any records that are still pending are assembled before this object is saved
+    def __getstate__(self):
+        self.__assemble_pending_frames()
+        state = self.__dict__.copy()
+        del state["_RePlayRaggedArray__pending_chunks"]
+        del state["_RePlayRaggedArray__pending_counts"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__reset_pending_frames()
+
+    #endregion
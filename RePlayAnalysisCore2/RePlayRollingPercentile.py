@@ -0,0 +1,66 @@
+import bisect
+import math
+
+#This class keeps a sorted copy of the values that are currently inside of a sliding window,
+#so that a percentile of the window can be calculated each time the window moves without
+#sorting (or partitioning) the whole window again. Values are added to the window as they
+#enter it and removed from the window as they leave it.
+#
+#Percentiles are calculated in exactly the same way as numpy.percentile (using the default
+#"linear" method), so the results are identical to calling numpy.percentile on the values
+#inside of the window.
+class RePlayRollingPercentile:
+
+    def __init__(self):
+        #The values currently in the window, in sorted order (NaN values are not included)
+        self.__sorted_values = []
+
+        #The number of NaN values currently in the window
+        self.__nan_count = 0
+
+    def __len__(self):
+        return len(self.__sorted_values) + self.__nan_count
+
+    #This method adds a value to the window
+    def AddValue(self, value):
+        if math.isnan(value):
+            self.__nan_count += 1
+        else:
+            bisect.insort(self.__sorted_values, value)
+
+    #This method removes a value (that was previously added) from the window
+    def RemoveValue(self, value):
+        if math.isnan(value):
+            self.__nan_count -= 1
+        else:
+            del self.__sorted_values[bisect.bisect_left(self.__sorted_values, value)]
+
+    #This method returns the requested percentile (0 to 100) of the values currently in the window.
+    #Just like numpy.percentile, the result is NaN if any value in the window is NaN.
+    def GetPercentile(self, percentile):
+        if (self.__nan_count > 0):
+            return float("NaN")
+        number_of_values = len(self.__sorted_values)
+        if (number_of_values == 0):
+            raise IndexError("cannot calculate the percentile of an empty window")
+
+        #Calculate the position of the percentile within the sorted values
+        quantile = percentile / 100
+        virtual_index = (number_of_values - 1) * quantile
+        previous_index = math.floor(virtual_index)
+        if (virtual_index >= (number_of_values - 1)):
+            previous_index = -1
+            (previous_value, next_value) = (self.__sorted_values[-1], self.__sorted_values[-1])
+        elif (virtual_index < 0):
+            previous_index = 0
+            (previous_value, next_value) = (self.__sorted_values[0], self.__sorted_values[0])
+        else:
+            (previous_value, next_value) = (self.__sorted_values[previous_index], self.__sorted_values[previous_index + 1])
+
+        #Linearly interpolate between the values on either side of the percentile
+        gamma = virtual_index - previous_index
+        difference = next_value - previous_value
+        if (gamma >= 0.5):
+            return next_value - difference * (1 - gamma)
+        else:
+            return previous_value + difference * gamma
@@ -12,6 +12,8 @@ from datetime import timedelta
 from collections import deque
 from enum import Enum, unique
 
+from .RePlayRollingPercentile import RePlayRollingPercentile
+
 class RePlaySignalAnalyzer:
 
     #region Enumerations
@@ -80,33 +82,58 @@ class RePlaySignalAnalyzer:
     def __process_signal (self, signal):
 
         #
-        # Explanation of the algorithm: TO DO 
+        # Explanation of the algorithm: 
+        #
+        # For each sample (once the smoothing window has been filled), the most recent samples are
+        # held in a buffer (of up to "averaging_window - 1" samples). A 5-sample running average
+        # filter is applied to the buffer, the gradient of the filtered buffer is taken, and the
+        # result for that sample is the sum of the final "smoothing_window_length" values of the
+        # gradient. Before the smoothing window has been filled, the result is 0.
+        #
+        # Because the running average filter is the same at every point in the signal, it is applied 
+        # to the whole signal just once. The only values of each buffer's gradient that differ from the 
+        # gradient of the whole signal are the two values at the edges of the buffer (which are 
+        # one-sided differences). The sums are then taken across all samples at once, adding the 
+        # gradient values in the same order that they would be added for each individual buffer.
         #
 
-        #This will be the final, processed signal
-        result_signal = []
-
-        #Declare a temporary signal
-        temp_signal = deque()
-
-        #~~~~~~~~~~~~~~~~~~~Begin loooping stepping through signal~~~~~~~~~~~~~~~~~~~~~~~~~~~
-        for idx, current_val in enumerate(signal):
-
-            #Add the current signal value to the temporary buffer
-            temp_signal.append(current_val)
-            if (len(temp_signal) >= self.averaging_window):
-                temp_signal.popleft()
-            
-            if (idx < self.smoothing_window_length):
-                #If we haven't filled up to our long smoothing window yet, fill with 0 and skip to next iteration of for loop
-                result_signal.append(0)
-            else:
-                #Apply a running average filter, then take the sum of the gradient within the smoothing window
-                s = numpy.convolve(temp_signal, numpy.ones(5) / 5, mode = "valid")
-                g = numpy.gradient(s)
-                smoothing_window_vals = numpy.asarray(g[-self.smoothing_window_length:])
-                result_val = sum(smoothing_window_vals)
-                result_signal.append(result_val)
+        #Determine the size of the buffer (which only grows until it reaches this size)
+        number_of_samples = len(signal)
+        maximum_buffer_length = int(numpy.ceil(self.averaging_window)) - 1
+
+        #If we haven't filled up to our long smoothing window yet, the result is 0
+        result_signal = [0] * min(number_of_samples, self.smoothing_window_length)
+        if (number_of_samples <= self.smoothing_window_length):
+            return result_signal
+
+        #Apply a running average filter to the entire signal
+        filtered_signal = numpy.convolve(numpy.asarray(signal), numpy.ones(5) / 5, mode = "valid")
+
+        #Calculate the one-sided differences and the central differences of the filtered signal
+        forward_differences = filtered_signal[1:] - filtered_signal[:-1]
+        central_differences = numpy.zeros(len(filtered_signal))
+        central_differences[1:-1] = (filtered_signal[2:] - filtered_signal[:-2]) / 2.0
+
+        #For each sample, determine which part of the filtered signal would be in its buffer
+        sample_idx = numpy.arange(self.smoothing_window_length, number_of_samples)
+        buffer_length = numpy.minimum(sample_idx + 1, maximum_buffer_length)
+        buffer_start_idx = sample_idx - buffer_length + 1
+        filtered_buffer_length = buffer_length - 4
+
+        #Take the sum of the gradient within the smoothing window
+        result_values = numpy.zeros(len(sample_idx))
+        for window_position in range(0, self.smoothing_window_length):
+            #This is the position within the gradient of each buffer
+            gradient_idx = filtered_buffer_length - self.smoothing_window_length + window_position
+            gradient_values = central_differences[numpy.clip(buffer_start_idx + gradient_idx, 0, len(filtered_signal) - 1)]
+            gradient_values = numpy.where(gradient_idx == 0, 
+                forward_differences[buffer_start_idx], gradient_values)
+            gradient_values = numpy.where(gradient_idx == (filtered_buffer_length - 1), 
+                forward_differences[numpy.clip(buffer_start_idx + filtered_buffer_length - 2, 0, None)], gradient_values)
+            gradient_values = numpy.where(gradient_idx < 0, 0.0, gradient_values)
+            result_values = result_values + gradient_values
+
+        result_signal.extend(result_values.tolist())
 
         return result_signal
 
@@ -181,29 +208,38 @@ class RePlaySignalAnalyzer:
         #Calculate the number of the samples that we should "look back" while calculating thresholds
         lookback_number_of_samples = int(self.vns_stimulation_lookback_period.total_seconds() * self.sampling_frequency)
 
+        #Keep sorted copies of the positive and negative sides of the signal inside of the lookback window.
+        #The negative side is held as positive values (it is negated).
+        positive_values = RePlayRollingPercentile()
+        negative_values = RePlayRollingPercentile()
+
         #Loop through the primary signal
         for idx, current_value in enumerate(self.processed_signal):
 
-            #Calculate the point in the signal at which we should look back to
-            lookback_idx = idx - lookback_number_of_samples
-            if (lookback_idx < 0):
-                lookback_idx = 0
+            #The lookback window goes from the lookback point until (but not including) the current point.
+            #Add the previous sample to the window, and remove the sample that has fallen out of the window.
+            if (idx > 0):
+                entering_value = float(self.processed_signal[idx - 1])
+                if entering_value >= noise_floor:
+                    positive_values.AddValue(entering_value)
+                if entering_value <= -noise_floor:
+                    negative_values.AddValue(-entering_value)
             
-            #Take a slice of the array from that point until the current point
-            slice_of_signal = numpy.asarray(self.processed_signal[lookback_idx:idx], dtype = numpy.float)
-
-            #Separate the positive and negative sides of the signal
-            positive_values = slice_of_signal[slice_of_signal >= noise_floor]
-            negative_values = slice_of_signal[slice_of_signal <= -noise_floor]
-
-            #Calculate the threshold for the current slice
+            if (idx > lookback_number_of_samples):
+                leaving_value = float(self.processed_signal[idx - lookback_number_of_samples - 1])
+                if leaving_value >= noise_floor:
+                    positive_values.RemoveValue(leaving_value)
+                if leaving_value <= -noise_floor:
+                    negative_values.RemoveValue(-leaving_value)
+
+            #Calculate the threshold for the current window
             positive_threshold = noise_floor
             negative_threshold = -noise_floor
             if len(positive_values) > 1:
-                positive_threshold = numpy.percentile(positive_values, 
+                positive_threshold = positive_values.GetPercentile(
                     100 * (1 - self.vns_trigger_positive_selectivity))
             if len(negative_values) > 1:
-                negative_threshold = -numpy.percentile(numpy.negative(negative_values), 
+                negative_threshold = -negative_values.GetPercentile(
                     100 * (1 - self.vns_trigger_negative_selectivity))
             
             #Add these new thresholds to the result arrays
@@ -212,20 +248,19 @@ class RePlaySignalAnalyzer:
         
         #Now loop through the compensatory signal, if there is one
         if self.processed_compensatory_signal is not None:
+            compensatory_values = RePlayRollingPercentile()
             for idx, current_value in enumerate(self.processed_compensatory_signal):
 
-                #Calculate the point in the signal at which we should look back to
-                lookback_idx = idx - lookback_number_of_samples
-                if (lookback_idx < 0):
-                    lookback_idx = 0
-                
-                #Take a slice of the array from that point until the current point
-                slice_of_signal = numpy.asarray(self.processed_compensatory_signal[lookback_idx:idx], dtype = numpy.float)
+                #Move the lookback window forward by one sample
+                if (idx > 0):
+                    compensatory_values.AddValue(float(self.processed_compensatory_signal[idx - 1]))
+                if (idx > lookback_number_of_samples):
+                    compensatory_values.RemoveValue(float(self.processed_compensatory_signal[idx - lookback_number_of_samples - 1]))
 
-                #Calculate the threshold for the current slice
+                #Calculate the threshold for the current window
                 comp_threshold = 0
-                if len(slice_of_signal) > 1:
-                    comp_threshold = numpy.percentile(slice_of_signal, 100 * (1 - self.vns_compensation_selectivity))
+                if len(compensatory_values) > 1:
+                    comp_threshold = compensatory_values.GetPercentile(100 * (1 - self.vns_compensation_selectivity))
                 
                 #Add these new thresholds to the result arrays
                 result_compensatory_threshold.append(comp_threshold)
@@ -315,68 +350,81 @@ class RePlaySignalAnalyzer:
         noise_floor = self.__get_noisefloor(self.exercise_type)
 
         #Do some pre-processing on the signal, depending on how we want to count reps
-        signal = numpy.asarray(self.processed_signal, dtype=numpy.float)
-            
-        #Now let's iterate through the list
-        this_movement_start_idx = 0
-        is_currently_in_movement = False
-        movement_phase = 0
-        is_positive_trial = False
-        for idx, current_value in enumerate(signal):
-            if not is_currently_in_movement:
-                if current_value >= noise_floor:
-                    if ((rep_count_style == RePlaySignalAnalyzer.RepCountStyle.COUNT_ONLY_POSITIVE_MOVEMENTS) or 
-                        (rep_count_style == RePlaySignalAnalyzer.RepCountStyle.COUNT_BOTH_POSITIVE_AND_NEGATIVE)):
-                        is_currently_in_movement = True
-                        this_movement_start_idx = idx
-                        movement_phase = 0
-                        is_positive_trial = True
-                if current_value <= -noise_floor:
-                    if ((rep_count_style == RePlaySignalAnalyzer.RepCountStyle.COUNT_ONLY_NEGATIVE_MOVEMENTS) or 
-                        (rep_count_style == RePlaySignalAnalyzer.RepCountStyle.COUNT_BOTH_POSITIVE_AND_NEGATIVE)):
-                        is_currently_in_movement = True
-                        this_movement_start_idx = idx
-                        movement_phase = 0
-                        is_positive_trial = False
+        signal = numpy.asarray(self.processed_signal, dtype = float)
+
+        #Determine which kinds of movement are counted, and whether a movement must go in both directions
+        count_positive_movements = ((rep_count_style == RePlaySignalAnalyzer.RepCountStyle.COUNT_ONLY_POSITIVE_MOVEMENTS) or 
+            (rep_count_style == RePlaySignalAnalyzer.RepCountStyle.COUNT_BOTH_POSITIVE_AND_NEGATIVE))
+        count_negative_movements = ((rep_count_style == RePlaySignalAnalyzer.RepCountStyle.COUNT_ONLY_NEGATIVE_MOVEMENTS) or 
+            (rep_count_style == RePlaySignalAnalyzer.RepCountStyle.COUNT_BOTH_POSITIVE_AND_NEGATIVE))
+        is_both_directions_style = (rep_count_style == RePlaySignalAnalyzer.RepCountStyle.COUNT_BOTH_POSITIVE_AND_NEGATIVE)
+        is_unidirectional = (rep_completion_criteria == RePlaySignalAnalyzer.RepCompletionCriteria.UNIDIRECTIONAL)
+
+        #Find every sample at which each of the threshold conditions is met. The state machine below only
+        #visits these samples, rather than every sample of the signal. (Note that a NaN sample meets none
+        #of these conditions.)
+        is_above_positive_threshold = (signal >= noise_floor)
+        is_below_negative_threshold = (signal <= -noise_floor)
+        is_start_of_positive_movement = is_above_positive_threshold & count_positive_movements
+        is_start_of_negative_movement = is_below_negative_threshold & count_negative_movements
+        start_idx = numpy.flatnonzero(is_start_of_positive_movement | is_start_of_negative_movement)
+        above_positive_threshold_idx = numpy.flatnonzero(is_above_positive_threshold)
+        below_negative_threshold_idx = numpy.flatnonzero(is_below_negative_threshold)
+        under_positive_threshold_idx = numpy.flatnonzero(signal < noise_floor)
+        over_negative_threshold_idx = numpy.flatnonzero(signal > -noise_floor)
+
+        #This function returns the first index in the list of indices that is at or after the starting index
+        def find_next_idx (indices, starting_idx):
+            position = numpy.searchsorted(indices, starting_idx)
+            if position < len(indices):
+                return int(indices[position])
             else:
-                movement_finished = False
-                if ((rep_count_style == RePlaySignalAnalyzer.RepCountStyle.COUNT_BOTH_POSITIVE_AND_NEGATIVE) and 
-                    (movement_phase == 1)):
+                return None
+
+        #Now let's step through the movements in the signal
+        idx = find_next_idx(start_idx, 0)
+        while idx is not None:
+            #A movement begins at this index. If the sample meets both conditions (which can happen
+            #if the noise floor is 0), the movement is considered to be negative.
+            this_movement_start_idx = idx
+            movement_phase = 0
+            is_positive_trial = not is_start_of_negative_movement[idx]
+
+            movement_finished = False
+            while (idx is not None) and (not movement_finished):
+                if (is_both_directions_style) and (movement_phase == 1):
+                    #Wait for the movement to cross the threshold in the opposite direction
                     if is_positive_trial:
-                        if current_value >= noise_floor:
-                            movement_phase = 2
+                        idx = find_next_idx(above_positive_threshold_idx, idx + 1)
                     else:
-                        if current_value <= -noise_floor:
-                            movement_phase = 2
+                        idx = find_next_idx(below_negative_threshold_idx, idx + 1)
+                    movement_phase = 2
                 else:
+                    #Wait for the movement to fall back within the threshold
                     if is_positive_trial:
-                        if current_value < noise_floor:
-                            if ((rep_count_style == RePlaySignalAnalyzer.RepCountStyle.COUNT_ONLY_POSITIVE_MOVEMENTS) or 
-                                (rep_completion_criteria == RePlaySignalAnalyzer.RepCompletionCriteria.UNIDIRECTIONAL) or
-                                (movement_phase == 2)):
-                                movement_finished = True
-                            else:
-                                movement_phase = 1
-                                is_positive_trial = False
+                        idx = find_next_idx(under_positive_threshold_idx, idx + 1)
+                        is_complete = (rep_count_style == RePlaySignalAnalyzer.RepCountStyle.COUNT_ONLY_POSITIVE_MOVEMENTS)
                     else:
-                        if current_value > -noise_floor:
-                            if ((rep_count_style == RePlaySignalAnalyzer.RepCountStyle.COUNT_ONLY_NEGATIVE_MOVEMENTS) or
-                                (rep_completion_criteria == RePlaySignalAnalyzer.RepCompletionCriteria.UNIDIRECTIONAL) or
-                                (movement_phase == 2)):
-                                movement_finished = True
-                            else:
-                                movement_phase = 1
-                                is_positive_trial = True
-                        
-                if movement_finished:
-                    is_currently_in_movement = False
-                    starting_timestamp = self.signal_timestamps[this_movement_start_idx]
-                    current_timestamp = self.signal_timestamps[idx]
-
-                    result_idx.append(this_movement_start_idx)
-                    result_final_idx.append(idx)
-                    result_times.append(starting_timestamp)
-                    result_durations.append(current_timestamp - starting_timestamp)
+                        idx = find_next_idx(over_negative_threshold_idx, idx + 1)
+                        is_complete = (rep_count_style == RePlaySignalAnalyzer.RepCountStyle.COUNT_ONLY_NEGATIVE_MOVEMENTS)
+
+                    if (is_complete) or (is_unidirectional) or (movement_phase == 2):
+                        movement_finished = True
+                    else:
+                        movement_phase = 1
+                        is_positive_trial = not is_positive_trial
+
+            if movement_finished and (idx is not None):
+                starting_timestamp = self.signal_timestamps[this_movement_start_idx]
+                current_timestamp = self.signal_timestamps[idx]
+
+                result_idx.append(this_movement_start_idx)
+                result_final_idx.append(idx)
+                result_times.append(starting_timestamp)
+                result_durations.append(current_timestamp - starting_timestamp)
+
+                #Look for the next movement
+                idx = find_next_idx(start_idx, idx + 1)
                     
         return (result_idx, result_final_idx, result_times, result_durations)
 
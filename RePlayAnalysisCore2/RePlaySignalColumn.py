@@ -0,0 +1,78 @@
+import persistent
+import numpy as np
+
+from .RePlayRaggedArray import RePlayRaggedArray
+
+#This class holds a single signal (a list, numpy array, or RePlayRaggedArray) of a game data or controller data
+#object, so that the signal is saved in the database as its own record instead of inside the record of the object
+#that it belongs to.
+#
+#When an activity (or its game data) is loaded from the database, only the small records are read. The signals
+#themselves are only read from the database the first time that they are used, and they can be removed from
+#memory again by the database's object cache, so looking at the tags or the duration of many activities does
+#not load all of their signals into memory.
+#
+#Objects that use this class call externalize_signal_columns after their signals have been read, and call
+#get_signal_column from their __getattr__ method, so that the signals can still be used as normal attributes.
+#A signal that has been moved into a RePlaySignalColumn should not be changed in place: if it needs to be
+#changed, a new value should be assigned to the attribute instead.
+class RePlaySignalColumn(persistent.Persistent):
+
+    #Signals that have fewer elements than this are left inside the object that they belong to
+    minimum_signal_length = 100
+
+    def __init__(self, data):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+    #region Static methods
+
+    #This method moves the signals (lists, numpy arrays and RePlayRaggedArrays) of an object into RePlaySignalColumns.
+    #The signals are removed from the object's attributes, and a dictionary that maps each attribute name
+    #to its RePlaySignalColumn is saved in the object's "signal_columns" attribute. If more than one
+    #attribute refers to the same signal, they share one RePlaySignalColumn.
+    #It returns the number of signals that were moved.
+    @staticmethod
+    def externalize_signal_columns(owner, minimum_signal_length = None):
+        if (minimum_signal_length is None):
+            minimum_signal_length = RePlaySignalColumn.minimum_signal_length
+
+        signal_columns = owner.__dict__.get("signal_columns", None)
+        if (signal_columns is None):
+            signal_columns = {}
+
+        columns_by_id = {}
+        for (attribute_name, value) in list(owner.__dict__.items()):
+            if (attribute_name.startswith("_")) or (attribute_name == "signal_columns"):
+                continue
+            if isinstance(value, persistent.Persistent):
+                #Persistent lists are already saved as their own records
+                continue
+            if not(isinstance(value, (list, np.ndarray, RePlayRaggedArray))) or (len(value) < minimum_signal_length):
+                continue
+
+            if (id(value) not in columns_by_id):
+                columns_by_id[id(value)] = RePlaySignalColumn(value)
+            signal_columns[attribute_name] = columns_by_id[id(value)]
+            del owner.__dict__[attribute_name]
+
+        if (len(columns_by_id) > 0):
+            owner.signal_columns = signal_columns
+            owner._p_changed = True
+
+        return len(columns_by_id)
+
+    #This method returns the signal that an object has saved in a RePlaySignalColumn under an attribute name.
+    #It raises an AttributeError if there is no such signal, so it can be called from __getattr__.
+    @staticmethod
+    def get_signal_column(owner, attribute_name):
+        if not(attribute_name.startswith("_")):
+            signal_columns = owner.__dict__.get("signal_columns", None)
+            if (signal_columns is not None) and (attribute_name in signal_columns):
+                return signal_columns[attribute_name].data
+
+        raise AttributeError(f"'{type(owner).__name__}' object has no attribute '{attribute_name}'")
+
+    #endregion
@@ -0,0 +1,139 @@
+import sys
+import persistent
+
+try:
+    import resource
+except ImportError:
+    #The "resource" module is not available on Windows
+    resource = None
+
+#This class helps analysis scripts walk over the participant tree (participants, their visits, and the
+#activities of each visit) without keeping every object that they have looked at in memory.
+#
+#The database connection keeps every object that has been loaded in its object cache, and it only removes
+#objects from the cache when it is asked to. This class asks it to do so after each activity and each
+#participant, and it limits the size of the cache to a number of bytes (if a byte budget is given).
+#After an activity has been used, the activity and the objects that hold its data (its data files, game data,
+#controller data, signals and tags) are "ghosted": their contents are removed from memory, and they will be
+#loaded from the database again the next time they are used. Objects that have changes which have not been
+#committed yet are not ghosted.
+#
+#Example:
+#   traversal = RePlayTreeTraversal(db_connection, cache_size_bytes = 500 * 1024 * 1024)
+#   for p in traversal.Participants(root.participants):
+#       for v in traversal.Visits(p):
+#           for a in traversal.Activities(v.activities):
+#               ...
+#   traversal.PrintMemoryReport()
+class RePlayTreeTraversal:
+
+    #The attributes that are followed when an activity and the objects that hold its data are ghosted
+    data_attribute_names = ["game_data", "controller_data", "tags"]
+
+    def __init__(self, db_connection, cache_size_bytes = None, ghost_activities = True):
+        self.db_connection = db_connection
+        self.ghost_activities = ghost_activities
+
+        #Limit the size of the object cache of every connection to the database
+        if (cache_size_bytes is not None):
+            self.db_connection.db().setCacheSizeBytes(cache_size_bytes)
+
+        #The number of participants, visits, and activities that have been traversed
+        self.number_of_participants = 0
+        self.number_of_visits = 0
+        self.number_of_activities = 0
+
+        #The largest estimated size of the object cache (in bytes) that has been seen during the traversal
+        self.peak_cache_size_bytes = 0
+
+    #region Public methods
+
+    #This method iterates over a list of participants. After each participant has been used,
+    #objects are removed from the object cache until it is within its budget.
+    def Participants(self, participants):
+        for current_participant in participants:
+            yield current_participant
+            self.number_of_participants += 1
+            self.CollectGarbage()
+
+    #This method iterates over the visits of a participant
+    def Visits(self, participant):
+        for current_visit in participant.visits:
+            yield current_visit
+            self.number_of_visits += 1
+
+    #This method iterates over a list of activities. After each activity has been used, it is ghosted
+    #(along with the objects that hold its data), and objects are removed from the object cache until
+    #it is within its budget.
+    def Activities(self, activities):
+        for current_activity in activities:
+            yield current_activity
+            self.number_of_activities += 1
+            if (self.ghost_activities):
+                RePlayTreeTraversal.ghost_object_tree(current_activity)
+            self.CollectGarbage()
+
+    #This method removes objects from the object cache until it is within its budget
+    def CollectGarbage(self):
+        self.__update_peak_cache_size()
+        self.db_connection.cacheGC()
+
+    #This method returns the estimated size of the object cache (in bytes)
+    def GetCacheSizeBytes(self):
+        return self.db_connection._cache.total_estimated_size
+
+    #This method prints the number of objects that have been traversed and how much memory was used
+    def PrintMemoryReport(self):
+        self.__update_peak_cache_size()
+        print(f"Traversed {self.number_of_participants} participants, {self.number_of_visits} visits, " +
+            f"and {self.number_of_activities} activities")
+        print(f"Peak object cache size: {self.peak_cache_size_bytes / (1024 * 1024):.1f} MB")
+        peak_rss = RePlayTreeTraversal.get_peak_rss_bytes()
+        if (peak_rss is not None):
+            print(f"Peak memory usage (RSS): {peak_rss / (1024 * 1024):.1f} MB")
+
+    #endregion
+
+    #region Static methods
+
+    #This method ghosts a persistent object, and the objects that hold its data (see data_attribute_names).
+    #Objects that are already ghosts are not loaded, and objects with changes that have not been committed
+    #are left as they are (the objects that hold their data can still be ghosted).
+    @staticmethod
+    def ghost_object_tree(obj):
+        if not(isinstance(obj, persistent.Persistent)) or (obj._p_status == "ghost"):
+            return
+
+        for attribute_name in RePlayTreeTraversal.data_attribute_names:
+            RePlayTreeTraversal.ghost_object_tree(obj.__dict__.get(attribute_name, None))
+
+        #Signals that are stored as their own records (see RePlaySignalColumn)
+        signal_columns = obj.__dict__.get("signal_columns", None)
+        if (signal_columns is not None):
+            for signal_column in signal_columns.values():
+                RePlayTreeTraversal.ghost_object_tree(signal_column)
+
+        if (obj._p_status == "saved"):
+            obj._p_deactivate()
+
+    #This method returns the peak resident set size of this process (in bytes),
+    #or None if it cannot be found on this platform
+    @staticmethod
+    def get_peak_rss_bytes():
+        if (resource is None):
+            return None
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        #Linux reports this number in kilobytes, and macOS reports it in bytes
+        if (sys.platform != "darwin"):
+            peak_rss = peak_rss * 1024
+        return peak_rss
+
+    #endregion
+
+    #region Private methods
+
+    def __update_peak_cache_size(self):
+        self.peak_cache_size_bytes = max(self.peak_cache_size_bytes, self.GetCacheSizeBytes())
+
+    #endregion
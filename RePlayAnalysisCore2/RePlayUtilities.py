@@ -97,6 +97,33 @@ def convert_datenum(datenum):
             + timedelta(days=days) \
             - timedelta(days=366)
 
+# Matlab datenum of the numpy datetime64 epoch (1970-01-01)
+matlab_datenum_of_unix_epoch = 719529
+
+def convert_datenum_array(datenums):
+    """
+    Convert an array of Matlab datenums into a numpy datetime64[us] array.
+    Each value is rounded to the microsecond in the same way as convert_datenum.
+    :param datenums: Array of dates in datenum format
+    :return:         numpy array of datetime64[us] values.
+    """
+    datenums = numpy.asarray(datenums, dtype = numpy.float64)
+    whole_days = numpy.trunc(datenums).astype(numpy.int64) - matlab_datenum_of_unix_epoch
+    microseconds = numpy.round(numpy.mod(datenums, 1) * 86400000000.0).astype(numpy.int64)
+    return (whole_days * 86400000000 + microseconds).astype('datetime64[us]')
+
+def calculate_elapsed_seconds(datetimes, initial_datetime = None):
+    """
+    Calculate the number of seconds that have elapsed since the first value in an array of datetime64 values.
+    :param datetimes:        numpy array of datetime64[us] values
+    :param initial_datetime: Optional datetime64 value to measure from instead of the first value
+    :return:                 Tuple of (numpy array of timedelta64[us] values, numpy array of float64 seconds)
+    """
+    if initial_datetime is None:
+        initial_datetime = datetimes[0] if len(datetimes) > 0 else numpy.datetime64(0, 'us')
+    elapsed = datetimes - numpy.datetime64(initial_datetime, 'us')
+    return (elapsed, elapsed.astype(numpy.int64) / 1e6)
+
 # This function converts a Python datetime to a Matlab datenum format
 def convert_python_datetime_to_matlab_datenum (dt):
    mdn = dt + timedelta(days = 366)
@@ -0,0 +1,142 @@
+import numpy as np
+from collections import deque
+
+from .RePlayVNSParameters import SmoothingOptions
+from .RePlayVNSParameters import Stage1_Operations
+from .RePlayVNSParameters import Stage2_Operations
+
+#This class runs RePlay's VNS signal processing algorithm one sample at a time, in the same way
+#that RePlay does while a game is being played. Each time a sample is passed in, it is added to
+#a buffer that holds the samples from the most recent "smoothing window" (the samples that fall
+#out of the window are removed from the front of the buffer), and then the stage 1 and stage 2
+#smoothing and operations are applied to the buffer.
+#
+#The buffer is held in a deque, so that adding and removing samples does not copy the buffer,
+#and each smoothing and operation step is applied to the whole buffer at once using numpy.
+#The result for each sample is identical to the result of the original implementation of
+#RePlayVNSAlgorithm.ProcessSignal.
+class RePlayVNSSignalProcessor:
+
+    #The number of samples on either side of each sample that are used by the averaging filter
+    smoothing_factor = 3
+
+    def __init__(self, vns_parameters):
+        #Save the vns parameters that will be used to process the signal
+        self.vns_parameters = vns_parameters
+
+        #Get the smoothing window size in units of seconds
+        self.smoothing_window_seconds = vns_parameters.SmoothingWindow.total_seconds()
+
+        #Create the buffer
+        self.__buffer = deque()
+        self.__buffer_ts = deque()
+
+    #region Public methods
+
+    #This method adds a sample (and its timestamp in units of seconds) to the buffer, and then returns
+    #the result of the VNS signal processing algorithm at this sample.
+    def ProcessSample (self, sample, sample_ts):
+        #Add the new sample to the buffer
+        self.__buffer.append(sample)
+        self.__buffer_ts.append(sample_ts)
+
+        #Remove old values from the buffer
+        self.__remove_expired_samples(sample_ts)
+
+        #Stage 1 Smoothing
+        s1_buffer = np.array(self.__buffer, dtype = float)
+        if (self.vns_parameters.Stage1_Smoothing == SmoothingOptions.AveragingFilter):
+            s1_buffer = RePlayVNSSignalProcessor.box_smooth(s1_buffer)
+
+        #Stage 1 Operation
+        s1_result = s1_buffer
+        if (self.vns_parameters.Stage1_Operation == Stage1_Operations.SubtractMean):
+            s1_result = s1_buffer - np.nanmean(s1_buffer)
+        elif (self.vns_parameters.Stage1_Operation == Stage1_Operations.Derivative):
+            s1_result = np.diff(s1_buffer)
+        elif (self.vns_parameters.Stage1_Operation == Stage1_Operations.Gradient):
+            s1_result = RePlayVNSSignalProcessor.gradient(s1_buffer)
+
+        #Stage 2 Smoothing
+        s2_buffer = s1_result
+        if (self.vns_parameters.Stage2_Smoothing == SmoothingOptions.AveragingFilter):
+            s2_buffer = RePlayVNSSignalProcessor.box_smooth(s2_buffer)
+
+        #Stage 2 Operation
+        s2_result = 0
+        if (len(s2_buffer) > 0):
+            s2_result = s2_buffer[-1]
+
+            if (self.vns_parameters.Stage2_Operation == Stage2_Operations.RMS):
+                s2_result = np.sqrt(np.nansum(RePlayVNSSignalProcessor.square(s2_buffer)) / len(s2_buffer))
+            elif (self.vns_parameters.Stage2_Operation == Stage2_Operations.SignedRMS):
+                s2_result = np.sqrt(np.nansum(RePlayVNSSignalProcessor.square(s2_buffer)) / len(s2_buffer))
+                s2_result = s2_result * np.sign(np.nanmean(s2_buffer))
+            elif (self.vns_parameters.Stage2_Operation == Stage2_Operations.Mean):
+                s2_result = np.nanmean(s2_buffer)
+            elif (self.vns_parameters.Stage2_Operation == Stage2_Operations.Sum):
+                s2_result = np.nansum(s2_buffer)
+
+        return s2_result
+
+    #endregion
+
+    #region Static methods
+
+    #This method applies RePlay's averaging filter to a signal. Each sample is replaced by the mean of the
+    #samples within "smoothing_factor" samples of it. The signal is padded at both ends with copies of its
+    #first sample, so the result is longer than the signal by (smoothing_factor * 2) samples. The windows at
+    #the end of the padded signal are cut short (rather than padded further).
+    @staticmethod
+    def box_smooth (signal, smoothing_factor = 3):
+        if (len(signal) == 0):
+            return np.zeros(0)
+
+        window_length = (smoothing_factor * 2) + 1
+        signal_ends = np.full(smoothing_factor, signal[0])
+        padded_signal = np.concatenate([signal_ends, signal, signal_ends, np.full(window_length - 1, np.nan)])
+        windows = np.lib.stride_tricks.sliding_window_view(padded_signal, window_length)
+        return np.nanmean(windows[:(len(signal) + (smoothing_factor * 2))], axis = 1)
+
+    #This method returns the gradient of a signal (central differences, and one-sided differences at each end)
+    @staticmethod
+    def gradient (signal):
+        if (len(signal) <= 1):
+            return np.zeros(1)
+
+        result = np.empty(len(signal))
+        result[0] = signal[1] - signal[0]
+        result[-1] = signal[-1] - signal[-2]
+        result[1:-1] = 0.5 * (signal[2:] - signal[:-2])
+        return result
+
+    #This method returns the square of each sample of a signal. Each sample is squared using pow (as RePlay
+    #does) rather than by multiplying the signal by itself with numpy, because the two do not always round
+    #the result in the same way.
+    @staticmethod
+    def square (signal):
+        return [pow(x, 2) for x in signal.tolist()]
+
+    #endregion
+
+    #region Private methods
+
+    #This method removes samples from the front of the buffer until the first sample
+    #that is inside of the smoothing window.
+    def __remove_expired_samples (self, sample_ts):
+        window_start_ts = sample_ts - self.smoothing_window_seconds
+        if (sample_ts >= window_start_ts):
+            while not (self.__buffer_ts[0] >= window_start_ts):
+                self.__buffer.popleft()
+                self.__buffer_ts.popleft()
+        else:
+            #The newest sample is not inside of the window (for example, if its timestamp is NaN).
+            #Only remove samples if some sample in the buffer is inside of the window.
+            for (j, ts) in enumerate(self.__buffer_ts):
+                if (ts >= window_start_ts):
+                    for _ in range(0, j):
+                        self.__buffer.popleft()
+                        self.__buffer_ts.popleft()
+                    break
+
+    #endregion
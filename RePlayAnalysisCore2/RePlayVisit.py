@@ -10,6 +10,7 @@ from dateutil import parser
 from pathlib import Path
 
 from RePlayAnalysisCore2 import RePlayUtilities
+from RePlayAnalysisCore2.RePlayBucketedList import RePlayBucketedList
 
 
 class RePlayVisit(persistent.Persistent):
@@ -19,18 +20,12 @@ class RePlayVisit(persistent.Persistent):
         self.end_time = datetime.min
         self.is_at_home_visit = False
         self.assignment_name = ""
-        self.activities = persistent.list.PersistentList()
+        self.activities = RePlayBucketedList()
         self.tags = persistent.mapping.PersistentMapping()
         self.parent_participant = None
 
     def GetDatesInRangeOfVisit (self, exclude_first_day = False):
-        #Find all dates between start time and end time (inclusive)
-        start_day = self.start_time.date()
-        end_day = self.end_time.date()
-        dates_in_range = [start_day + timedelta(days = x) for x in range((end_day - start_day).days + 1)]
-        if (exclude_first_day):
-            dates_in_range = dates_in_range[1:len(dates_in_range)]       
-        return dates_in_range
+        return RePlayVisit.get_dates_in_range(self.start_time, self.end_time, exclude_first_day)
 
     def GetActivitiesOnDate (self, desired_date):
         #Define the beginning and end of the time range for the day
@@ -48,6 +43,12 @@ class RePlayVisit(persistent.Persistent):
         
         return result
 
-
-
-        
+    #This method returns all dates between a start time and an end time (inclusive)
+    @staticmethod
+    def get_dates_in_range (start_time, end_time, exclude_first_day = False):
+        start_day = start_time.date()
+        end_day = end_time.date()
+        dates_in_range = [start_day + timedelta(days = x) for x in range((end_day - start_day).days + 1)]
+        if (exclude_first_day):
+            dates_in_range = dates_in_range[1:len(dates_in_range)]       
+        return dates_in_range
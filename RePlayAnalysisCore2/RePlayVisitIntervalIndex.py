@@ -0,0 +1,53 @@
+import bisect
+
+#This class is an index of visits, which finds all of the visits that contain a point in time.
+#It gives the same result as calling RePlayUtilities.time_in_range on every visit.
+#
+#The start and end times of all visits split the time line into points (the start and end times
+#themselves) and the gaps between neighbouring points. The visits that contain each point and each
+#gap are found when the index is created, so finding the visits that contain a time is a binary search.
+#Visits that end before they start "wrap around" (see RePlayUtilities.time_in_range), so they are
+#checked one at a time instead.
+class RePlayVisitIntervalIndex:
+
+    #The visits are passed in as a list of (sort key, visit) pairs. The visits returned by FindVisits are
+    #ordered by their sort key.
+    def __init__(self, visits):
+        self.__visits = sorted(visits, key = lambda x: x[0])
+
+        #The sorted start and end times of all of the visits
+        self.__boundaries = sorted(set([x[1].start_time for x in self.__visits if x[1].start_time <= x[1].end_time] +
+            [x[1].end_time for x in self.__visits if x[1].start_time <= x[1].end_time]))
+
+        #The positions (in self.__visits) of the visits that contain each boundary, and each gap between two boundaries
+        self.__visits_at_boundary = [[] for _ in range(len(self.__boundaries))]
+        self.__visits_in_gap = [[] for _ in range(max(0, len(self.__boundaries) - 1))]
+
+        #The positions of the visits that wrap around
+        self.__wrapped_visits = []
+
+        for (visit_position, (_, visit)) in enumerate(self.__visits):
+            if (visit.start_time <= visit.end_time):
+                first_boundary = bisect.bisect_left(self.__boundaries, visit.start_time)
+                last_boundary = bisect.bisect_left(self.__boundaries, visit.end_time)
+                for i in range(first_boundary, last_boundary + 1):
+                    self.__visits_at_boundary[i].append(visit_position)
+                for i in range(first_boundary, last_boundary):
+                    self.__visits_in_gap[i].append(visit_position)
+            else:
+                self.__wrapped_visits.append(visit_position)
+
+    #This method returns all of the visits that contain a point in time, ordered by their sort key
+    def FindVisits(self, time):
+        visit_positions = []
+        i = bisect.bisect_left(self.__boundaries, time)
+        if (i < len(self.__boundaries)) and (self.__boundaries[i] == time):
+            visit_positions = self.__visits_at_boundary[i]
+        elif (i > 0) and (i < len(self.__boundaries)):
+            visit_positions = self.__visits_in_gap[i - 1]
+
+        if (len(self.__wrapped_visits) > 0):
+            visit_positions = sorted(visit_positions +
+                [x for x in self.__wrapped_visits if (self.__visits[x][1].start_time <= time) or (time <= self.__visits[x][1].end_time)])
+
+        return [self.__visits[x][1] for x in visit_positions]
@@ -0,0 +1,68 @@
+import persistent
+
+from BTrees.IIBTree import IITreeSet
+
+from .RePlayVisitIntervalIndex import RePlayVisitIntervalIndex
+
+#This class finds a parent visit for each activity in the activity list that does not have one yet.
+#An activity belongs to a visit if the activity started during the visit, and either:
+#   1. the activity's participant id is the same as the visit's participant id, or
+#   2. the activity's participant id does not belong to any participant
+#If more than one visit matches an activity, the activity is added to all of them, and the last of
+#them (in the order of the participants, and then in the order of each participant's visits) becomes
+#the activity's parent visit.
+#
+#This object is saved in the database so that it can remember which activities it has already
+#checked. Each time it is used, it only checks the activities that have been added to the activity
+#list since then, and the activities that did not have a matching visit the last time it was used.
+class RePlayVisitMatcher(persistent.Persistent):
+
+    def __init__(self):
+        #The number of activities in the activity list that have been checked
+        self.number_of_checked_activities = 0
+
+        #The positions (in the activity list) of activities that have been checked, but did not have a parent visit
+        self.unmatched_activities = IITreeSet()
+
+    #This method finds parent visits for activities that do not have one yet
+    def AssignParentVisits(self, activity_list, participants):
+        #Index the visits of each participant, and the visits of all participants
+        all_visits = []
+        visits_by_uid = {}
+        for (participant_position, p) in enumerate(participants):
+            visits_by_uid.setdefault(p.uid, [])
+            for (visit_position, v) in enumerate(p.visits):
+                sort_key = (participant_position, visit_position)
+                all_visits.append((sort_key, v))
+                visits_by_uid[p.uid].append((sort_key, v))
+
+        all_visits_index = RePlayVisitIntervalIndex(all_visits)
+        visits_by_uid_index = {}
+        for (uid, uid_visits) in visits_by_uid.items():
+            visits_by_uid_index[uid] = RePlayVisitIntervalIndex(uid_visits)
+
+        #Check each activity that has not been checked yet, and each activity that did not match a visit before
+        activities_to_check = list(self.unmatched_activities) + list(range(self.number_of_checked_activities, len(activity_list)))
+        self.unmatched_activities.clear()
+        for i in activities_to_check:
+            current_activity = activity_list[i]
+            if (current_activity.parent_visit is None):
+                activity_time = current_activity.start_time
+
+                #If the participant ID matches a participant, then only that participant's visits can be parents.
+                #Otherwise, the visits of any participant can be parents.
+                if (current_activity.uid in visits_by_uid_index):
+                    matching_visits = visits_by_uid_index[current_activity.uid].FindVisits(activity_time)
+                else:
+                    matching_visits = all_visits_index.FindVisits(activity_time)
+
+                #Set the parent visit of this activity
+                for v in matching_visits:
+                    current_activity.parent_visit = v
+                    v.activities.append(current_activity)
+
+                if (current_activity.parent_visit is None):
+                    self.unmatched_activities.add(i)
+
+        self.number_of_checked_activities = len(activity_list)
+        self._p_changed = True